@@ -2,11 +2,13 @@
 Main Flask application for LPDP Scholarship RAG Website with Simple RAG Chain
 """
 import os
+import json
 import uuid
 import tempfile
-from flask import Flask, render_template, request, jsonify, session, send_from_directory, url_for
+from flask import Flask, Response, render_template, request, jsonify, session, send_from_directory, stream_with_context, url_for
 from config import Config
 from services.simple_rag_service import SimpleRAGService
+from services.pipeline_metrics import get_pipeline_metrics
 import logging
 
 # Configure logging
@@ -35,6 +37,11 @@ def create_app():
         """About LPDP Scholarship page"""
         return render_template('about.html')
     
+    @app.route('/documents/<path:filename>')
+    def document_file(filename):
+        """Serve an indexed source document (citation links, e.g. /documents/x.pdf#page=4)"""
+        return send_from_directory(os.path.abspath(app.config['DOCUMENTS_PATH']), filename)
+    
     @app.route('/chat', methods=['GET', 'POST'])
     def chat():
         """Enhanced chat interface with better error handling"""
@@ -71,8 +78,18 @@ def create_app():
                 session_id = str(uuid.uuid4())
                 session['session_id'] = session_id
             
+            # Admins can ask for this request to be profiled
+            profile = bool(rag_service.profiler and rag_service.profiler.is_authorized(request.headers.get('X-Profile-Token')))
+            
             # Get answer from RAG service
-            response = rag_service.get_answer(question, session_id)
+            response = rag_service.get_answer(question, session_id, profile=profile)
+            
+            # Fast 503 instead of a timeout when LLM admission rejected the request
+            metadata = response.get('metadata', {})
+            if metadata.get('overloaded') and not metadata.get('degraded'):
+                overloaded = jsonify({'error': response['answer'], 'session_id': session_id})
+                overloaded.headers['Retry-After'] = str(max(1, int(metadata.get('retry_after', 1))))
+                return overloaded, 503
             
             return jsonify({
                 'answer': response['answer'],
@@ -87,6 +104,51 @@ def create_app():
             logger.error(f"Error processing question: {str(e)}")
             return jsonify({'error': 'Terjadi kesalahan dalam memproses pertanyaan'}), 500
     
+    @app.route('/chat/batch', methods=['POST'])
+    def chat_batch():
+        """Answer a list of questions, streaming one NDJSON record per answer as it completes"""
+        if not rag_service:
+            return jsonify({'error': 'Service tidak tersedia saat ini'}), 503
+        
+        data = request.get_json(silent=True) or {}
+        questions = data.get('questions')
+        if not isinstance(questions, list) or not questions:
+            return jsonify({'error': 'questions harus berupa daftar pertanyaan'}), 400
+        if len(questions) > app.config['BATCH_MAX_QUESTIONS']:
+            return jsonify({'error': f"Maksimal {app.config['BATCH_MAX_QUESTIONS']} pertanyaan per batch"}), 400
+        concurrency = data.get('concurrency')
+        
+        # Rate limiting: max 1 batch per BATCH_MIN_INTERVAL seconds per session
+        import time
+        session_id = session.get('session_id')
+        if not session_id:
+            session_id = str(uuid.uuid4())
+            session['session_id'] = session_id
+        batch_key = f"last_batch_{session_id}"
+        wait = app.config['BATCH_MIN_INTERVAL'] - (time.time() - session.get(batch_key, 0))
+        if wait > 0:
+            throttled = jsonify({'error': 'Silakan tunggu sebentar sebelum mengirim batch lagi'})
+            throttled.headers['Retry-After'] = str(max(1, int(wait)))
+            return throttled, 429
+        session[batch_key] = time.time()
+        
+        def generate():
+            start = time.perf_counter()
+            count = 0
+            try:
+                # Charged to the caller's session so SESSION_TOKEN_BUDGET covers batches too
+                for item in rag_service.answer_batch(questions, concurrency=concurrency if isinstance(concurrency, int) else None,
+                                                     session_id=session_id):
+                    count += 1
+                    yield json.dumps(item, ensure_ascii=False) + '\n'
+            except Exception as e:
+                logger.error(f"Error in batch answering: {str(e)}")
+                yield json.dumps({'error': 'Terjadi kesalahan dalam memproses batch'}) + '\n'
+            elapsed = time.perf_counter() - start
+            yield json.dumps({'done': True, 'count': count, 'elapsed_s': round(elapsed, 3)}) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
     @app.route('/chat/history', methods=['GET'])
     def get_chat_history():
         """Get chat history with error handling"""
@@ -135,6 +197,72 @@ def create_app():
             logger.error(f"Error getting admin stats: {str(e)}")
             return jsonify({'error': 'Gagal mengambil statistik'}), 500
     
+    @app.route('/admin/llm-admission')
+    def admin_llm_admission():
+        """Get LLM admission control queue depth and wait times"""
+        try:
+            return jsonify(rag_service.get_admission_stats())
+        except Exception as e:
+            logger.error(f"Error getting LLM admission stats: {str(e)}")
+            return jsonify({'error': 'Gagal mengambil statistik LLM'}), 500
+    
+    @app.route('/admin/llm-health')
+    def admin_llm_health():
+        """Get LLM circuit breaker and hedging state"""
+        try:
+            return jsonify(rag_service.get_llm_health())
+        except Exception as e:
+            logger.error(f"Error getting LLM health: {str(e)}")
+            return jsonify({'error': 'Gagal mengambil status LLM'}), 500
+    
+    @app.route('/admin/faq-cache')
+    def admin_faq_cache():
+        """Get FAQ warm cache coverage and hit rate"""
+        try:
+            return jsonify(rag_service.get_faq_cache_stats())
+        except Exception as e:
+            logger.error(f"Error getting FAQ cache stats: {str(e)}")
+            return jsonify({'error': 'Gagal mengambil statistik FAQ cache'}), 500
+    
+    def profile_access_denied():
+        """403 unless the request carries a valid X-Profile-Token"""
+        if not rag_service or not rag_service.profiler:
+            return jsonify({'error': 'Profiler tidak aktif'}), 404
+        if not rag_service.profiler.is_authorized(request.headers.get('X-Profile-Token')):
+            return jsonify({'error': 'Akses ditolak'}), 403
+        return None
+    
+    @app.route('/admin/profiles')
+    def admin_profiles():
+        """List recent request profiles"""
+        denied = profile_access_denied()
+        if denied:
+            return denied
+        try:
+            limit = request.args.get('limit', 50, type=int)
+            return jsonify({'profiles': rag_service.list_profiles(limit), 'profiler': rag_service.profiler is not None})
+        except Exception as e:
+            logger.error(f"Error listing profiles: {str(e)}")
+            return jsonify({'error': 'Gagal mengambil daftar profil'}), 500
+    
+    @app.route('/admin/profiles/<path:name>')
+    def admin_profile_download(name):
+        """Download one profile (open .speedscope.json files in speedscope.app)"""
+        denied = profile_access_denied()
+        if denied:
+            return denied
+        return send_from_directory(rag_service.profiler.directory.resolve(), name, as_attachment=True)
+    
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus per-stage latency histograms (aggregated over gunicorn workers)"""
+        try:
+            body, content_type = get_pipeline_metrics().render()
+            return Response(body, content_type=content_type)
+        except Exception as e:
+            logger.error(f"Error rendering metrics: {str(e)}")
+            return Response("# error rendering metrics\n", status=500, content_type='text/plain')
+    
     @app.route('/admin/upload', methods=['POST'])
     def upload_documents():
         """Upload and process documents for RAG"""
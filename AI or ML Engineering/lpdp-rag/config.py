@@ -21,18 +21,145 @@ class Config:
     CHROMA_DB_PATH = os.getenv('CHROMA_DB_PATH', './data/chroma_db')
     CHROMA_COLLECTION_NAME = os.getenv('CHROMA_COLLECTION_NAME', 'lpdp_docs')
     
+    # Offline embedding model bundle (scripts/export_model_bundle.py)
+    EMBEDDING_BUNDLE_PATH = os.getenv('EMBEDDING_BUNDLE_PATH')
+    EMBEDDING_BUNDLE_VERIFY = os.getenv('EMBEDDING_BUNDLE_VERIFY', 'false').lower() == 'true'
+    
     # LLM settings
     GROQ_API_KEY = os.getenv('GROQ_API_KEY')
     GROQ_MODEL = os.getenv('GROQ_MODEL', 'llama3-8b-8192')
     
+    # LLM admission control (Groq quotas, concurrency, bounded wait queue)
+    LLM_ADMISSION_ENABLED = os.getenv('LLM_ADMISSION_ENABLED', 'true').lower() == 'true'
+    LLM_ADMISSION_BACKEND = os.getenv('LLM_ADMISSION_BACKEND', 'memory')
+    LLM_ADMISSION_DB = os.getenv('LLM_ADMISSION_DB', './data/cache/llm_admission.sqlite')
+    GROQ_RPM = int(os.getenv('GROQ_RPM', 30))
+    GROQ_TPM = int(os.getenv('GROQ_TPM', 6000))
+    LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 4))
+    LLM_MAX_QUEUE = int(os.getenv('LLM_MAX_QUEUE', 32))
+    LLM_QUEUE_TIMEOUT = float(os.getenv('LLM_QUEUE_TIMEOUT', 5.0))
+    LLM_OVERLOAD_MODE = os.getenv('LLM_OVERLOAD_MODE', 'degraded')
+    GROQ_BASE_URL = os.getenv('GROQ_BASE_URL')
+    
+    # LLM circuit breaker and hedging
+    CB_ENABLED = os.getenv('CB_ENABLED', 'true').lower() == 'true'
+    CB_WINDOW = int(os.getenv('CB_WINDOW', 20))
+    CB_MIN_CALLS = int(os.getenv('CB_MIN_CALLS', 5))
+    CB_FAILURE_THRESHOLD = float(os.getenv('CB_FAILURE_THRESHOLD', 0.5))
+    CB_SLOW_CALL_SECONDS = float(os.getenv('CB_SLOW_CALL_SECONDS', 8.0))
+    CB_OPEN_SECONDS = float(os.getenv('CB_OPEN_SECONDS', 30.0))
+    HEDGE_ENABLED = os.getenv('HEDGE_ENABLED', 'false').lower() == 'true'
+    HEDGE_MIN_DELAY = float(os.getenv('HEDGE_MIN_DELAY', 1.0))
+    LLM_SECONDARY_MODEL = os.getenv('LLM_SECONDARY_MODEL')
+    LLM_SECONDARY_BASE_URL = os.getenv('LLM_SECONDARY_BASE_URL')
+    
+    # Token usage accounting and budgets (0 = no budget)
+    SESSION_TOKEN_BUDGET = int(os.getenv('SESSION_TOKEN_BUDGET', 0))
+    DAILY_TOKEN_BUDGET = int(os.getenv('DAILY_TOKEN_BUDGET', 0))
+    TOKEN_USAGE_BACKEND = os.getenv('TOKEN_USAGE_BACKEND', 'memory')
+    TOKEN_USAGE_DB = os.getenv('TOKEN_USAGE_DB', './data/cache/token_usage.sqlite')
+    
+    # Extractive no-LLM answers (overload, open circuit, no LLM)
+    EXTRACTIVE_MAX_SENTENCES = int(os.getenv('EXTRACTIVE_MAX_SENTENCES', 4))
+    EXTRACTIVE_MMR_LAMBDA = float(os.getenv('EXTRACTIVE_MMR_LAMBDA', 0.7))
+    EXTRACTIVE_MIN_CHARS = int(os.getenv('EXTRACTIVE_MIN_CHARS', 30))
+    EXTRACTIVE_CACHE_SIZE = int(os.getenv('EXTRACTIVE_CACHE_SIZE', 2000))
+    
+    # Out-of-domain gate
+    DOMAIN_GATE_ENABLED = os.getenv('DOMAIN_GATE_ENABLED', 'true').lower() == 'true'
+    DOMAIN_GATE_THRESHOLD = float(os.getenv('DOMAIN_GATE_THRESHOLD', 0.35))
+    DOMAIN_CENTROID_MARGIN = float(os.getenv('DOMAIN_CENTROID_MARGIN', 0.0))
+    
+    # Shared retrieval sidecar for multi-worker deployments
+    RETRIEVAL_SIDECAR_SOCKET = os.getenv('RETRIEVAL_SIDECAR_SOCKET')
+    RETRIEVAL_SIDECAR_TIMEOUT = float(os.getenv('RETRIEVAL_SIDECAR_TIMEOUT', 10.0))
+    RETRIEVAL_SIDECAR_WAIT = float(os.getenv('RETRIEVAL_SIDECAR_WAIT', 30.0))
+    
+    # Per-stage latency metrics (/metrics)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR')
+    
+    # Batch question answering (/chat/batch, scripts/batch_answer.py)
+    BATCH_MAX_QUESTIONS = int(os.getenv('BATCH_MAX_QUESTIONS', 200))
+    BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', os.getenv('LLM_MAX_CONCURRENCY', 4)))
+    BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', 8))
+    BATCH_SEARCH_WORKERS = int(os.getenv('BATCH_SEARCH_WORKERS', 8))
+    BATCH_MIN_INTERVAL = float(os.getenv('BATCH_MIN_INTERVAL', 30))
+    
+    # Per-request sampling profiler (off unless a rate or admin token is set)
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0.0))
+    PROFILE_ADMIN_TOKEN = os.getenv('PROFILE_ADMIN_TOKEN')
+    PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 5))
+    PROFILE_FORMAT = os.getenv('PROFILE_FORMAT', 'speedscope')
+    PROFILE_DIR = os.getenv('PROFILE_DIR', './data/profiles')
+    PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', 50))
+    
     # LangSmith settings for monitoring and observability
     LANGCHAIN_API_KEY = os.getenv('LANGCHAIN_API_KEY')
     LANGCHAIN_ENDPOINT = os.getenv('LANGCHAIN_ENDPOINT', 'https://api.smith.langchain.com')
     LANGCHAIN_PROJECT = os.getenv('LANGCHAIN_PROJECT', 'lpdp-rag-assistant')
     LANGCHAIN_TRACING_V2 = os.getenv('LANGCHAIN_TRACING_V2', 'false').lower() == 'true'
     
+    # Asynchronous batched trace export
+    TRACE_SINK = os.getenv('TRACE_SINK')
+    TRACE_JSONL_PATH = os.getenv('TRACE_JSONL_PATH', './data/traces/spans.jsonl')
+    TRACE_QUEUE_SIZE = int(os.getenv('TRACE_QUEUE_SIZE', 1000))
+    TRACE_BATCH_SIZE = int(os.getenv('TRACE_BATCH_SIZE', 50))
+    TRACE_FLUSH_INTERVAL = float(os.getenv('TRACE_FLUSH_INTERVAL', 2.0))
+    
     # Document processing settings
     DOCUMENTS_PATH = os.getenv('DOCUMENTS_PATH', './data/documents')
+    EXTRACTION_CACHE_PATH = os.getenv('EXTRACTION_CACHE_PATH', './data/cache/extracted')
+    EXTRACTION_CACHE_ENABLED = os.getenv('EXTRACTION_CACHE_ENABLED', 'true').lower() == 'true'
+    
+    # Near-duplicate chunk elimination (MinHash/LSH)
+    DEDUP_ENABLED = os.getenv('DEDUP_ENABLED', 'true').lower() == 'true'
+    DEDUP_THRESHOLD = float(os.getenv('DEDUP_THRESHOLD', 0.85))
+    DEDUP_NUM_PERM = int(os.getenv('DEDUP_NUM_PERM', 128))
+    
+    # Scholarship-aware query routing
+    ROUTER_ENABLED = os.getenv('ROUTER_ENABLED', 'true').lower() == 'true'
+    ROUTER_CENTROID_MIN_SIM = float(os.getenv('ROUTER_CENTROID_MIN_SIM', 0.55))
+    ROUTER_CENTROID_MARGIN = float(os.getenv('ROUTER_CENTROID_MARGIN', 0.05))
+    
+    # Local multi-query expansion (ID<->EN terms, acronyms, keywords) fused with RRF
+    QUERY_EXPANSION_ENABLED = os.getenv('QUERY_EXPANSION_ENABLED', 'false').lower() == 'true'
+    QUERY_EXPANSION_MAX_VARIANTS = int(os.getenv('QUERY_EXPANSION_MAX_VARIANTS', 3))
+    QUERY_EXPANSION_BUDGET_MS = float(os.getenv('QUERY_EXPANSION_BUDGET_MS', 150))
+    QUERY_EXPANSION_RRF_K = int(os.getenv('QUERY_EXPANSION_RRF_K', 60))
+    QUERY_EXPANSION_WORKERS = int(os.getenv('QUERY_EXPANSION_WORKERS', 8))
+    
+    # Retrieval settings (k chunks; two-stage document -> chunk search over top-M documents)
+    RETRIEVAL_K = int(os.getenv('RETRIEVAL_K', 5))
+    HIERARCHICAL_ENABLED = os.getenv('HIERARCHICAL_ENABLED', 'true').lower() == 'true'
+    HIERARCHICAL_TOP_DOCS = int(os.getenv('HIERARCHICAL_TOP_DOCS', 3))
+    CONTEXT_SNIPPET_CHARS = int(os.getenv('CONTEXT_SNIPPET_CHARS', 1200))
+    
+    # Small-to-big retrieval: token-aligned child chunks, parent spans in a SQLite store
+    PARENT_RETRIEVAL_ENABLED = os.getenv('PARENT_RETRIEVAL_ENABLED', 'false').lower() == 'true'
+    CHILD_CHUNK_TOKENS = int(os.getenv('CHILD_CHUNK_TOKENS', 120))
+    CHILD_CHUNK_OVERLAP = int(os.getenv('CHILD_CHUNK_OVERLAP', 20))
+    PARENT_MAX_TOKENS = int(os.getenv('PARENT_MAX_TOKENS', 1024))
+    PARENT_CONTEXT_TOKENS = int(os.getenv('PARENT_CONTEXT_TOKENS', 2000))
+    PARENT_STORE_PATH = os.getenv('PARENT_STORE_PATH', './data/cache/parents.sqlite')
+    DOC_SUMMARY_SEGMENTS = int(os.getenv('DOC_SUMMARY_SEGMENTS', 4))
+    DOC_SUMMARY_CHARS = int(os.getenv('DOC_SUMMARY_CHARS', 600))
+    
+    # Structured fact fast path (struktur_organisasi.json, additional_info.json)
+    FACT_INDEX_ENABLED = os.getenv('FACT_INDEX_ENABLED', 'true').lower() == 'true'
+    FACT_MAX_WORDS = int(os.getenv('FACT_MAX_WORDS', 14))
+    
+    # Precomputed FAQ answer warm cache
+    FAQ_CACHE_ENABLED = os.getenv('FAQ_CACHE_ENABLED', 'true').lower() == 'true'
+    FAQ_CACHE_PATH = os.getenv('FAQ_CACHE_PATH', './data/cache/faq_answers.json')
+    FAQ_QUESTIONS_PATH = os.getenv('FAQ_QUESTIONS_PATH', './data/faq/canonical_questions.txt')
+    FAQ_SIMILARITY_THRESHOLD = float(os.getenv('FAQ_SIMILARITY_THRESHOLD', 0.92))
+    FAQ_AUTO_REBUILD = os.getenv('FAQ_AUTO_REBUILD', 'true').lower() == 'true'
+    INDEX_VERSION_TTL = float(os.getenv('INDEX_VERSION_TTL', 5.0))
+    
+    # Single-flight coalescing of identical concurrent first-turn questions
+    COALESCE_ENABLED = os.getenv('COALESCE_ENABLED', 'true').lower() == 'true'
+    COALESCE_WAIT_TIMEOUT = float(os.getenv('COALESCE_WAIT_TIMEOUT', 30.0))
     
     # Translation settings
     USER_AGENT = os.getenv('USER_AGENT', 'LPDP-RAG-Bot/1.0')
@@ -2,8 +2,9 @@
 Simple RAG Chain using LangGraph with Stateful Chain approach and LangSmith integration
 """
 import os
+import time
 import logging
-from typing import Dict, List, Any, Optional, Annotated
+from typing import Dict, List, Any, Optional, Tuple, Annotated
 from datetime import datetime
 
 # LangGraph imports
@@ -36,14 +37,7 @@ except ImportError:
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
 from langchain_core.documents import Document
 from langchain_core.tools import tool
-
-try:
-    from langchain_groq import ChatGroq
-except ImportError:
-    try:
-        from langchain_community.llms import Groq as ChatGroq
-    except ImportError:
-        ChatGroq = None
+from langchain_core.runnables import RunnableConfig
 
 # Conditional import for tools condition
 try:
@@ -56,39 +50,72 @@ except ImportError:
             return "tools"
         return END
 
-from services.vector_store import VectorStoreService
 from services.llm_service import LLMService
-from services.langsmith_monitoring import LangSmithMonitoring
-
-# Import LangSmith monitoring
-try:
-    import sys
-    sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-    from services.langsmith_monitoring import LangSmithMonitoring
-    LANGSMITH_AVAILABLE = True
-except ImportError:
-    LANGSMITH_AVAILABLE = False
+from services.query_router import QueryRouter
+from services.query_expansion import QueryExpander
+from services.admission_control import AdmissionRejected
+from services.citations import document_sources, format_context
+from services.parent_store import get_parent_store
+from services.langsmith_monitoring import get_langsmith_monitoring
+from services.pipeline_metrics import get_pipeline_metrics
 
 logger = logging.getLogger(__name__)
 
+# Canned replies of the graph nodes when the LLM is missing or fails; flagged as fallbacks in the result
+LLM_UNAVAILABLE_ANSWER = "LLM tidak tersedia saat ini."
+ROUTING_ERROR_ANSWER = "Terjadi kesalahan dalam memproses permintaan."
+GENERATION_UNAVAILABLE_ANSWER = "LLM tidak tersedia untuk menghasilkan jawaban."
+GENERATION_ERROR_ANSWER = "Terjadi kesalahan dalam menghasilkan jawaban."
+FALLBACK_ANSWERS = frozenset({
+    LLM_UNAVAILABLE_ANSWER, ROUTING_ERROR_ANSWER, GENERATION_UNAVAILABLE_ANSWER, GENERATION_ERROR_ANSWER
+})
+
+def _fallback_message(content: str) -> AIMessage:
+    return AIMessage(content=content, additional_kwargs={"fallback": True})
+
 class SimpleRAGChain:
     """Simple RAG Chain using LangGraph with stateful chain approach and LangSmith monitoring"""
     
-    def __init__(self, vector_service: VectorStoreService):
-        """Initialize the RAG chain"""
+    def __init__(self, vector_service, llm_service: Optional[LLMService] = None, langsmith=None):
+        """Initialize the RAG chain (vector_service: local VectorStoreService or sidecar client)
+        
+        llm_service and langsmith are shared with the owning service when given
+        """
         self.vector_service = vector_service
-        self.retriever = vector_service.get_retriever(k=5)
+        self.retrieval_k = int(os.getenv('RETRIEVAL_K', 5))
+        
+        # Optional program-aware routing to narrow the candidate set
+        if os.getenv('ROUTER_ENABLED', 'true').lower() == 'true':
+            self.query_router = QueryRouter(vector_service)
+        else:
+            self.query_router = None
+        
+        # Optional local multi-query expansion fused with RRF
+        if os.getenv('QUERY_EXPANSION_ENABLED', 'false').lower() == 'true':
+            self.query_expander = QueryExpander()
+        else:
+            self.query_expander = None
         
-        # Initialize LangSmith monitoring
-        if LANGSMITH_AVAILABLE:
-            self.langsmith = LangSmithMonitoring()
+        # Optional small-to-big retrieval: matched child chunks are replaced by their parent spans
+        if os.getenv('PARENT_RETRIEVAL_ENABLED', 'false').lower() == 'true':
+            self.parent_store = get_parent_store()
         else:
-            self.langsmith = None
+            self.parent_store = None
+        
+        # Process-wide LangSmith monitoring (LangSmith itself loads only when configured)
+        self.langsmith = langsmith or get_langsmith_monitoring()
+        self.metrics = get_pipeline_metrics()
         
         # Initialize LLM with LangSmith monitoring
-        self.llm_service = LLMService(langsmith_monitoring=self.langsmith)
+        self.llm_service = llm_service or LLMService(langsmith_monitoring=self.langsmith)
         self.llm = self.llm_service.llm
 
+        # Best retrieval score per thread, used as the answer confidence
+        self._retrieval_scores: Dict[str, float] = {}
+        
+        # (question, embedding) per thread when the caller already embedded the question
+        self._question_embeddings: Dict[str, Tuple[str, List[float]]] = {}
+        
         # Create retrieve tool
         self.search_tool = self._create_retrieve_tool()
         
@@ -112,7 +139,12 @@ class SimpleRAGChain:
         """Initialize memory with version compatibility"""
         try:
             if MemorySaver:
-                return MemorySaver()
+                memory = MemorySaver()
+                # Time checkpointer reads/writes per request; the graph calls these on the instance
+                memory.get_tuple = self.metrics.timed('checkpoint_read', memory.get_tuple)
+                memory.put = self.metrics.timed('checkpoint_write', memory.put)
+                memory.put_writes = self.metrics.timed('checkpoint_write', memory.put_writes)
+                return memory
             else:
                 logger.warning("MemorySaver not available, using fallback history management")
                 return None
@@ -120,18 +152,89 @@ class SimpleRAGChain:
             logger.error(f"Failed to initialize memory: {e}")
             return None
     
+    def retrieve(self, query: str, query_embedding: Optional[List[float]] = None) -> List[Document]:
+        """Retrieve relevant chunks, fusing expanded query variants and expanding to parents when enabled"""
+        if self.query_expander:
+            documents = self.query_expander.search(
+                query, self._search, self.vector_service.embed_queries, k=self.retrieval_k,
+                query_embedding=query_embedding
+            )
+        else:
+            documents = self._search(query, query_embedding)
+        if self.parent_store:
+            with self.metrics.stage('parent_expansion'):
+                documents = self.parent_store.expand(documents)
+        return documents
+    
+    def _search(self, query: str, query_embedding: Optional[List[float]] = None) -> List[Document]:
+        """Single-query retrieval using routing and hierarchical search when enabled"""
+        if self.query_router:
+            return self.query_router.search(query, k=self.retrieval_k, query_embedding=query_embedding)
+        embedding = query_embedding
+        if embedding is None:
+            with self.metrics.stage('query_embedding'):
+                embedding = self.vector_service.embed_query(query)
+        with self.metrics.stage('vector_search'):
+            return self.vector_service.search_by_vector(embedding, k=self.retrieval_k)
+    
+    def _generation_system_prompt(self, docs_content: str) -> str:
+        """System prompt of the generate step around the retrieved context"""
+        return (
+            "Role\n"
+            "Anda adalah AI Assistant ahli untuk program Beasiswa LPDP (Lembaga Pengelola Dana Pendidikan) Indonesia. "
+            "Anda memiliki pengetahuan mendalam tentang semua aspek beasiswa LPDP termasuk persyaratan, prosedur pendaftaran, "
+            "jenis beasiswa, dan informasi terkait dari dokumen-dokumen yang ada pada vector db.\n\n"
+            
+            "# Input\n"
+            "Pengguna bertanya tentang program Beasiswa LPDP dan membutuhkan informasi yang akurat dan terpercaya. "
+            "Konteks dokumen berikut tersedia untuk menjawab pertanyaan:\n\n"
+            f"{docs_content}\n\n"
+
+            "# Steps\n"
+            "1. Analisis pertanyaan dengan cermat untuk memahami kebutuhan informasi pengguna\n"
+            "2. Gunakan konteks dokumen yang disediakan sebagai sumber utama informasi\n"
+            "3. Berikan jawaban yang akurat dan berdasarkan fakta dari dokumen\n"
+            "4. Format jawaban dalam markdown dengan struktur yang jelas\n"
+            "5. Gunakan numbered lists (1. 2. 3.) untuk langkah-langkah atau daftar berurutan\n"
+            "6. Gunakan bullet points (-) untuk daftar item tanpa urutan\n"
+            "7. Gunakan **bold** dan *italic* untuk penekanan penting\n"
+            "8. Jika informasi tidak tersedia atau kurang yakin, jujur sampaikan keterbatasan\n"
+            "9. Cantumkan nomor sumber konteks seperti [1] setelah informasi yang diambil darinya\n\n"
+            
+            "# Expectation\n"
+            "- Bahasa: Indonesia yang baik dan benar\n"
+            "- Format: Markdown dengan struktur jelas\n"
+            "- Panjang: 3-5 paragraf atau sesuai kompleksitas pertanyaan\n"
+            
+            "# Narrowing\n"
+            "Pastikan pertanyaan dan jawaban berada di domain LPDP. Jika user bertanya hal diluar domain maka jawab tidak bisa dan gunakan bahasa yang sopan\n"
+        )
+    
     def _create_retrieve_tool(self):
         """Create retrieve tool for document retrieval"""
-        @tool("search")
-        def search(query: str) -> List[Document]:
+        # The model sees compact formatted text; the documents travel as the ToolMessage artifact
+        @tool("search", response_format="content_and_artifact")
+        def search(query: str, config: RunnableConfig) -> Tuple[str, List[Document]]:
             """Search for relevant documents about LPDP scholarship information for a given query."""
             try:
-                documents = self.retriever.invoke(query)
+                start = time.perf_counter()
+                thread_id = (config or {}).get("configurable", {}).get("thread_id", "default")
+                # Reuse the caller's embedding when the model searches with the question as asked
+                question, embedding = self._question_embeddings.get(thread_id, (None, None))
+                if question is None or ' '.join(query.lower().split()) != ' '.join(question.lower().split()):
+                    embedding = None
+                documents = self.retrieve(query, query_embedding=embedding)
                 logger.info(f"Retrieved {len(documents)} documents for query: {query}")
-                return documents
+                if self.langsmith:
+                    self.langsmith.trace_retrieval(query, documents, latency=time.perf_counter() - start)
+                
+                scores = [doc.metadata['relevance_score'] for doc in documents if 'relevance_score' in doc.metadata]
+                if scores:
+                    self._retrieval_scores[thread_id] = max(scores + [self._retrieval_scores.get(thread_id, 0.0)])
+                return format_context(documents) or "Tidak ada dokumen yang relevan.", documents
             except Exception as e:
                 logger.error(f"Error in retrieval: {str(e)}")
-                return []
+                return "Tidak ada dokumen yang relevan.", []
         
         return search
     
@@ -145,9 +248,11 @@ class SimpleRAGChain:
             """Generate tool call for retrieval or respond."""
             if not self.llm:
                 # Fallback without LLM
-                return {"messages": [AIMessage(content="LLM tidak tersedia saat ini.")]}
+                return {"messages": [_fallback_message(LLM_UNAVAILABLE_ANSWER)]}
             
             try:
+                assembly_start = time.perf_counter()
+                
                 # Add system message to guide tool usage
                 system_msg = SystemMessage(content=(
                     "Anda adalah AI assistant untuk beasiswa LPDP. "
@@ -158,14 +263,18 @@ class SimpleRAGChain:
                 
                 # Prepare messages with system guidance
                 messages_with_system = [system_msg] + state["messages"]
+                self.metrics.observe('prompt_assembly', time.perf_counter() - assembly_start)
                 
-                llm_with_tools = self.llm.bind_tools([self.search_tool])
-                response = llm_with_tools.invoke(messages_with_system)
+                response = self.llm_service.invoke_with_tools(
+                    [self.search_tool], messages_with_system, node='query_or_respond'
+                )
                 # MessagesState appends messages to state instead of overwriting
                 return {"messages": [response]}
+            except AdmissionRejected:
+                raise
             except Exception as e:
                 logger.error(f"Error in query_or_respond: {e}")
-                return {"messages": [AIMessage(content="Terjadi kesalahan dalam memproses permintaan.")]}
+                return {"messages": [_fallback_message(ROUTING_ERROR_ANSWER)]}
         
         # Step 2: Tool execution
         tools = ToolNode([self.search_tool])
@@ -174,49 +283,18 @@ class SimpleRAGChain:
         def generate(state: MessagesState):
             """Generate answer."""
             if not self.llm:
-                return {"messages": [AIMessage(content="LLM tidak tersedia untuk menghasilkan jawaban.")]}
+                return {"messages": [_fallback_message(GENERATION_UNAVAILABLE_ANSWER)]}
             
             try:
-                # Get generated ToolMessages
-                recent_tool_messages = []
-                for message in reversed(state["messages"]):
-                    if hasattr(message, 'type') and message.type == "tool":
-                        recent_tool_messages.append(message)
-                    else:
-                        break
-                tool_messages = recent_tool_messages[::-1]
-
-                # Format into prompt
-                docs_content = "\n\n".join(str(doc.content) for doc in tool_messages)
-                system_message_content = (
-                    "Role\n"
-                    "Anda adalah AI Assistant ahli untuk program Beasiswa LPDP (Lembaga Pengelola Dana Pendidikan) Indonesia. "
-                    "Anda memiliki pengetahuan mendalam tentang semua aspek beasiswa LPDP termasuk persyaratan, prosedur pendaftaran, "
-                    "jenis beasiswa, dan informasi terkait dari dokumen-dokumen yang ada pada vector db.\n\n"
-                    
-                    "# Input\n"
-                    "Pengguna bertanya tentang program Beasiswa LPDP dan membutuhkan informasi yang akurat dan terpercaya. "
-                    "Konteks dokumen berikut tersedia untuk menjawab pertanyaan:\n\n"
-                    f"{docs_content}\n\n"
-
-                    "# Steps\n"
-                    "1. Analisis pertanyaan dengan cermat untuk memahami kebutuhan informasi pengguna\n"
-                    "2. Gunakan konteks dokumen yang disediakan sebagai sumber utama informasi\n"
-                    "3. Berikan jawaban yang akurat dan berdasarkan fakta dari dokumen\n"
-                    "4. Format jawaban dalam markdown dengan struktur yang jelas\n"
-                    "5. Gunakan numbered lists (1. 2. 3.) untuk langkah-langkah atau daftar berurutan\n"
-                    "6. Gunakan bullet points (-) untuk daftar item tanpa urutan\n"
-                    "7. Gunakan **bold** dan *italic* untuk penekanan penting\n"
-                    "8. Jika informasi tidak tersedia atau kurang yakin, jujur sampaikan keterbatasan\n\n"
-                    
-                    "# Expectation\n"
-                    "- Bahasa: Indonesia yang baik dan benar\n"
-                    "- Format: Markdown dengan struktur jelas\n"
-                    "- Panjang: 3-5 paragraf atau sesuai kompleksitas pertanyaan\n"
-                    
-                    "# Narrowing\n"
-                    "Pastikan pertanyaan dan jawaban berada di domain LPDP. Jika user bertanya hal diluar domain maka jawab tidak bisa dan gunakan bahasa yang sopan\n"
-                )
+                assembly_start = time.perf_counter()
+                
+                # Chunks retrieved by this turn's tool calls, numbered as in the cited sources
+                documents, tool_messages = self._current_turn_documents(state["messages"])
+                if documents:
+                    docs_content = format_context(documents)
+                else:
+                    docs_content = "\n\n".join(str(message.content) for message in tool_messages)
+                system_message_content = self._generation_system_prompt(docs_content)
                 
                 conversation_messages = [
                     message
@@ -225,13 +303,16 @@ class SimpleRAGChain:
                     or (hasattr(message, 'type') and message.type == "ai" and not hasattr(message, 'tool_calls'))
                 ]
                 prompt = [SystemMessage(content=system_message_content)] + conversation_messages
+                self.metrics.observe('prompt_assembly', time.perf_counter() - assembly_start)
 
                 # Run
-                response = self.llm.invoke(prompt)
+                response = self.llm_service.invoke(prompt, node='generate')
                 return {"messages": [response]}
+            except AdmissionRejected:
+                raise
             except Exception as e:
                 logger.error(f"Error in generate: {e}")
-                return {"messages": [AIMessage(content="Terjadi kesalahan dalam menghasilkan jawaban.")]}
+                return {"messages": [_fallback_message(GENERATION_ERROR_ANSWER)]}
         
         # Add nodes to graph
         graph_builder.add_node("query_or_respond", query_or_respond)
@@ -252,13 +333,26 @@ class SimpleRAGChain:
         
         return graph_builder
     
-    def invoke(self, question: str, session_id: str = "default") -> Dict[str, Any]:
-        """Invoke the RAG chain with a question and LangSmith tracing"""
+    def invoke(self, question: str, session_id: str = "default",
+               query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        """Invoke the RAG chain with a question and LangSmith tracing (query_embedding: the question's, if known)"""
+        if not self.langsmith:
+            return self._invoke(question, session_id, query_embedding)
+        # Retrieval and LLM spans of this turn are nested under one root run
+        with self.langsmith.trace_context():
+            return self._invoke(question, session_id, query_embedding)
+    
+    def _invoke(self, question: str, session_id: str, query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        """Run the graph for one turn and format the result"""
+        # Create dynamic thread_id based on session and user
+        thread_id = f"user_{session_id}"
         try:
             start_time = datetime.now()
             
-            # Create dynamic thread_id based on session and user
-            config = {"configurable": {"thread_id": f"user_{session_id}"}}
+            config = {"configurable": {"thread_id": thread_id}}
+            self._retrieval_scores.pop(thread_id, None)
+            if query_embedding is not None:
+                self._question_embeddings[thread_id] = (question, query_embedding)
             
             # Invoke the graph
             if self.memory:
@@ -273,7 +367,7 @@ class SimpleRAGChain:
                 existing_messages = self.session_histories.get(session_id, [])
                 current_messages = existing_messages + [HumanMessage(content=question)]
                 
-                result = self.compiled_graph.invoke({"messages": current_messages})
+                result = self.compiled_graph.invoke({"messages": current_messages}, config)
                 
                 # Save history manually
                 self.session_histories[session_id] = result["messages"]
@@ -281,25 +375,33 @@ class SimpleRAGChain:
             # Extract the final answer
             final_message = result["messages"][-1]
             answer = final_message.content if hasattr(final_message, 'content') else str(final_message)
+            fallback = bool(getattr(final_message, 'additional_kwargs', {}).get('fallback')) or answer in FALLBACK_ANSWERS
+            
+            # Extract sources and the chunks they came from
+            turn_documents, _ = self._current_turn_documents(result["messages"])
+            sources = document_sources(turn_documents)
             
-            # Extract sources
-            sources = self._extract_sources_from_messages(result["messages"])
+            # Confidence is the best cosine similarity among the chunks retrieved for this turn
+            confidence = self._retrieval_scores.pop(thread_id, 0.0)
             
             # Format response
             rag_result = {
                 "answer": answer,
                 "sources": sources,
-                "confidence": 0.8,  # Simple confidence score
+                "confidence": confidence,
                 "needs_continuation": False,
                 "metadata": {
                     "session_id": session_id,
                     "timestamp": datetime.now().isoformat(),
                     "approach": "stateful_chain",
+                    "chunk_ids": [doc.metadata['chunk_id'] for doc in turn_documents if doc.metadata.get('chunk_id')],
                     "processing_time": (datetime.now() - start_time).total_seconds()
                 }
             }
+            if fallback:
+                rag_result["metadata"]["fallback"] = True
             
-            # LangSmith tracing
+            # Queued for background export, never blocks the request
             if self.langsmith:
                 try:
                     self.langsmith.trace_rag_chain(question, rag_result, session_id)
@@ -308,6 +410,8 @@ class SimpleRAGChain:
             
             return rag_result
             
+        except AdmissionRejected:
+            raise
         except Exception as e:
             logger.error(f"Error in RAG chain invocation: {str(e)}")
             return {
@@ -317,6 +421,64 @@ class SimpleRAGChain:
                 "needs_continuation": False,
                 "metadata": {"error": str(e)}
             }
+        finally:
+            self._question_embeddings.pop(thread_id, None)
+    
+    def answer_from_documents(self, question: str, documents: List[Document]) -> Dict[str, Any]:
+        """Stateless single-call answer from already retrieved chunks (batch answering)
+        
+        Skips the tool-calling step and the checkpointer; AdmissionRejected propagates to the caller.
+        """
+        start_time = datetime.now()
+        if not self.llm:
+            raise AdmissionRejected('llm_unavailable', 0.0)
+        
+        prompt_start = time.perf_counter()
+        prompt = [
+            SystemMessage(content=self._generation_system_prompt(format_context(documents))),
+            HumanMessage(content=question)
+        ]
+        self.metrics.observe('prompt_assembly', time.perf_counter() - prompt_start)
+        
+        response = self.llm_service.invoke(prompt, node='generate')
+        scores = [doc.metadata['relevance_score'] for doc in documents if 'relevance_score' in doc.metadata]
+        return {
+            "answer": response.content if hasattr(response, 'content') else str(response),
+            "sources": document_sources(documents),
+            "confidence": max(scores) if scores else 0.0,
+            "needs_continuation": False,
+            "metadata": {
+                "timestamp": datetime.now().isoformat(),
+                "approach": "batch_direct",
+                "processing_time": (datetime.now() - start_time).total_seconds()
+            }
+        }
+    
+    def has_history(self, session_id: str) -> bool:
+        """Check whether a session already has conversation turns"""
+        try:
+            if self.memory:
+                config = {"configurable": {"thread_id": f"user_{session_id}"}}
+                state = self.compiled_graph.get_state(config)
+                return bool(state.values and state.values.get("messages"))
+            return bool(self.session_histories.get(session_id))
+        except Exception as e:
+            logger.error(f"Error checking session history: {str(e)}")
+            return True
+    
+    def record_exchange(self, session_id: str, question: str, answer: str) -> bool:
+        """Append a question/answer pair produced outside the graph to the session history"""
+        try:
+            messages = [HumanMessage(content=question), AIMessage(content=answer)]
+            if self.memory:
+                config = {"configurable": {"thread_id": f"user_{session_id}"}}
+                self.compiled_graph.update_state(config, {"messages": messages}, as_node="generate")
+            else:
+                self.session_histories[session_id] = self.session_histories.get(session_id, []) + messages
+            return True
+        except Exception as e:
+            logger.error(f"Error recording exchange: {str(e)}")
+            return False
     
     def get_session_history(self, session_id: str) -> List[Dict[str, Any]]:
         """Get session history"""
@@ -374,18 +536,20 @@ class SimpleRAGChain:
             logger.error(f"Error clearing session: {str(e)}")
             return False
     
-    def _extract_sources_from_messages(self, messages: List[BaseMessage]) -> List[Dict[str, Any]]:
-        """Extract sources from tool messages"""
-        sources = []
-        for message in messages:
-            if hasattr(message, 'type') and message.type == "tool":
-                # Tool message contains retrieved documents
-                try:
-                    # This is simplified - in real implementation, you'd parse the tool content
-                    sources.append({
-                        "title": "Retrieved Document",
-                        "source": "Vector Database"
-                    })
-                except:
-                    pass
-        return sources
\ No newline at end of file
+    @staticmethod
+    def _current_turn_documents(messages: List[BaseMessage]) -> Tuple[List[Document], List[BaseMessage]]:
+        """Documents (tool artifacts) and tool messages after the last human message"""
+        tool_messages = []
+        for message in reversed(messages):
+            message_type = getattr(message, 'type', None)
+            if message_type == "human":
+                break
+            if message_type == "tool":
+                tool_messages.append(message)
+        tool_messages.reverse()
+        documents = [
+            doc for message in tool_messages
+            for doc in (getattr(message, 'artifact', None) or [])
+            if isinstance(doc, Document)
+        ]
+        return documents, tool_messages
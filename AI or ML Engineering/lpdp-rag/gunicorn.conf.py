@@ -0,0 +1,60 @@
+"""
+Gunicorn configuration for lpdp-rag
+
+The service graph (MiniLM weights, Chroma index metadata, FAQ cache) is built
+once in the master with preload_app and shared copy-on-write with the workers;
+per-process handles are re-opened in post_fork.
+
+    gunicorn -c gunicorn.conf.py
+"""
+import os
+import gc
+import time
+import shutil
+
+# Native thread pools (OpenMP, HF tokenizers) do not survive fork; keep them
+# single-threaded per worker and scale with worker count instead
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+os.environ.setdefault('MKL_NUM_THREADS', '1')
+os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+
+# Workers write Prometheus samples to a shared directory that /metrics aggregates.
+# It must be emptied before the (preloaded) app imports prometheus_client; a
+# config reload on HUP finds the variable already set and keeps live samples.
+if not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+    _metrics_dir = os.getenv('METRICS_MULTIPROC_DIR', '/tmp/lpdp-metrics')
+    shutil.rmtree(_metrics_dir, ignore_errors=True)
+    os.makedirs(_metrics_dir, exist_ok=True)
+    os.environ['METRICS_MULTIPROC_DIR'] = _metrics_dir
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = _metrics_dir
+
+wsgi_app = "app:create_app()"
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', 4))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+_fork_started = {}
+
+def when_ready(server):
+    """Master finished loading the application"""
+    server.log.info(f"lpdp-rag ready (preload={'on' if preload_app else 'off'}, workers={workers})")
+
+def pre_fork(server, worker):
+    """Move preloaded objects out of the collector's reach so GC passes do not dirty shared pages"""
+    gc.freeze()
+    _fork_started[worker.age] = time.monotonic()
+
+def post_fork(server, worker):
+    """Re-open per-process handles (Chroma client, HTTP pools, locks, sockets) in the new worker"""
+    from services.fork_safety import run_after_fork
+    count = run_after_fork()
+    spawn_ms = (time.monotonic() - _fork_started.pop(worker.age, time.monotonic())) * 1000
+    server.log.info(f"Worker {worker.pid} ready in {spawn_ms:.0f} ms ({count} handles re-opened)")
+
+def child_exit(server, worker):
+    """Drop the exited worker's live samples from the metrics directory"""
+    from services.pipeline_metrics import mark_worker_dead
+    mark_worker_dead(worker.pid)
@@ -0,0 +1,93 @@
+"""
+Answer a list of questions in one batch and write the answers as NDJSON
+
+Questions come from a text file (one per line) or a JSONL file with a
+"question" field. Against a running server (--url) the /chat/batch endpoint is
+streamed; otherwise a local SimpleRAGService answers in-process.
+
+    python scripts/batch_answer.py data/faq/canonical_questions.txt --output answers.ndjson
+    python scripts/batch_answer.py questions.jsonl --url http://127.0.0.1:5000 --concurrency 8
+"""
+import sys
+import json
+import time
+import argparse
+import logging
+from pathlib import Path
+
+# Add project root to path (go up one level from scripts/)
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+logging.basicConfig(level=logging.WARNING)
+
+def load_questions(path: str):
+    """Questions from a .txt (one per line) or .jsonl ({"question": ...}) file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    if path.endswith('.jsonl'):
+        return [json.loads(line)['question'] for line in lines]
+    return lines
+
+def remote_batch(url: str, questions, concurrency):
+    """Stream records from a server's /chat/batch"""
+    import requests
+    payload = {'questions': questions}
+    if concurrency:
+        payload['concurrency'] = concurrency
+    with requests.post(f"{url.rstrip('/')}/chat/batch", json=payload, stream=True, timeout=(10, 600)) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if line:
+                record = json.loads(line)
+                if not record.get('done'):
+                    yield record
+
+def local_batch(questions, concurrency):
+    """Answer in-process with a local SimpleRAGService"""
+    from services.simple_rag_service import SimpleRAGService
+    service = SimpleRAGService()
+    yield from service.answer_batch(questions, concurrency=concurrency)
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch question answering with NDJSON output")
+    parser.add_argument('questions', help="Questions file (.txt, one per line, or .jsonl with a question field)")
+    parser.add_argument('--url', help="Base URL of a running server; answers locally when omitted")
+    parser.add_argument('--concurrency', type=int, help="LLM generations in flight (default BATCH_CONCURRENCY)")
+    parser.add_argument('--output', help="NDJSON output file (default stdout)")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    if not questions:
+        print("No questions found", file=sys.stderr)
+        return 1
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    start = time.perf_counter()
+    approaches = {}
+    count = errors = 0
+    try:
+        records = remote_batch(args.url, questions, args.concurrency) if args.url else local_batch(questions, args.concurrency)
+        for record in records:
+            count += 1
+            metadata = record.get('metadata', {})
+            if metadata.get('error') and not metadata.get('degraded'):
+                errors += 1
+            approach = metadata.get('approach', 'error')
+            approaches[approach] = approaches.get(approach, 0) + 1
+            output.write(json.dumps(record, ensure_ascii=False) + '\n')
+            output.flush()
+    finally:
+        if args.output:
+            output.close()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"{count}/{len(questions)} answers in {elapsed:.1f}s ({count / elapsed:.2f} q/s), "
+        f"{errors} errors, by approach: {approaches}",
+        file=sys.stderr
+    )
+    return 0 if count == len(questions) and not errors else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""
+Build the FAQ warm cache by running canonical questions through the RAG pipeline offline
+"""
+import sys
+import argparse
+import logging
+from pathlib import Path
+
+# Add project root to path (go up one level from scripts/)
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from services.simple_rag_service import SimpleRAGService
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--questions-file', help="Questions to answer, one per line (default: FAQ_QUESTIONS_PATH)")
+    args = parser.parse_args()
+
+    service = SimpleRAGService()
+    if not service.faq_cache:
+        print("FAQ cache is disabled (FAQ_CACHE_ENABLED=false)")
+        return 1
+
+    if not service.llm_service.is_available():
+        print("Warning: LLM not available, cached answers will be fallback messages")
+
+    questions = service.faq_cache.load_questions(args.questions_file) if args.questions_file else None
+    count = service.faq_cache.build(service._build_faq_answer, questions)
+
+    stats = service.faq_cache.get_stats()
+    print(f"Built {count} FAQ answers for index version {stats['index_version']}")
+    print(f"Coverage of canonical questions: {stats['coverage']:.0%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
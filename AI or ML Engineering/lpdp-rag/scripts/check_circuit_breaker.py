@@ -0,0 +1,108 @@
+"""
+Resilience check for LLMService against the fault-injecting stub server:
+the circuit opens and fails fast, recovers after the cool-down, and hedging
+races a secondary endpoint when the primary is slow
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path (go up one level from scripts/)
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from scripts.stub_llm_server import FaultConfig, start_server
+
+PRIMARY_PORT = 8771
+SECONDARY_PORT = 8772
+
+# Configure before importing the services (settings are read at construction)
+os.environ.update({
+    'GROQ_API_KEY': os.getenv('GROQ_API_KEY', 'stub-key'),
+    'GROQ_BASE_URL': f"http://127.0.0.1:{PRIMARY_PORT}",
+    'LLM_SECONDARY_BASE_URL': f"http://127.0.0.1:{SECONDARY_PORT}",
+    'HEDGE_ENABLED': 'true',
+    'HEDGE_MIN_DELAY': '0.3',
+    'LLM_ADMISSION_ENABLED': 'false',
+    'CB_WINDOW': '10',
+    'CB_MIN_CALLS': '5',
+    'CB_OPEN_SECONDS': '2',
+    'CB_SLOW_CALL_SECONDS': '5',
+})
+
+from services.llm_service import LLMService
+from services.circuit_breaker import CircuitOpen, OPEN, CLOSED
+
+def main():
+    failures = []
+    primary = FaultConfig(latency=0.05)
+    secondary = FaultConfig(latency=0.05)
+    start_server('127.0.0.1', PRIMARY_PORT, primary)
+    start_server('127.0.0.1', SECONDARY_PORT, secondary)
+
+    service = LLMService()
+    if not service.is_available():
+        print("[FAIL] LLMService could not be initialized (is langchain_groq installed?)")
+        return 1
+    breaker = service.breaker
+
+    # 1. Healthy primary: calls succeed and warm up the latency window
+    for _ in range(6):
+        service.invoke("Apa itu LPDP?")
+    if breaker.state != CLOSED:
+        failures.append(f"expected closed circuit while healthy, got {breaker.state}")
+
+    # 2. Primary fails: circuit opens, then calls fail fast without touching the provider
+    primary.update({'error_rate': 1.0})
+    for _ in range(10):
+        try:
+            service.invoke("Apa itu LPDP?")
+        except Exception:
+            pass
+    if breaker.state != OPEN:
+        failures.append(f"expected open circuit after failures, got {breaker.state}")
+
+    sent = primary.snapshot()['requests']
+    start = time.monotonic()
+    try:
+        service.invoke("Apa itu LPDP?")
+        failures.append("expected CircuitOpen while the circuit is open")
+    except CircuitOpen as e:
+        if time.monotonic() - start > 0.05:
+            failures.append("open circuit did not fail fast")
+        if e.retry_after <= 0:
+            failures.append("CircuitOpen carries no retry_after")
+    if primary.snapshot()['requests'] != sent:
+        failures.append("open circuit still sent requests to the provider")
+
+    # 3. Recovery: after the cool-down a successful probe closes the circuit
+    primary.update({'error_rate': 0.0})
+    time.sleep(float(os.environ['CB_OPEN_SECONDS']) + 0.2)
+    service.invoke("Apa itu LPDP?")
+    if breaker.state != CLOSED:
+        failures.append(f"expected circuit to close after a successful probe, got {breaker.state}")
+
+    # 4. Hedging: a slow primary is raced against the secondary, which wins
+    for _ in range(6):
+        service.invoke("Apa itu LPDP?")
+    primary.update({'latency': 3.0})
+    start = time.monotonic()
+    service.invoke("Apa itu LPDP?")
+    elapsed = time.monotonic() - start
+    if service.hedge_stats['secondary_wins'] < 1:
+        failures.append("expected the secondary endpoint to win a hedged call")
+    if elapsed > 1.5:
+        failures.append(f"hedged call took {elapsed:.2f}s despite a fast secondary")
+
+    if failures:
+        for failure in failures:
+            print(f"[FAIL] {failure}")
+        return 1
+
+    print(f"[OK] circuit opened, failed fast and recovered; hedged call answered in {elapsed:.2f}s")
+    print(service.get_resilience_stats())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+Concurrency check for single-flight coalescing in SimpleRAGService
+
+Drives the real SimpleRAGService._invoke_chain and SimpleRAGChain graph
+(tool call, retrieval, generation, checkpointer) with a stub chat model
+injected into LLMService and a stub vector store, so no Groq or Chroma is
+needed. Every answer must be a real generation, not an error or fallback.
+"""
+import os
+import sys
+import time
+import threading
+from pathlib import Path
+
+# Add project root to path (go up one level from scripts/)
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Configure before importing the services (settings are read at construction)
+os.environ.update({
+    'ROUTER_ENABLED': 'false',
+    'QUERY_EXPANSION_ENABLED': 'false',
+    'PARENT_RETRIEVAL_ENABLED': 'false',
+    'HEDGE_ENABLED': 'false',
+    'LLM_ADMISSION_ENABLED': 'false',
+    'SESSION_TOKEN_BUDGET': '0',
+    'DAILY_TOKEN_BUDGET': '0',
+})
+
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage
+
+from core.rag_chain import SimpleRAGChain
+from services.llm_service import LLMService
+from services.simple_rag_service import SimpleRAGService
+from services.request_coalescer import SingleFlight
+from services.pipeline_metrics import get_pipeline_metrics
+from services.token_usage import get_token_usage_tracker
+
+def expected_answer(question: str) -> str:
+    return f"Jawaban untuk: {question}"
+
+class StubChatModel:
+    """Fake chat model: asks for the search tool, then answers slowly; counts generations"""
+
+    def __init__(self, latency: float = 0.3):
+        self.latency = latency
+        self.generations = 0
+        self.tool_calls = 0
+        self._lock = threading.Lock()
+
+    def bind_tools(self, tools):
+        return _StubToolModel(self)
+
+    @staticmethod
+    def _question(messages) -> str:
+        return next(str(m.content) for m in reversed(messages) if isinstance(m, HumanMessage))
+
+    @staticmethod
+    def _usage():
+        return {'input_tokens': 50, 'output_tokens': 10, 'total_tokens': 60}
+
+    def invoke(self, messages):
+        with self._lock:
+            self.generations += 1
+        time.sleep(self.latency)
+        return AIMessage(content=expected_answer(self._question(messages)), usage_metadata=self._usage())
+
+class _StubToolModel:
+    """The stub model with the search tool bound"""
+
+    def __init__(self, model: StubChatModel):
+        self.model = model
+
+    def invoke(self, messages):
+        with self.model._lock:
+            self.model.tool_calls += 1
+            call_id = f"call_{self.model.tool_calls}"
+        return AIMessage(
+            content="",
+            tool_calls=[{'name': 'search', 'args': {'query': self.model._question(messages)}, 'id': call_id}],
+            usage_metadata=self.model._usage()
+        )
+
+class StubVectorService:
+    """In-memory stand-in for VectorStoreService returning one fixed chunk"""
+
+    def embed_query(self, text: str):
+        return [1.0, 0.0]
+
+    def embed_queries(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def search_by_vector(self, embedding, k: int = 5):
+        return [Document(
+            page_content="Pendaftaran beasiswa LPDP dilakukan secara daring.",
+            metadata={'source': 'stub.pdf', 'title': 'Stub', 'page': 0, 'chunk_id': 'stub-1', 'relevance_score': 0.9}
+        )]
+
+def build_service(llm: StubChatModel) -> SimpleRAGService:
+    """SimpleRAGService around a real SimpleRAGChain whose LLMService uses the stub model"""
+    llm_service = LLMService()
+    llm_service.llm = llm
+    llm_service.secondary_llm = None
+    vector_service = StubVectorService()
+
+    service = SimpleRAGService.__new__(SimpleRAGService)
+    service.max_input_tokens = 1000
+    service.overload_mode = 'degraded'
+    service.vector_service = vector_service
+    service.llm_service = llm_service
+    service.rag_chain = SimpleRAGChain(vector_service, llm_service=llm_service)
+    service.fact_index = None
+    service.faq_cache = None
+    service.domain_gate = None
+    service.coalescer = SingleFlight()
+    service.metrics = get_pipeline_metrics()
+    service.profiler = None
+    service.token_usage = get_token_usage_tracker()
+    return service
+
+def run_concurrently(service: SimpleRAGService, questions):
+    """Ask each (question, session) pair from its own thread, all released at once"""
+    barrier = threading.Barrier(len(questions))
+    results = [None] * len(questions)
+
+    def worker(idx, question, session_id):
+        barrier.wait()
+        results[idx] = service.get_answer(question, session_id)
+
+    threads = [threading.Thread(target=worker, args=(i, q, s)) for i, (q, s) in enumerate(questions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def check_generated(results, questions, failures, label: str):
+    """Every result must be the stub's generation with a cited source, never an error or fallback"""
+    for result, (question, session_id) in zip(results, questions):
+        metadata = result.get('metadata', {})
+        if metadata.get('error') or metadata.get('fallback') or metadata.get('approach') != 'stateful_chain':
+            failures.append(f"{label}: {session_id} got a non-generated answer ({metadata.get('approach')}): "
+                            f"{result.get('answer')!r}")
+        elif result.get('answer') != expected_answer(question):
+            failures.append(f"{label}: {session_id} got {result.get('answer')!r}")
+        elif not result.get('sources'):
+            failures.append(f"{label}: {session_id} answer has no sources")
+
+def main():
+    failures = []
+
+    # 1. Identical first-turn questions from many sessions -> one generation
+    llm = StubChatModel()
+    service = build_service(llm)
+    concurrency = 25
+    questions = [("Apa syarat beasiswa reguler?", f"s{i}") for i in range(concurrency)]
+    results = run_concurrently(service, questions)
+    check_generated(results, questions, failures, "identical")
+    stats = service.coalescer.get_stats()
+    if llm.generations != 1:
+        failures.append(f"expected 1 generation for identical questions, got {llm.generations}")
+    if stats['coalesced'] != concurrency - 1:
+        failures.append(f"expected {concurrency - 1} coalesced requests, got {stats['coalesced']}")
+    if any(r['metadata'].get('session_id') != f"s{i}" for i, r in enumerate(results)):
+        failures.append("coalesced results carry the wrong session_id")
+    if any(not service.rag_chain.has_history(f"s{i}") for i in range(concurrency)):
+        failures.append("coalesced sessions are missing the exchange in their history")
+
+    # 2. Normalization: case and punctuation variants coalesce too
+    llm = StubChatModel()
+    service = build_service(llm)
+    questions = [("Kapan pendaftaran dibuka?", "a"), ("kapan PENDAFTARAN dibuka", "b")]
+    results = run_concurrently(service, questions)
+    if llm.generations != 1:
+        failures.append(f"expected normalized variants to coalesce, got {llm.generations} generations")
+    if any(r.get('metadata', {}).get('error') or r.get('metadata', {}).get('fallback') for r in results):
+        failures.append("normalized variants got an error or fallback answer")
+
+    # 3. Sessions with prior history are never coalesced
+    llm = StubChatModel()
+    service = build_service(llm)
+    service.rag_chain.record_exchange("old", "halo", "halo juga")
+    questions = [("Apa itu LPDP?", "new"), ("Apa itu LPDP?", "old")]
+    results = run_concurrently(service, questions)
+    check_generated(results, questions, failures, "follow-up")
+    if llm.generations != 2:
+        failures.append(f"expected follow-up turn to bypass coalescing, got {llm.generations} generations")
+
+    if failures:
+        for failure in failures:
+            print(f"[FAIL] {failure}")
+        return 1
+
+    print(f"[OK] {concurrency} concurrent identical questions served by 1 generation through the real chain")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""
+Intent check for the structured fact index: fact questions are answered from
+the JSON files, and questions that only share a keyword with a fact (syarat,
+dokumen, wawancara, another party's contact, a role or contact field that is
+mentioned but not asked for) fall through to RAG
+"""
+import sys
+from pathlib import Path
+
+# Add project root to path (go up one level from scripts/)
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from services.fact_index import StructuredFactIndex
+
+# (question, expected intent or None)
+CASES = [
+    ("Kapan pendaftaran LPDP batch 1 ditutup?", "registration_schedule"),
+    ("Kapan pengumuman hasil batch 2?", "registration_schedule"),
+    ("Kapan jadwal pendaftaran LPDP 2025?", "registration_schedule"),
+    ("Berapa nomor telepon CS LPDP?", "phone"),
+    ("Apa email customer service LPDP?", "email"),
+    ("Dimana alamat kantor LPDP?", "address"),
+    ("Siapa direktur utama LPDP?", "president_director"),
+    ("Siapa kepala divisi keuangan?", "division_head"),
+    ("Apa website resmi LPDP?", "website"),
+    # Share a keyword with a fact but ask for something else
+    ("Apa syarat pendaftaran beasiswa reguler batch 2?", None),
+    ("Apa saja dokumen pendaftaran untuk batch 1?", None),
+    ("Kapan jadwal wawancara seleksi substansi?", None),
+    ("Bagaimana cara hubungi kampus tujuan lewat email?", None),
+    ("Berapa nomor pendaftaran LPDP saya?", None),
+    ("Kapan kuliah dimulai setelah lulus seleksi?", None),
+    ("Apa itu beasiswa LPDP?", None),
+    ("Apakah direktur utama LPDP pernah kuliah di luar negeri?", None),
+    ("Bagaimana peran direktur utama dalam seleksi?", None),
+    ("Apakah divisi keuangan menangani pencairan dana?", None),
+    ("Bagaimana cara daftar akun di web LPDP?", None),
+]
+
+def main():
+    index = StructuredFactIndex(str(project_root / 'data' / 'documents'))
+    failures = []
+    for question, expected in CASES:
+        fact = index.lookup(question)
+        intent = fact['intent'] if fact else None
+        if intent != expected:
+            failures.append(f"{question!r}: expected {expected}, got {intent}")
+
+    if failures:
+        for failure in failures:
+            print(f"[FAIL] {failure}")
+        return 1
+    print(f"[OK] {len(CASES)} fact index cases")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
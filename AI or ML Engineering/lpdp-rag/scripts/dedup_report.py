@@ -0,0 +1,96 @@
+"""
+Report index size reduction and distinct content per retrieval from near-duplicate elimination
+"""
+import os
+import sys
+import glob
+import json
+import argparse
+import logging
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path (go up one level from scripts/)
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from services.vector_store import VectorStoreService
+from services.deduplication import ChunkDeduplicator
+
+logging.basicConfig(level=logging.WARNING)
+
+SAMPLE_QUERIES = [
+    "Apa saja persyaratan umum pendaftaran beasiswa LPDP?",
+    "Dokumen apa yang harus diunggah saat pendaftaran?",
+    "Bagaimana tahapan seleksi beasiswa LPDP?",
+    "Berapa skor IELTS minimal untuk beasiswa reguler?",
+    "Apa saja komponen dana beasiswa yang diberikan?",
+    "Bagaimana cara menghubungi LPDP?",
+    "Apa kewajiban penerima beasiswa setelah lulus?",
+    "Berapa batas usia pendaftar program doktor?",
+]
+
+def top_k(query_vectors: np.ndarray, chunk_vectors: np.ndarray, k: int) -> np.ndarray:
+    """Return indices of the top-k chunks by cosine similarity for each query"""
+    scores = query_vectors @ chunk_vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+def normalize(vectors) -> np.ndarray:
+    """L2-normalize embedding vectors"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--documents-dir', default=str(project_root / "data" / "documents"))
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--judge-threshold', type=float, default=0.7,
+                        help="Looser MinHash threshold used to judge whether two results carry the same content")
+    args = parser.parse_args()
+
+    service = VectorStoreService()
+
+    documents = []
+    for file_path in sorted(glob.glob(os.path.join(args.documents_dir, "*.pdf")) +
+                            glob.glob(os.path.join(args.documents_dir, "*.json"))):
+        documents.extend(service._load_document(file_path))
+
+    chunks = service.text_splitter.split_documents(documents)
+    deduplicated = service.deduplicator.deduplicate(chunks)
+    dedup_stats = dict(service.deduplicator.last_stats)
+
+    # Independent judge: cluster the full chunk set with a looser threshold
+    judge = ChunkDeduplicator(threshold=args.judge_threshold)
+    cluster_of = {}
+    for cluster_id, members in enumerate(judge.find_clusters([chunk.page_content for chunk in chunks])):
+        for idx in members:
+            cluster_of[chunks[idx].page_content] = cluster_id
+
+    print(f"Embedding {len(chunks)} chunks...")
+    chunk_vectors = normalize(service.embeddings.embed_documents([chunk.page_content for chunk in chunks]))
+    text_to_row = {chunk.page_content: row for row, chunk in enumerate(chunks)}
+    dedup_rows = np.array([text_to_row[doc.page_content] for doc in deduplicated])
+    query_vectors = normalize(service.embeddings.embed_documents(SAMPLE_QUERIES))
+
+    def distinct_per_retrieval(rows: np.ndarray) -> float:
+        results = top_k(query_vectors, chunk_vectors[rows], args.k)
+        distinct = [
+            len({cluster_of[chunks[rows[idx]].page_content] for idx in result})
+            for result in results
+        ]
+        return float(np.mean(distinct))
+
+    report = {
+        'index_size': dedup_stats,
+        'k': args.k,
+        'distinct_content_per_retrieval': {
+            'before': distinct_per_retrieval(np.arange(len(chunks))),
+            'after': distinct_per_retrieval(dedup_rows)
+        }
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
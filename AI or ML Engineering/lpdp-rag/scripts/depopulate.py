@@ -177,6 +177,23 @@ def clear_langgraph_checkpoints():
         logger.error(f"[FAIL] Error clearing LangGraph checkpoints: {str(e)}")
         return False
 
+def clear_parent_store():
+    """Remove the small-to-big parent store (parent spans and the child -> parent map)"""
+    try:
+        db_path = os.getenv('PARENT_STORE_PATH', './data/cache/parents.sqlite')
+        
+        if not os.path.exists(db_path):
+            logger.info(f"Parent store does not exist: {db_path}")
+            return True
+        
+        os.remove(db_path)
+        logger.info(f"[OK] Removed parent store: {db_path}")
+        return True
+        
+    except Exception as e:
+        logger.error(f"[FAIL] Error removing parent store: {str(e)}")
+        return False
+
 def clear_all():
     """Clear all data - ChromaDB and LangGraph checkpoints"""
     logger.info("Starting complete data cleanup...")
@@ -192,6 +209,10 @@ def clear_all():
     if not clear_langgraph_checkpoints():
         success = False
     
+    # Clear parent spans of the removed child chunks
+    if not clear_parent_store():
+        success = False
+    
     if success:
         logger.info("[SUCCESS] All data successfully cleared!")
         logger.info("ChromaDB schema has been reset to fix compatibility issues")
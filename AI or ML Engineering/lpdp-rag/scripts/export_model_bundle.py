@@ -0,0 +1,74 @@
+"""
+Export the embedding model into a versioned, checksummed local bundle, or verify one
+
+    python scripts/export_model_bundle.py --output ./models
+    python scripts/export_model_bundle.py --verify ./models/paraphrase-multilingual-MiniLM-L12-v2-<version>
+
+Bake the bundle into the image and set EMBEDDING_BUNDLE_PATH to its directory;
+VectorStoreService then starts without any Hugging Face hub access.
+"""
+import sys
+import time
+import argparse
+import logging
+from pathlib import Path
+
+# Add project root to path (go up one level from scripts/)
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from services.model_bundle import (
+    DEFAULT_EMBEDDING_MODEL, ModelBundleError, export_bundle, read_manifest, verify_bundle, load_bundle_embeddings
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def verify(bundle_path: str, load: bool) -> int:
+    """Check checksums and optionally load the bundle offline"""
+    try:
+        manifest = read_manifest(bundle_path)
+        problems = verify_bundle(bundle_path, checksums=True)
+    except ModelBundleError as e:
+        print(f"[FAIL] {e}")
+        return 1
+    if problems:
+        print(f"[FAIL] {bundle_path}: {len(problems)} problems")
+        for problem in problems:
+            print(f"  {problem}")
+        return 1
+    print(f"[OK] {manifest['model_name']} {manifest['version']}: {len(manifest['files'])} files match the manifest")
+
+    if load:
+        start = time.perf_counter()
+        embeddings, _ = load_bundle_embeddings(bundle_path)
+        dimension = len(embeddings.embed_query("persyaratan beasiswa LPDP"))
+        print(f"[OK] loaded offline in {time.perf_counter() - start:.2f}s, dimension {dimension}")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or verify an offline embedding model bundle")
+    parser.add_argument('--model', default=DEFAULT_EMBEDDING_MODEL, help="Hub model id or local model path")
+    parser.add_argument('--output', default='./models', help="Directory that holds versioned bundles")
+    parser.add_argument('--version', help="Bundle version (default: digest of the exported files)")
+    parser.add_argument('--verify', metavar='BUNDLE', help="Verify an existing bundle instead of exporting")
+    parser.add_argument('--load', action='store_true', help="With --verify, also load the model offline")
+    args = parser.parse_args()
+
+    if args.verify:
+        return verify(args.verify, args.load)
+
+    try:
+        bundle_path = export_bundle(args.model, args.output, args.version)
+    except ModelBundleError as e:
+        logger.error(f"Export failed: {e}")
+        return 1
+
+    manifest = read_manifest(bundle_path)
+    total_mb = sum(info['size'] for info in manifest['files'].values()) / 2**20
+    print(f"Bundle: {bundle_path} ({len(manifest['files'])} files, {total_mb:.0f}MB)")
+    print(f"Set EMBEDDING_BUNDLE_PATH={Path(bundle_path).resolve()}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
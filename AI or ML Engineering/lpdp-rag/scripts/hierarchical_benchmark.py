@@ -0,0 +1,88 @@
+"""
+Compare latency and source recall of flat vs two-stage (document -> chunk) retrieval
+"""
+import sys
+import json
+import time
+import argparse
+import logging
+from pathlib import Path
+
+# Add project root to path (go up one level from scripts/)
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from services.vector_store import VectorStoreService
+
+logging.basicConfig(level=logging.WARNING)
+
+# (question, expected source document)
+QUERIES = [
+    ("Berapa skor IELTS minimal untuk beasiswa reguler?", "buku_panduan_beasiswa_reguler.pdf"),
+    ("Apa syarat usia untuk beasiswa dokter spesialis?", "buku_panduan_beasiswa_dokter_spesialis.pdf"),
+    ("Siapa yang dapat mendaftar beasiswa daerah afirmasi?", "buku_panduan_beasiswa_daerah_afirmasi.pdf"),
+    ("Apakah PNS boleh mendaftar beasiswa LPDP?", "buku_panduan_beasiswa_pns_tni_polri.pdf"),
+    ("Syarat beasiswa untuk penyandang disabilitas", "buku_panduan_beasiswa_penyandang_disabilitas.pdf"),
+    ("Program beasiswa kewirausahaan untuk startup", "buku_panduan_beasiswa_kewirausahaan.pdf"),
+    ("Beasiswa untuk warga Papua", "buku_panduan_beasiswa_warga_papua.pdf"),
+    ("Apa itu beasiswa parsial LPDP?", "buku_panduan_beasiswa_parsial.pdf"),
+    ("Beasiswa pendidikan kader ulama", "buku_panduan_beasiswa_pendidikan_ulama.pdf"),
+    ("Beasiswa doktor riset kolaborasi", "buku_panduan_beasiswa_doktor_riset.pdf"),
+    ("Siapa Direktur Utama LPDP?", "struktur_organisasi.json"),
+    ("Kapan pendaftaran batch 2 dibuka?", "additional_info.json"),
+]
+
+def timed(fn, repeats):
+    """Run fn repeatedly and return (last result, per-call latencies in ms)"""
+    latencies = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return result, latencies
+
+def percentile(values, q):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--top-docs', type=int, default=3, help="M documents selected in stage one")
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    service = VectorStoreService()
+    if not service.document_index.is_populated():
+        print("Document summary index is empty; re-run scripts/simple_populate.py first")
+        return 1
+
+    results = {'flat': {'latencies': [], 'hits': 0}, 'hierarchical': {'latencies': [], 'hits': 0}}
+    for question, expected_source in QUERIES:
+        embedding = service.embed_query(question)
+        strategies = {
+            'flat': lambda: service.similarity_search_by_vector(embedding, k=args.k),
+            'hierarchical': lambda: service.hierarchical_search_by_vector(embedding, k=args.k, top_docs=args.top_docs),
+        }
+        for name, search in strategies.items():
+            documents, latencies = timed(search, args.repeats)
+            results[name]['latencies'].extend(latencies)
+            sources = {doc.metadata.get('source') for doc in documents}
+            sources.update(s.strip() for doc in documents for s in doc.metadata.get('sources', '').split(';') if s.strip())
+            if expected_source in sources:
+                results[name]['hits'] += 1
+
+    report = {'k': args.k, 'top_docs': args.top_docs, 'queries': len(QUERIES)}
+    for name, data in results.items():
+        report[name] = {
+            'recall_at_k': data['hits'] / len(QUERIES),
+            'latency_ms_p50': percentile(data['latencies'], 50),
+            'latency_ms_p95': percentile(data['latencies'], 95),
+        }
+    print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
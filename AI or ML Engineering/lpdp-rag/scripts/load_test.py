@@ -0,0 +1,284 @@
+"""
+Closed-loop load generator for the running app: virtual users hold real cookie
+sessions and walk through multi-turn LPDP conversations on /chat with think time
+
+Start the stub LLM and the app against it, then drive load:
+    python scripts/stub_llm_server.py --distribution lognormal --latency 0.6 --jitter 0.4 --tokens-per-second 250
+    GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=stub gunicorn -c gunicorn.conf.py
+    python scripts/load_test.py --url http://127.0.0.1:5000 --users 20 --duration 120 --match gunicorn
+
+Reports throughput, latency percentiles (overall, per turn and per answer approach),
+status/error rates and, over time, request rate, p95 and worker RSS. The app has no
+streaming endpoint; the stub's `stream: true` support covers streaming LLM clients.
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import psutil
+import requests
+
+# Add project root to path (go up one level from scripts/)
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Multi-turn sessions: a first question followed by follow-ups that rely on chat history
+SCENARIOS = [
+    ["Apa saja persyaratan umum beasiswa LPDP?", "Bagaimana dengan batas usianya?", "Kalau skor IELTS minimal?"],
+    ["Apa itu beasiswa daerah afirmasi?", "Daerah mana saja yang termasuk?", "Apa persyaratan khususnya?"],
+    ["Apakah PNS boleh mendaftar beasiswa LPDP?", "Berapa batas usia untuk PNS?"],
+    ["Komponen dana apa saja yang ditanggung LPDP?", "Apakah ada tunjangan keluarga?", "Untuk jenjang apa saja?"],
+    ["Bagaimana tahapan seleksi beasiswa LPDP?", "Kapan seleksi bakat skolastik dilaksanakan?"],
+    ["Apa kewajiban penerima beasiswa setelah lulus?", "Berapa lama harus kembali ke Indonesia?"],
+    ["Siapa Direktur Utama LPDP?"],
+    ["Berapa nomor telepon layanan LPDP?", "Jam berapa layanan buka?"],
+    ["What is the minimum IELTS score for the regular scholarship?", "And for doctoral applicants?"],
+    ["Apa itu beasiswa kewirausahaan?", "Apakah harus sudah punya usaha?", "Berapa lama masa studinya?"],
+]
+
+def percentile(values, q):
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+def summarize(latencies):
+    """Latency percentiles in milliseconds"""
+    return {
+        'count': len(latencies),
+        'p50_ms': percentile(latencies, 50),
+        'p90_ms': percentile(latencies, 90),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': max(latencies) if latencies else None,
+    }
+
+class Recorder:
+    """Thread-safe request log"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records = []
+
+    def add(self, **record):
+        with self.lock:
+            self.records.append(record)
+
+    def since(self, start: float):
+        with self.lock:
+            return [r for r in self.records if r['end'] >= start]
+
+class MemorySampler(threading.Thread):
+    """Samples RSS of the app processes (a master pid and its children, or processes matching a name)"""
+
+    def __init__(self, pid: int = None, match: str = None, interval: float = 5.0):
+        super().__init__(name="rss-sampler", daemon=True)
+        self.pid = pid
+        self.match = match
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def _processes(self):
+        if self.pid:
+            try:
+                master = psutil.Process(self.pid)
+                return [master] + master.children(recursive=True)
+            except psutil.NoSuchProcess:
+                return []
+        return [p for p in psutil.process_iter(['cmdline'])
+                if self.match in ' '.join(p.info['cmdline'] or []) and p.pid != psutil.Process().pid]
+
+    def sample(self):
+        workers = {}
+        for process in self._processes():
+            try:
+                workers[process.pid] = round(process.memory_info().rss / 2**20, 1)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return {'t': round(time.time(), 1), 'total_rss_mb': round(sum(workers.values()), 1), 'rss_mb': workers}
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.samples.append(self.sample())
+            self.stopped.wait(self.interval)
+
+def virtual_user(user_id: int, args, deadline: float, recorder: Recorder, scenarios):
+    """One simulated visitor: open /chat for a session cookie, ask a conversation, clear, repeat"""
+    rng = random.Random(args.seed + user_id)
+    while time.time() < deadline:
+        http = requests.Session()
+        try:
+            http.get(f"{args.url}/chat", timeout=args.timeout)
+        except requests.RequestException:
+            recorder.add(user=user_id, turn=0, status='connect_error', latency_ms=None, end=time.time(), approach=None)
+            time.sleep(1)
+            continue
+
+        for turn, question in enumerate(rng.choice(scenarios), start=1):
+            if time.time() >= deadline:
+                break
+            start = time.time()
+            try:
+                response = http.post(f"{args.url}/chat", json={'question': question}, timeout=args.timeout)
+                status = response.status_code
+                approach = None
+                if status == 200:
+                    approach = response.json().get('metadata', {}).get('approach')
+            except requests.Timeout:
+                status, approach = 'timeout', None
+            except requests.RequestException:
+                status, approach = 'connect_error', None
+            end = time.time()
+            recorder.add(user=user_id, turn=turn, status=status, latency_ms=round((end - start) * 1000, 1),
+                         end=end, approach=approach)
+
+            # The app allows one question per 2 s per session; users read the answer first
+            time.sleep(max(args.min_think, rng.expovariate(1.0 / args.think_time)))
+
+        if args.clear_sessions:
+            try:
+                http.post(f"{args.url}/chat/clear", timeout=args.timeout)
+            except requests.RequestException:
+                pass
+        http.close()
+
+def build_timeline(records, start: float, interval: float, memory_samples):
+    """Per-interval request rate, p95 and error count, joined with the RSS sample of that interval"""
+    buckets = defaultdict(list)
+    for record in records:
+        buckets[int((record['end'] - start) // interval)].append(record)
+    memory = {int((s['t'] - start) // interval): s['total_rss_mb'] for s in memory_samples}
+
+    timeline = []
+    for index in range(max(list(buckets) + list(memory) + [0]) + 1):
+        bucket = buckets.get(index, [])
+        ok = [r['latency_ms'] for r in bucket if r['status'] == 200]
+        timeline.append({
+            't_s': round(index * interval, 1),
+            'rps': round(len(bucket) / interval, 2),
+            'p95_ms': percentile(ok, 95),
+            'errors': sum(1 for r in bucket if r['status'] != 200),
+            'total_rss_mb': memory.get(index),
+        })
+    return timeline
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-turn /chat load generator")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--users', type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument('--ramp-up', type=float, default=10.0, help="Seconds over which users start")
+    parser.add_argument('--duration', type=float, default=60.0, help="Test length in seconds")
+    parser.add_argument('--think-time', type=float, default=4.0, help="Mean pause between turns in seconds")
+    parser.add_argument('--min-think', type=float, default=2.1, help="Minimum pause (the app rate-limits to 1 per 2 s)")
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--scenarios', help="JSONL file with {\"turns\": [...]} per conversation")
+    parser.add_argument('--clear-sessions', action='store_true', help="POST /chat/clear after each conversation")
+    parser.add_argument('--pid', type=int, help="App master pid for RSS sampling (children included)")
+    parser.add_argument('--match', help="Sample RSS of processes whose command line contains this text")
+    parser.add_argument('--interval', type=float, default=5.0, help="Timeline and RSS sampling interval")
+    parser.add_argument('--stub-url', help="Stub LLM base URL, to report LLM calls per request")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    scenarios = SCENARIOS
+    if args.scenarios:
+        with open(args.scenarios, 'r', encoding='utf-8') as f:
+            scenarios = [json.loads(line)['turns'] for line in f if line.strip()]
+
+    stub_before = None
+    if args.stub_url:
+        stub_before = requests.get(f"{args.stub_url}/control", timeout=5).json()
+
+    sampler = None
+    if args.pid or args.match:
+        sampler = MemorySampler(args.pid, args.match, args.interval)
+        sampler.start()
+
+    recorder = Recorder()
+    start = time.time()
+    deadline = start + args.duration
+    threads = []
+    for user_id in range(args.users):
+        thread = threading.Thread(target=virtual_user, args=(user_id, args, deadline, recorder, scenarios), daemon=True)
+        thread.start()
+        threads.append(thread)
+        time.sleep(args.ramp_up / max(1, args.users))
+
+    for thread in threads:
+        thread.join(timeout=max(0.0, deadline - time.time()) + args.timeout + 10)
+    elapsed = time.time() - start
+    if sampler:
+        sampler.stopped.set()
+        sampler.join()
+
+    # Turn 0 records are failed session opens; they count as errors but carry no latency
+    records = recorder.since(start)
+    ok = [r for r in records if r['status'] == 200]
+    statuses = Counter(str(r['status']) for r in records)
+    report = {
+        'config': {key: value for key, value in vars(args).items() if key not in ('output',)},
+        'elapsed_s': round(elapsed, 1),
+        'requests': len(records),
+        'throughput_rps': round(len(ok) / elapsed, 2),
+        'error_rate': round(1 - len(ok) / len(records), 4) if records else None,
+        'status_counts': dict(statuses),
+        'latency': summarize([r['latency_ms'] for r in ok]),
+        'latency_by_turn': {
+            str(turn): summarize([r['latency_ms'] for r in ok if r['turn'] == turn])
+            for turn in sorted({r['turn'] for r in ok})
+        },
+        'latency_by_approach': {
+            approach: summarize([r['latency_ms'] for r in ok if str(r['approach']) == approach])
+            for approach in sorted({str(r['approach']) for r in ok})
+        },
+        'timeline': build_timeline(records, start, args.interval, sampler.samples if sampler else []),
+    }
+    if sampler and sampler.samples:
+        report['rss_mb'] = {
+            'start': sampler.samples[0]['total_rss_mb'],
+            'end': sampler.samples[-1]['total_rss_mb'],
+            'max': max(s['total_rss_mb'] for s in sampler.samples),
+            'processes': len(sampler.samples[-1]['rss_mb']),
+        }
+    if stub_before:
+        stub_after = requests.get(f"{args.stub_url}/control", timeout=5).json()
+        llm_calls = stub_after['requests'] - stub_before['requests']
+        report['llm'] = {
+            'calls': llm_calls,
+            'calls_per_request': round(llm_calls / len(records), 2) if records else None,
+            'completion_tokens': stub_after['completion_tokens'] - stub_before['completion_tokens'],
+        }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    latency = report['latency']
+    print(f"{report['requests']} requests in {report['elapsed_s']}s from {args.users} users: "
+          f"{report['throughput_rps']} ok/s, error rate {report['error_rate']}")
+    print(f"status: {report['status_counts']}")
+    if latency['count']:
+        print(f"latency ms p50 {latency['p50_ms']}  p90 {latency['p90_ms']}  p95 {latency['p95_ms']}  "
+              f"p99 {latency['p99_ms']}  max {latency['max_ms']}")
+    for approach, stats in report['latency_by_approach'].items():
+        print(f"  {approach:22s} n={stats['count']:<5d} p50 {stats['p50_ms']}  p95 {stats['p95_ms']}")
+    if 'rss_mb' in report:
+        rss = report['rss_mb']
+        print(f"RSS MB start {rss['start']}  end {rss['end']}  max {rss['max']} ({rss['processes']} processes)")
+    if 'llm' in report:
+        print(f"LLM calls {report['llm']['calls']} ({report['llm']['calls_per_request']} per request)")
+    print(f"\n{'t(s)':>6s} {'rps':>6s} {'p95 ms':>8s} {'errors':>6s} {'RSS MB':>8s}")
+    for row in report['timeline']:
+        print(f"{row['t_s']:6.0f} {row['rps']:6.2f} {str(row['p95_ms']):>8s} {row['errors']:6d} {str(row['total_rss_mb']):>8s}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
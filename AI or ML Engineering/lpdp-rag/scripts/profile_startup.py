@@ -0,0 +1,165 @@
+"""
+Startup profiler: parses `python -X importtime` for the app import and records
+per-component init timings of SimpleRAGService, each in a fresh interpreter
+
+    python scripts/profile_startup.py
+    python scripts/profile_startup.py --json > startup_baseline.json
+    python scripts/profile_startup.py --baseline startup_baseline.json --max-regression 20
+"""
+import sys
+import json
+import time
+import argparse
+import subprocess
+from collections import defaultdict
+from pathlib import Path
+
+# Add project root to path (go up one level from scripts/)
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+def parse_importtime(stderr: str):
+    """Return (per-module cumulative us, per-top-level-package self us) from -X importtime output"""
+    modules = {}
+    packages = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+        except ValueError:
+            continue
+        name = name.strip()
+        modules[name] = max(modules.get(name, 0), cumulative_us)
+        packages[name.split('.')[0]] += self_us
+    return modules, dict(packages)
+
+def profile_imports(target: str):
+    """Import the target module in a fresh interpreter with -X importtime"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+        cwd=str(project_root), capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"import {target} failed:\n{result.stderr[-2000:]}")
+    modules, packages = parse_importtime(result.stderr)
+    return {
+        'target': target,
+        'wall_ms': round(wall_ms, 1),
+        'total_import_ms': round(modules.get(target, 0) / 1000, 1),
+        'packages_ms': {name: round(us / 1000, 1) for name, us in packages.items()},
+        'modules_cumulative_ms': {name: round(us / 1000, 1) for name, us in modules.items()},
+    }
+
+def measure_components():
+    """Child mode: build SimpleRAGService and print its init timings as JSON"""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    start = time.perf_counter()
+    from services.simple_rag_service import SimpleRAGService
+    import_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    service = SimpleRAGService()
+    init_ms = (time.perf_counter() - start) * 1000
+
+    print(json.dumps({
+        'import_ms': round(import_ms, 1),
+        'init_ms': round(init_ms, 1),
+        'components_ms': service.init_timings,
+        'loaded_optional': sorted(name for name in ('bs4', 'langsmith', 'deep_translator',
+                                                    'langchain_community.document_loaders')
+                                  if name in sys.modules),
+    }))
+
+def profile_components():
+    """Run the component measurement in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, __file__, '--child'],
+        cwd=str(project_root), capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"service init failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def find_regressions(report, baseline, max_regression: float, min_ms: float):
+    """Compare headline timings against a baseline; returns a list of messages"""
+    def flatten(data):
+        values = {'import.total_ms': data['imports']['total_import_ms']}
+        for name, ms in data['imports']['packages_ms'].items():
+            values[f'import.{name}'] = ms
+        if data.get('components'):
+            values['init.total_ms'] = data['components']['init_ms']
+            for name, ms in data['components']['components_ms'].items():
+                values[f'init.{name}'] = ms
+        return values
+
+    current, previous = flatten(report), flatten(baseline)
+    regressions = []
+    for key, before in previous.items():
+        after = current.get(key)
+        if after is None or after < min_ms:
+            continue
+        limit = before * (1 + max_regression / 100)
+        if after > limit and after - before >= min_ms:
+            regressions.append(f"{key}: {before:.1f}ms -> {after:.1f}ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile lpdp-rag startup time")
+    parser.add_argument('--target', default='app', help="Module to import with -X importtime")
+    parser.add_argument('--top', type=int, default=15, help="Number of packages to show")
+    parser.add_argument('--skip-init', action='store_true', help="Only profile imports (no model/index loading)")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    parser.add_argument('--baseline', help="Previous --json report to compare against")
+    parser.add_argument('--max-regression', type=float, default=20.0, help="Allowed slowdown in percent")
+    parser.add_argument('--min-ms', type=float, default=20.0, help="Ignore entries faster than this")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure_components()
+        return 0
+
+    report = {
+        'python': sys.version.split()[0],
+        'imports': profile_imports(args.target),
+        'components': None if args.skip_init else profile_components(),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        imports = report['imports']
+        print(f"import {imports['target']}: {imports['total_import_ms']:.0f}ms "
+              f"(interpreter wall {imports['wall_ms']:.0f}ms)")
+        print(f"\n{'package':32s} {'self ms':>10s}")
+        ranked = sorted(imports['packages_ms'].items(), key=lambda item: item[1], reverse=True)
+        for name, ms in ranked[:args.top]:
+            print(f"{name:32s} {ms:10.1f}")
+
+        components = report['components']
+        if components:
+            print(f"\nSimpleRAGService(): {components['init_ms']:.0f}ms")
+            for name, ms in components['components_ms'].items():
+                print(f"  {name:30s} {ms:10.1f}")
+            print(f"optional modules loaded: {', '.join(components['loaded_optional']) or 'none'}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = find_regressions(report, baseline, args.max_regression, args.min_ms)
+        if regressions:
+            print(f"\nStartup regressions over {args.max_regression:.0f}%:", file=sys.stderr)
+            for message in regressions:
+                print(f"  {message}", file=sys.stderr)
+            return 1
+        print(f"\nNo startup regressions over {args.max_regression:.0f}% against {args.baseline}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+"""
+Retrieval quality and latency benchmark against the versioned golden set
+
+Reports recall@k, MRR and nDCG@k (per page when the golden entry names a page,
+per source otherwise), latency p50/p95/p99 of query embedding,
+VectorStoreService.similarity_search and end-to-end retrieval (router +
+hierarchical search, as the RAG chain does), and - with --build - embedding and
+index build times of a fresh index from data/documents. Runs without network:
+the embedding model must be in the local cache or in EMBEDDING_BUNDLE_PATH.
+
+    python scripts/retrieval_benchmark.py --build --output runs/baseline.json
+    CHUNK_SIZE=600 python scripts/retrieval_benchmark.py --build --compare runs/baseline.json
+"""
+import os
+import sys
+import json
+import math
+import time
+import hashlib
+import argparse
+import logging
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to path (go up one level from scripts/)
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from services.model_bundle import disable_hub_access
+
+logging.basicConfig(level=logging.WARNING)
+
+DEFAULT_GOLDEN = project_root / 'data' / 'eval' / 'retrieval_golden_v1.jsonl'
+
+def load_golden(path: Path):
+    """Golden rows: {id, lang, question, relevant: [{source, page?, grade}]}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def percentile(values, q):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+def latency_summary(latencies):
+    """p50/p95/p99/mean in milliseconds"""
+    return {
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'mean_ms': round(sum(latencies) / len(latencies), 2),
+    }
+
+def matches(metadata, target):
+    """Does a retrieved chunk satisfy a golden entry (same source, and same page when given)?"""
+    sources = {metadata.get('source')}
+    sources.update(s.strip() for s in str(metadata.get('sources', '')).split(';') if s.strip())
+    if target['source'] not in sources:
+        return False
+    return 'page' not in target or metadata.get('page') == target['page']
+
+def score_ranking(documents, relevant, k):
+    """recall@k, reciprocal rank and nDCG@k for one ranked list; each golden entry counts once"""
+    found = set()
+    first_hit = None
+    dcg = 0.0
+    for rank, doc in enumerate(documents[:k]):
+        new = [i for i, target in enumerate(relevant) if i not in found and matches(doc.metadata, target)]
+        if new:
+            first_hit = rank if first_hit is None else first_hit
+            found.update(new)
+            grade = max(relevant[i].get('grade', 1) for i in new)
+            dcg += (2 ** grade - 1) / math.log2(rank + 2)
+
+    ideal = sorted((target.get('grade', 1) for target in relevant), reverse=True)[:k]
+    idcg = sum((2 ** grade - 1) / math.log2(rank + 2) for rank, grade in enumerate(ideal))
+    return {
+        'recall': len(found) / len(relevant),
+        'rr': 0.0 if first_hit is None else 1.0 / (first_hit + 1),
+        'ndcg': dcg / idcg if idcg else 0.0,
+        'first_hit_rank': None if first_hit is None else first_hit + 1,
+    }
+
+def aggregate(scores):
+    """Mean metrics over queries"""
+    count = len(scores)
+    return {
+        'recall_at_k': round(sum(s['recall'] for s in scores) / count, 4),
+        'mrr': round(sum(s['rr'] for s in scores) / count, 4),
+        'ndcg_at_k': round(sum(s['ndcg'] for s in scores) / count, 4),
+        'queries': count,
+    }
+
+def build_index(service, documents_dir: Path):
+    """Load local documents and build a fresh index, timing each phase separately"""
+    files = sorted(str(p) for p in documents_dir.iterdir() if p.suffix.lower() in ('.pdf', '.json', '.txt', '.md'))
+
+    start = time.perf_counter()
+    documents = []
+    for file_path in files:
+        documents.extend(service._load_document(file_path))
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    service.document_index.add_documents(documents)
+    summary_index_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    chunks = service.split_and_deduplicate(documents)
+    split_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectors = service.embeddings.embed_documents([chunk.page_content for chunk in chunks])
+    embed_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    service._add_chunks(chunks, embeddings=vectors)
+    insert_s = time.perf_counter() - start
+
+    return {
+        'files': len(files),
+        'pages': len(documents),
+        'chunks': len(chunks),
+        'load_s': round(load_s, 3),
+        'split_dedup_s': round(split_s, 3),
+        'embedding_s': round(embed_s, 3),
+        'embedding_chunks_per_s': round(len(chunks) / embed_s, 1) if embed_s else None,
+        'index_insert_s': round(insert_s, 3),
+        'summary_index_s': round(summary_index_s, 3),
+    }
+
+def make_pipeline(service):
+    """End-to-end retrieval as SimpleRAGChain.retrieve does it (router, then hierarchical/flat search, query
+    expansion, parent expansion)"""
+    k = int(os.getenv('RETRIEVAL_K', 5))
+    if os.getenv('ROUTER_ENABLED', 'true').lower() == 'true':
+        from services.query_router import QueryRouter
+        router = QueryRouter(service)
+        search = lambda question, k, embedding=None: router.search(question, k=k, query_embedding=embedding)
+    else:
+        search = lambda question, k, embedding=None: service.search_by_vector(
+            embedding if embedding is not None else service.embed_query(question), k=k
+        )
+    if os.getenv('QUERY_EXPANSION_ENABLED', 'false').lower() == 'true':
+        from services.query_expansion import QueryExpander
+        expander = QueryExpander()
+        retrieve = lambda question, k=k: expander.search(
+            question, lambda query, embedding: search(query, k, embedding), service.embed_queries, k=k
+        )
+    else:
+        retrieve = lambda question, k=k: search(question, k)
+    if os.getenv('PARENT_RETRIEVAL_ENABLED', 'false').lower() == 'true':
+        from services.parent_store import get_parent_store
+        parent_store = get_parent_store()
+        return lambda question, k=k: parent_store.expand(retrieve(question, k))
+    return retrieve
+
+def timed(fn, repeats):
+    """Run fn repeatedly and return (last result, per-call latencies in ms)"""
+    latencies = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return result, latencies
+
+def compare(report, previous):
+    """Print metric deltas against a previous run"""
+    print(f"\n{'metric':40s} {'before':>10s} {'after':>10s} {'delta':>10s}", file=sys.stderr)
+    for section in ('flat', 'pipeline'):
+        for key in ('recall_at_k', 'mrr', 'ndcg_at_k'):
+            before = previous['quality'][section][key]
+            after = report['quality'][section][key]
+            print(f"{section + '.' + key:40s} {before:10.4f} {after:10.4f} {after - before:+10.4f}", file=sys.stderr)
+    for name in report['latency']:
+        if name in previous['latency']:
+            before = previous['latency'][name]['p95_ms']
+            after = report['latency'][name]['p95_ms']
+            print(f"{name + '.p95_ms':40s} {before:10.2f} {after:10.2f} {after - before:+10.2f}", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval quality and latency benchmark")
+    parser.add_argument('--golden', default=str(DEFAULT_GOLDEN), help="Golden set (JSONL)")
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--repeats', type=int, default=5, help="Timed repetitions per query")
+    parser.add_argument('--build', action='store_true',
+                        help="Build a fresh index from data/documents in a temporary directory")
+    parser.add_argument('--documents-dir', default=str(project_root / 'data' / 'documents'))
+    parser.add_argument('--output', help="Also write the JSON report to this file")
+    parser.add_argument('--compare', help="Previous JSON report to print deltas against")
+    parser.add_argument('--allow-network', action='store_true', help="Do not force Hugging Face offline mode")
+    args = parser.parse_args()
+
+    if not args.allow_network:
+        disable_hub_access()
+
+    golden_path = Path(args.golden)
+    golden = load_golden(golden_path)
+
+    build_dir = None
+    if args.build:
+        build_dir = tempfile.TemporaryDirectory(prefix='lpdp-bench-')
+        os.environ['CHROMA_DB_PATH'] = build_dir.name
+        os.environ['CHROMA_COLLECTION_NAME'] = 'lpdp_bench'
+        os.environ['PARENT_STORE_PATH'] = os.path.join(build_dir.name, 'parents.sqlite')
+
+    from services.vector_store import VectorStoreService
+
+    start = time.perf_counter()
+    service = VectorStoreService()
+    model_load_s = time.perf_counter() - start
+
+    build = build_index(service, Path(args.documents_dir)) if args.build else None
+    if service.get_collection_count() == 0:
+        print("The collection is empty; run scripts/simple_populate.py or pass --build", file=sys.stderr)
+        return 1
+
+    pipeline = make_pipeline(service)
+    # Warm up model, Chroma and router centroids before timing
+    pipeline(golden[0]['question'], k=args.k)
+
+    latencies = {'query_embedding': [], 'similarity_search': [], 'end_to_end_retrieval': []}
+    flat_scores, pipeline_scores, per_query = [], [], []
+    for row in golden:
+        question, relevant = row['question'], row['relevant']
+
+        _, embed_latencies = timed(lambda: service.embed_query(question), args.repeats)
+        flat_docs, flat_latencies = timed(lambda: service.similarity_search(question, k=args.k), args.repeats)
+        routed_docs, routed_latencies = timed(lambda: pipeline(question, k=args.k), args.repeats)
+        latencies['query_embedding'].extend(embed_latencies)
+        latencies['similarity_search'].extend(flat_latencies)
+        latencies['end_to_end_retrieval'].extend(routed_latencies)
+
+        flat = score_ranking(flat_docs, relevant, args.k)
+        routed = score_ranking(routed_docs, relevant, args.k)
+        flat_scores.append(flat)
+        pipeline_scores.append(routed)
+        per_query.append({
+            'id': row['id'],
+            'lang': row.get('lang'),
+            'flat': {key: round(value, 4) if isinstance(value, float) else value for key, value in flat.items()},
+            'pipeline': {key: round(value, 4) if isinstance(value, float) else value for key, value in routed.items()},
+            'retrieved': [f"{doc.metadata.get('source')}#{doc.metadata.get('page', '')}" for doc in routed_docs],
+        })
+
+    by_language = {}
+    for lang in sorted({row.get('lang') for row in golden}):
+        indices = [i for i, row in enumerate(golden) if row.get('lang') == lang]
+        by_language[lang] = aggregate([pipeline_scores[i] for i in indices])
+
+    with open(golden_path, 'rb') as f:
+        golden_sha = hashlib.sha256(f.read()).hexdigest()
+
+    bundle = service.embedding_bundle
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'golden_set': {'path': golden_path.name, 'sha256': golden_sha[:16], 'questions': len(golden)},
+        'config': {
+            'k': args.k,
+            'repeats': args.repeats,
+            'chunk_size': int(os.getenv('CHUNK_SIZE', 800)),
+            'chunk_overlap': int(os.getenv('CHUNK_OVERLAP', 200)),
+            'dedup_enabled': service.dedup_enabled,
+            'hierarchical_enabled': service.hierarchical_enabled,
+            'router_enabled': os.getenv('ROUTER_ENABLED', 'true').lower() == 'true',
+            'query_expansion_enabled': os.getenv('QUERY_EXPANSION_ENABLED', 'false').lower() == 'true',
+            'embedding_bundle': bundle['version'] if bundle else None,
+            'index_version': service.get_index_version(),
+            'fresh_build': args.build,
+        },
+        'build': {'model_load_s': round(model_load_s, 3), **(build or {})},
+        'quality': {
+            'flat': aggregate(flat_scores),
+            'pipeline': aggregate(pipeline_scores),
+            'pipeline_by_language': by_language,
+        },
+        'latency': {name: latency_summary(values) for name, values in latencies.items()},
+        'queries': per_query,
+    }
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+    if build_dir:
+        build_dir.cleanup()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
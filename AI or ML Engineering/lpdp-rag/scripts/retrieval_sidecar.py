@@ -0,0 +1,53 @@
+"""
+Run the shared retrieval sidecar: loads the embedding model and Chroma index once
+and serves gunicorn workers over a Unix domain socket
+
+Start it before the app and point the workers at it:
+    python scripts/retrieval_sidecar.py --socket /tmp/lpdp-retrieval.sock
+    RETRIEVAL_SIDECAR_SOCKET=/tmp/lpdp-retrieval.sock gunicorn -w 4 "app:create_app()"
+"""
+import os
+import sys
+import signal
+import argparse
+import logging
+from pathlib import Path
+
+# Add project root to path (go up one level from scripts/)
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from dotenv import load_dotenv
+from services.vector_store import VectorStoreService
+from services.retrieval_sidecar import RetrievalSidecarServer
+
+load_dotenv()
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared embedding/retrieval sidecar")
+    parser.add_argument('--socket', default=os.getenv('RETRIEVAL_SIDECAR_SOCKET', '/tmp/lpdp-retrieval.sock'))
+    args = parser.parse_args()
+
+    vector_service = VectorStoreService()
+    server = RetrievalSidecarServer(args.socket, vector_service)
+    logger.info(f"Retrieval sidecar serving {vector_service.get_collection_count()} chunks on {args.socket}")
+
+    def shutdown(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, shutdown)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        logger.info(f"Retrieval sidecar stopped after {server.requests_served} requests")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
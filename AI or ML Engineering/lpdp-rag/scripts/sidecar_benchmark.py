@@ -0,0 +1,148 @@
+"""
+Compare memory and retrieval throughput of N worker processes that each load the
+embedding model and Chroma (local) against N thin clients of one retrieval sidecar
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+import psutil
+
+# Add project root to path (go up one level from scripts/)
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+QUERIES = [
+    "Apa saja persyaratan umum beasiswa LPDP?",
+    "Berapa skor IELTS minimal untuk beasiswa reguler?",
+    "Apa syarat usia untuk beasiswa dokter spesialis?",
+    "Siapa yang dapat mendaftar beasiswa daerah afirmasi?",
+    "Apakah PNS boleh mendaftar beasiswa LPDP?",
+    "Komponen dana apa saja yang ditanggung LPDP?",
+    "Bagaimana tahapan seleksi beasiswa LPDP?",
+    "Apa kewajiban penerima beasiswa setelah lulus?",
+]
+
+def memory_of(pid: int) -> dict:
+    """RSS and PSS (shared pages split between processes) in MB"""
+    info = psutil.Process(pid).memory_full_info()
+    return {'rss_mb': info.rss / 2**20, 'pss_mb': getattr(info, 'pss', info.rss) / 2**20}
+
+def run_worker(mode: str, socket_path: str, queries: int, k: int):
+    """Child process: build the retrieval backend, wait for 'go', run queries, report"""
+    start = time.perf_counter()
+    if mode == 'sidecar':
+        from services.retrieval_sidecar import RemoteVectorStoreService
+        service = RemoteVectorStoreService(socket_path)
+    else:
+        from services.vector_store import VectorStoreService
+        service = VectorStoreService()
+    init_seconds = time.perf_counter() - start
+
+    print(f"ready {init_seconds:.3f}", flush=True)
+    sys.stdin.readline()
+
+    start = time.perf_counter()
+    for i in range(queries):
+        embedding = service.embed_query(QUERIES[i % len(QUERIES)])
+        service.search_by_vector(embedding, k=k)
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({'init_s': init_seconds, 'elapsed_s': elapsed, **memory_of(os.getpid())}), flush=True)
+
+def spawn_workers(count: int, mode: str, socket_path: str, queries: int, k: int):
+    """Start workers, release them together and collect their reports"""
+    command = [sys.executable, __file__, '--worker', mode, '--socket', socket_path,
+               '--queries', str(queries), '--k', str(k)]
+    workers = [subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+               for _ in range(count)]
+
+    spawn_start = time.perf_counter()
+    for worker in workers:
+        line = worker.stdout.readline()
+        if not line.startswith('ready'):
+            raise RuntimeError(f"worker failed to start: {line!r}")
+    ready_seconds = time.perf_counter() - spawn_start
+
+    start = time.perf_counter()
+    for worker in workers:
+        worker.stdin.write("go\n")
+        worker.stdin.flush()
+    reports = [json.loads(worker.stdout.readline()) for worker in workers]
+    wall = time.perf_counter() - start
+    for worker in workers:
+        worker.wait()
+    return reports, wall, ready_seconds
+
+def start_sidecar(socket_path: str) -> subprocess.Popen:
+    """Launch the sidecar and wait until it answers"""
+    from services.retrieval_sidecar import RetrievalSidecarClient
+    process = subprocess.Popen(
+        [sys.executable, str(project_root / 'scripts' / 'retrieval_sidecar.py'), '--socket', socket_path],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    client = RetrievalSidecarClient(socket_path)
+    deadline = time.monotonic() + 180
+    while not (os.path.exists(socket_path) and client.ping()):
+        if process.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("retrieval sidecar failed to start")
+        time.sleep(0.5)
+    return process
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--queries', type=int, default=100, help="Queries per worker")
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--mode', choices=['local', 'sidecar', 'both'], default='both')
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    parser.add_argument('--worker', choices=['local', 'sidecar'], help=argparse.SUPPRESS)
+    parser.add_argument('--socket', default=os.path.join(tempfile.gettempdir(), 'lpdp-retrieval-bench.sock'))
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.socket, args.queries, args.k)
+        return 0
+
+    modes = ['local', 'sidecar'] if args.mode == 'both' else [args.mode]
+    results = []
+    sidecar = start_sidecar(args.socket) if 'sidecar' in modes else None
+    try:
+        for mode in modes:
+            for count in args.workers:
+                reports, wall, ready_seconds = spawn_workers(count, mode, args.socket, args.queries, args.k)
+                total_queries = count * args.queries
+                row = {
+                    'mode': mode,
+                    'workers': count,
+                    'workers_rss_mb': sum(r['rss_mb'] for r in reports),
+                    'workers_pss_mb': sum(r['pss_mb'] for r in reports),
+                    'sidecar_rss_mb': memory_of(sidecar.pid)['rss_mb'] if mode == 'sidecar' else 0.0,
+                    'spawn_ready_s': ready_seconds,
+                    'throughput_qps': total_queries / wall,
+                }
+                row['total_rss_mb'] = row['workers_rss_mb'] + row['sidecar_rss_mb']
+                results.append(row)
+    finally:
+        if sidecar:
+            sidecar.terminate()
+            sidecar.wait()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print(f"{'mode':8s} {'workers':>7s} {'total RSS':>10s} {'workers PSS':>12s} {'sidecar RSS':>12s} "
+          f"{'spawn':>7s} {'qps':>8s}")
+    for row in results:
+        print(f"{row['mode']:8s} {row['workers']:7d} {row['total_rss_mb']:8.0f}MB {row['workers_pss_mb']:10.0f}MB "
+              f"{row['sidecar_rss_mb']:10.0f}MB {row['spawn_ready_s']:6.1f}s {row['throughput_qps']:8.1f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""
+Fault-injecting stub of the Groq chat completions API for local resilience and load testing
+
+Point the app at it with GROQ_BASE_URL=http://127.0.0.1:8765 (any GROQ_API_KEY works).
+Time to first token follows a configurable distribution (constant, normal, lognormal,
+exponential), generation is paced at --tokens-per-second, `stream: true` is answered
+with server-sent events, and errors, 429s, hangs and tool calls are injected at
+configurable rates. Settings can be changed at runtime:
+POST /control {"latency": 2, "error_rate": 0.5}; GET /control returns settings and counters.
+"""
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPLETIONS_PATH = "/openai/v1/chat/completions"
+
+DISTRIBUTIONS = ('constant', 'normal', 'lognormal', 'exponential')
+
+ANSWER_WORDS = (
+    "Beasiswa LPDP mensyaratkan pendaftar memenuhi ketentuan usia IPK sertifikat bahasa dan "
+    "dokumen pendukung sesuai buku panduan program yang dipilih serta mengikuti seleksi "
+    "administrasi bakat skolastik dan substansi sesuai jadwal yang ditetapkan"
+).split()
+
+_NUMERIC_KEYS = ('latency', 'jitter', 'error_rate', 'hang_rate', 'hang_seconds', 'tokens_per_second',
+                 'answer_tokens', 'rate_limit_rate', 'tool_call_rate')
+
+class FaultConfig:
+    """Mutable fault and latency settings shared by all handler threads"""
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.0, error_rate: float = 0.0,
+                 hang_rate: float = 0.0, hang_seconds: float = 60.0, distribution: str = 'normal',
+                 tokens_per_second: float = 0.0, answer_tokens: int = 40, rate_limit_rate: float = 0.0,
+                 tool_call_rate: float = 1.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.distribution = distribution
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.rate_limit_rate = rate_limit_rate
+        self.tool_call_rate = tool_call_rate
+        self.lock = threading.Lock()
+        self.counters = {'requests': 0, 'errors': 0, 'hangs': 0, 'rate_limited': 0,
+                         'streams': 0, 'tool_calls': 0, 'completion_tokens': 0}
+
+    def update(self, values: dict):
+        with self.lock:
+            for key in _NUMERIC_KEYS:
+                if key in values:
+                    setattr(self, key, float(values[key]))
+            if values.get('distribution') in DISTRIBUTIONS:
+                self.distribution = values['distribution']
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            settings = {key: getattr(self, key) for key in _NUMERIC_KEYS}
+            return {**settings, 'distribution': self.distribution, **self.counters}
+
+    def count(self, key: str, amount: int = 1):
+        with self.lock:
+            self.counters[key] += amount
+
+def sample_latency(settings: dict) -> float:
+    """Time to first token: latency is the mean (median for lognormal), jitter the spread"""
+    latency, jitter = settings['latency'], settings['jitter']
+    distribution = settings['distribution']
+    if distribution == 'constant' or latency <= 0:
+        return max(0.0, latency)
+    if distribution == 'lognormal':
+        return random.lognormvariate(math.log(latency), jitter or 0.5)
+    if distribution == 'exponential':
+        return random.expovariate(1.0 / latency)
+    return max(0.0, random.gauss(latency, jitter))
+
+def build_completion(request: dict, answer_tokens: int = 40, tool_call_rate: float = 1.0) -> dict:
+    """OpenAI-style completion; asks for the search tool when tools are bound and none was called yet"""
+    messages = request.get('messages', [])
+    last = messages[-1] if messages else {}
+    prompt_tokens = sum(len(str(m.get('content') or '')) for m in messages) // 4
+
+    message = {'role': 'assistant', 'content': ''}
+    finish_reason = 'stop'
+    if request.get('tools') and last.get('role') != 'tool' and random.random() < tool_call_rate:
+        tool_name = request['tools'][0].get('function', {}).get('name', 'search')
+        message['tool_calls'] = [{
+            'id': f"call_{uuid.uuid4().hex[:12]}",
+            'type': 'function',
+            'function': {'name': tool_name, 'arguments': json.dumps({'query': str(last.get('content', ''))[:200]})}
+        }]
+        finish_reason = 'tool_calls'
+    else:
+        words = [ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(max(1, int(answer_tokens)))]
+        message['content'] = "Jawaban stub: " + " ".join(words) + "."
+
+    completion_tokens = len(message['content']) // 4 + 1
+    return {
+        'id': f"chatcmpl-{uuid.uuid4().hex}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': request.get('model', 'stub'),
+        'choices': [{'index': 0, 'message': message, 'finish_reason': finish_reason}],
+        'usage': {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens
+        }
+    }
+
+def make_handler(faults: FaultConfig):
+    """Request handler bound to the shared fault config"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status: int, payload: dict):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self) -> dict:
+            length = int(self.headers.get('Content-Length', 0))
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def do_GET(self):
+            if self.path == '/control':
+                self._send_json(200, faults.snapshot())
+            else:
+                self._send_json(404, {'error': {'message': 'not found'}})
+
+        def _send_stream(self, completion: dict, tokens_per_second: float):
+            """Replay a completion as server-sent events, pacing content at the token rate"""
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+
+            choice = completion['choices'][0]
+            base = {key: completion[key] for key in ('id', 'created', 'model')}
+            base['object'] = 'chat.completion.chunk'
+
+            def emit(delta: dict, finish_reason=None, **extra):
+                chunk = {**base, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}], **extra}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+
+            emit({'role': 'assistant', 'content': ''})
+            if choice['message'].get('tool_calls'):
+                emit({'tool_calls': [dict(call, index=i) for i, call in enumerate(choice['message']['tool_calls'])]})
+            else:
+                for word in choice['message']['content'].split(' '):
+                    if tokens_per_second > 0:
+                        time.sleep(1.0 / tokens_per_second)
+                    emit({'content': word + ' '})
+            emit({}, choice['finish_reason'], usage=completion['usage'])
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+        def do_POST(self):
+            if self.path == '/control':
+                faults.update(self._read_json())
+                self._send_json(200, faults.snapshot())
+                return
+            if self.path != COMPLETIONS_PATH:
+                self._send_json(404, {'error': {'message': 'not found'}})
+                return
+
+            request = self._read_json()
+            settings = faults.snapshot()
+            faults.count('requests')
+
+            roll = random.random()
+            if roll < settings['hang_rate']:
+                faults.count('hangs')
+                time.sleep(settings['hang_seconds'])
+            elif roll < settings['hang_rate'] + settings['error_rate']:
+                faults.count('errors')
+                time.sleep(settings['latency'])
+                self._send_json(500, {'error': {'message': 'injected failure', 'type': 'internal_server_error'}})
+                return
+            elif roll < settings['hang_rate'] + settings['error_rate'] + settings['rate_limit_rate']:
+                faults.count('rate_limited')
+                self.send_response(429)
+                body = json.dumps({'error': {'message': 'Rate limit reached (stub)', 'type': 'tokens',
+                                             'code': 'rate_limit_exceeded'}}).encode('utf-8')
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Retry-After', '1')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+
+            time.sleep(sample_latency(settings))
+            completion = build_completion(request, settings['answer_tokens'], settings['tool_call_rate'])
+            faults.count('completion_tokens', completion['usage']['completion_tokens'])
+            if completion['choices'][0]['finish_reason'] == 'tool_calls':
+                faults.count('tool_calls')
+
+            if request.get('stream'):
+                faults.count('streams')
+                self._send_stream(completion, settings['tokens_per_second'])
+                return
+            if settings['tokens_per_second'] > 0:
+                time.sleep(completion['usage']['completion_tokens'] / settings['tokens_per_second'])
+            self._send_json(200, completion)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+def start_server(host: str, port: int, faults: FaultConfig) -> ThreadingHTTPServer:
+    """Start the stub server on a background thread"""
+    server = ThreadingHTTPServer((host, port), make_handler(faults))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-llm", daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Fault-injecting Groq API stub")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.2,
+                        help='Mean time to first token in seconds (median for lognormal)')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='Standard deviation in seconds (normal) or log-space sigma (lognormal)')
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='normal')
+    parser.add_argument('--tokens-per-second', type=float, default=0.0,
+                        help='Generation speed; 0 returns the whole answer at once')
+    parser.add_argument('--answer-tokens', type=int, default=40, help='Approximate answer length in words')
+    parser.add_argument('--tool-call-rate', type=float, default=1.0,
+                        help='Probability of a search tool call when tools are bound')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 429')
+    parser.add_argument('--hang-rate', type=float, default=0.0, help='Fraction of requests that hang')
+    parser.add_argument('--hang-seconds', type=float, default=60.0)
+    args = parser.parse_args()
+
+    faults = FaultConfig(args.latency, args.jitter, args.error_rate, args.hang_rate, args.hang_seconds,
+                         distribution=args.distribution, tokens_per_second=args.tokens_per_second,
+                         answer_tokens=args.answer_tokens, rate_limit_rate=args.rate_limit_rate,
+                         tool_call_rate=args.tool_call_rate)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(faults))
+    print(f"Stub LLM listening on http://{args.host}:{args.port}{COMPLETIONS_PATH}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
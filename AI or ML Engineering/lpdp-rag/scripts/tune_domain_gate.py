@@ -0,0 +1,92 @@
+"""
+Tune the out-of-domain gate threshold on a labeled set of in-domain / off-topic questions
+"""
+import sys
+import json
+import argparse
+import logging
+from pathlib import Path
+
+# Add project root to path (go up one level from scripts/)
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from services.vector_store import VectorStoreService
+from services.domain_gate import DomainGate
+
+logging.basicConfig(level=logging.WARNING)
+
+def load_labeled(path):
+    """Read {"question", "in_domain"} records from a JSONL file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def evaluate(rows, threshold, margin):
+    """Refusal counts for the combined rule: score < threshold and centroid margin < margin"""
+    false_refusals = caught = 0
+    for row in rows:
+        refuse = row['best_score'] < threshold and (row['margin'] is not None and row['margin'] < margin)
+        if refuse and row['in_domain']:
+            false_refusals += 1
+        elif refuse:
+            caught += 1
+    return false_refusals, caught
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--labeled', default=str(project_root / 'data' / 'eval' / 'domain_gate_labeled.jsonl'))
+    parser.add_argument('--max-false-refusals', type=int, default=0,
+                        help="In-domain questions the gate may refuse (default 0)")
+    parser.add_argument('--json', action='store_true', help="Print per-question scores as JSON")
+    args = parser.parse_args()
+
+    vector_service = VectorStoreService()
+    if vector_service.get_collection_count() == 0:
+        print("Vector store is empty; run scripts/simple_populate.py first")
+        return 1
+    gate = DomainGate(vector_service)
+
+    rows = []
+    for record in load_labeled(args.labeled):
+        embedding = vector_service.embed_query(record['question'])
+        scored = vector_service.similarity_search_with_score_by_vector(embedding, k=1)
+        rows.append({
+            'question': record['question'],
+            'in_domain': record['in_domain'],
+            'best_score': scored[0][1] if scored else 0.0,
+            'margin': gate.classify(embedding)['margin']
+        })
+
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+
+    off_topic = sum(1 for row in rows if not row['in_domain'])
+    print(f"{len(rows)} labeled questions ({len(rows) - off_topic} in-domain, {off_topic} off-topic)\n")
+    print(f"{'question':60s} {'label':>6s} {'score':>7s} {'margin':>7s}")
+    for row in sorted(rows, key=lambda r: r['best_score']):
+        margin = f"{row['margin']:7.3f}" if row['margin'] is not None else "    n/a"
+        print(f"{row['question'][:60]:60s} {'in' if row['in_domain'] else 'off':>6s} {row['best_score']:7.3f} {margin}")
+
+    # Sweep both knobs; keep false refusals within budget and catch as many off-topic questions as possible,
+    # preferring the lowest (most conservative) threshold among ties
+    best = None
+    for t in [i / 100 for i in range(0, 101)]:
+        for m in [i / 100 for i in range(-20, 21)]:
+            false_refusals, caught = evaluate(rows, t, m)
+            if false_refusals > args.max_false_refusals:
+                continue
+            key = (caught, -t, -m)
+            if best is None or key > best[0]:
+                best = (key, t, m, false_refusals, caught)
+
+    current = evaluate(rows, gate.threshold, gate.centroid_margin)
+    print(f"\nCurrent  DOMAIN_GATE_THRESHOLD={gate.threshold:.2f} DOMAIN_CENTROID_MARGIN={gate.centroid_margin:.2f}: "
+          f"{current[1]}/{off_topic} off-topic refused, {current[0]} in-domain refused")
+    if best:
+        _, t, m, false_refusals, caught = best
+        print(f"Proposed DOMAIN_GATE_THRESHOLD={t:.2f} DOMAIN_CENTROID_MARGIN={m:.2f}: "
+              f"{caught}/{off_topic} off-topic refused, {false_refusals} in-domain refused")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""
+Admission control for outbound LLM calls: rate quotas, concurrency limit and bounded wait queue
+"""
+import os
+import time
+import sqlite3
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, Tuple, Optional
+
+from .fork_safety import register_after_fork
+
+logger = logging.getLogger(__name__)
+
+class AdmissionRejected(Exception):
+    """Raised when an LLM call cannot be admitted before its deadline"""
+
+    def __init__(self, reason: str, retry_after: float = 1.0):
+        super().__init__(f"LLM call rejected: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+class MemoryBucketStore:
+    """Process-local token buckets"""
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]]):
+        """limits maps bucket name -> (capacity, refill per second)"""
+        self.limits = limits
+        self._lock = threading.Lock()
+        now = time.monotonic()
+        self._state = {name: [capacity, now] for name, (capacity, _) in limits.items()}
+        register_after_fork(self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        """Fresh lock and full buckets in a forked worker"""
+        self._lock = threading.Lock()
+        now = time.monotonic()
+        self._state = {name: [capacity, now] for name, (capacity, _) in self.limits.items()}
+
+    def try_acquire(self, costs: Dict[str, float]) -> float:
+        """Consume all costs atomically; returns 0 on success or seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            for name, cost in costs.items():
+                capacity, rate = self.limits[name]
+                tokens, updated = self._state[name]
+                tokens = min(capacity, tokens + (now - updated) * rate)
+                self._state[name] = [tokens, now]
+                if tokens < cost:
+                    wait = max(wait, (cost - tokens) / rate)
+            if wait > 0:
+                return wait
+            for name, cost in costs.items():
+                self._state[name][0] -= cost
+            return 0.0
+
+    def adjust(self, name: str, delta: float):
+        """Debit (positive) or refund (negative) tokens after the fact"""
+        with self._lock:
+            capacity, _ = self.limits[name]
+            self._state[name][0] = min(capacity, self._state[name][0] - delta)
+
+class SQLiteBucketStore:
+    """Token buckets shared across gunicorn workers through a SQLite file"""
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]], db_path: str):
+        """limits maps bucket name -> (capacity, refill per second)"""
+        self.limits = limits
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+            for name, (capacity, _) in limits.items():
+                conn.execute("INSERT OR IGNORE INTO buckets VALUES (?, ?, ?)", (name, capacity, time.time()))
+
+    def _connect(self):
+        """Open a short-lived connection (safe across forks)"""
+        return sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+
+    def try_acquire(self, costs: Dict[str, float]) -> float:
+        """Consume all costs atomically; returns 0 on success or seconds to wait"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            wait = 0.0
+            levels = {}
+            for name, cost in costs.items():
+                capacity, rate = self.limits[name]
+                tokens, updated = conn.execute(
+                    "SELECT tokens, updated FROM buckets WHERE name = ?", (name,)
+                ).fetchone()
+                tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+                levels[name] = tokens
+                if tokens < cost:
+                    wait = max(wait, (cost - tokens) / rate)
+            if wait == 0:
+                for name, cost in costs.items():
+                    levels[name] -= cost
+            for name, tokens in levels.items():
+                conn.execute("UPDATE buckets SET tokens = ?, updated = ? WHERE name = ?", (tokens, now, name))
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def adjust(self, name: str, delta: float):
+        """Debit (positive) or refund (negative) tokens after the fact"""
+        capacity, _ = self.limits[name]
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE buckets SET tokens = MIN(?, tokens - ?) WHERE name = ?", (capacity, delta, name))
+        finally:
+            conn.close()
+
+class AdmissionController:
+    """
+    Gates LLM calls on Groq's requests-per-minute and tokens-per-minute
+    quotas plus a concurrency limit, with a bounded queue and deadlines
+    """
+
+    def __init__(self):
+        """Initialize the admission controller from environment settings"""
+        self.rpm = float(os.getenv('GROQ_RPM', 30))
+        self.tpm = float(os.getenv('GROQ_TPM', 6000))
+        self.max_concurrency = int(os.getenv('LLM_MAX_CONCURRENCY', 4))
+        self.max_queue = int(os.getenv('LLM_MAX_QUEUE', 32))
+        self.queue_timeout = float(os.getenv('LLM_QUEUE_TIMEOUT', 5.0))
+
+        limits = {
+            'requests': (self.rpm, self.rpm / 60.0),
+            'tokens': (self.tpm, self.tpm / 60.0),
+        }
+        backend = os.getenv('LLM_ADMISSION_BACKEND', 'memory').lower()
+        if backend == 'sqlite':
+            self.buckets = SQLiteBucketStore(limits, os.getenv('LLM_ADMISSION_DB', './data/cache/llm_admission.sqlite'))
+        else:
+            self.buckets = MemoryBucketStore(limits)
+        self.backend = backend
+
+        self._reinit_after_fork()
+        register_after_fork(self._reinit_after_fork)
+
+        logger.info(
+            f"LLM admission control: {self.rpm:.0f} RPM, {self.tpm:.0f} TPM, "
+            f"concurrency {self.max_concurrency}, queue {self.max_queue} ({backend} buckets)"
+        )
+
+    def _reinit_after_fork(self):
+        """Per-process concurrency state (locks held at fork time would deadlock the worker)"""
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._in_flight = 0
+        self._wait_times = deque(maxlen=500)
+        self.counters = {'admitted': 0, 'rejected_queue_full': 0, 'rejected_deadline': 0}
+
+    @staticmethod
+    def estimate_tokens(messages, max_tokens: int = 512) -> int:
+        """Rough token estimate (4 chars per token) for prompt plus completion budget"""
+        if isinstance(messages, str):
+            chars = len(messages)
+        else:
+            chars = sum(len(str(getattr(message, 'content', message))) for message in messages)
+        return chars // 4 + max_tokens
+
+    def _reject(self, reason: str, retry_after: float, count: bool = True):
+        """Count and raise a rejection"""
+        if count:
+            with self._lock:
+                self.counters[f'rejected_{reason}'] += 1
+        raise AdmissionRejected(reason, retry_after)
+
+    @contextmanager
+    def slot(self, estimated_tokens: int, timeout: Optional[float] = None, count_rejections: bool = True):
+        """Wait (bounded) for quota and a concurrency slot, then run the call
+
+        Optional calls (hedges) pass timeout=0 and count_rejections=False to take a slot only when one is free.
+        """
+        start = time.monotonic()
+        deadline = start + (self.queue_timeout if timeout is None else timeout)
+        estimated_tokens = min(estimated_tokens, self.tpm)
+
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                queue_full = True
+            else:
+                queue_full = False
+                self._waiting += 1
+        if queue_full:
+            self._reject('queue_full', self.queue_timeout, count_rejections)
+
+        acquired = False
+        try:
+            if not self._semaphore.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                self._reject('deadline', self.queue_timeout, count_rejections)
+            acquired = True
+
+            while True:
+                wait = self.buckets.try_acquire({'requests': 1, 'tokens': estimated_tokens})
+                if wait == 0:
+                    break
+                remaining = deadline - time.monotonic()
+                if wait > remaining:
+                    self._reject('deadline', wait, count_rejections)
+                time.sleep(min(wait, remaining))
+        except AdmissionRejected:
+            if acquired:
+                self._semaphore.release()
+            raise
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        with self._lock:
+            self._in_flight += 1
+            self.counters['admitted'] += 1
+            self._wait_times.append(time.monotonic() - start)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._semaphore.release()
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """Correct the token bucket with the provider-reported usage"""
+        if actual_tokens:
+            self.buckets.adjust('tokens', actual_tokens - min(estimated_tokens, self.tpm))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth, in-flight calls, counters and wait-time percentiles"""
+        with self._lock:
+            waits = sorted(self._wait_times)
+            stats = {
+                'backend': self.backend,
+                'queue_depth': self._waiting,
+                'in_flight': self._in_flight,
+                'max_concurrency': self.max_concurrency,
+                'max_queue': self.max_queue,
+                **self.counters
+            }
+        if waits:
+            stats['wait_ms_avg'] = 1000 * sum(waits) / len(waits)
+            stats['wait_ms_p95'] = 1000 * waits[min(len(waits) - 1, int(0.95 * len(waits)))]
+        return stats
+
+_controller = None
+_controller_lock = threading.Lock()
+
+def get_admission_controller() -> Optional[AdmissionController]:
+    """Process-wide admission controller, None when disabled"""
+    global _controller
+    if os.getenv('LLM_ADMISSION_ENABLED', 'true').lower() != 'true':
+        return None
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController()
+        return _controller
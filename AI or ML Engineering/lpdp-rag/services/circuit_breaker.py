@@ -0,0 +1,160 @@
+"""
+Circuit breaker for the LLM provider based on rolling error and slow-call rates
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Optional
+
+from .admission_control import AdmissionRejected
+from .fork_safety import register_after_fork
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpen(AdmissionRejected):
+    """Raised when the circuit is open and calls must fail fast"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("circuit_open", retry_after)
+
+class CircuitBreaker:
+    """
+    Tracks the outcome and latency of recent LLM calls; opens when the error
+    or slow-call rate crosses a threshold, then lets a single probe through
+    after a cool-down to decide whether to close again
+    """
+
+    def __init__(self, name: str = "llm"):
+        """Initialize the circuit breaker from environment settings"""
+        self.name = name
+        self.window_size = int(os.getenv('CB_WINDOW', 20))
+        self.min_calls = int(os.getenv('CB_MIN_CALLS', 5))
+        self.failure_threshold = float(os.getenv('CB_FAILURE_THRESHOLD', 0.5))
+        self.slow_call_seconds = float(os.getenv('CB_SLOW_CALL_SECONDS', 8.0))
+        self.open_seconds = float(os.getenv('CB_OPEN_SECONDS', 30.0))
+
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=self.window_size)  # (failed, slow)
+        self._latencies = deque(maxlen=200)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.counters = {'calls': 0, 'failures': 0, 'short_circuited': 0, 'opened': 0}
+        register_after_fork(self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        """Fresh lock in a forked worker"""
+        self._lock = threading.Lock()
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        """Current state, moving OPEN -> HALF_OPEN once the cool-down elapsed"""
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        """State transition check; caller holds the lock"""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def before_call(self):
+        """Raise CircuitOpen unless the call may proceed"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            self.counters['short_circuited'] += 1
+            retry_after = max(1.0, self.open_seconds - (time.monotonic() - self._opened_at))
+        raise CircuitOpen(retry_after)
+
+    def abandon(self):
+        """Release a half-open probe slot for a call that never reached the provider"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    def record_success(self, latency: float):
+        """Record a successful call"""
+        with self._lock:
+            self.counters['calls'] += 1
+            self._latencies.append(latency)
+            if self._state == HALF_OPEN:
+                logger.info(f"Circuit '{self.name}' closed after successful probe")
+                self._state = CLOSED
+                self._outcomes.clear()
+                return
+            self._outcomes.append((False, latency >= self.slow_call_seconds))
+            self._evaluate()
+
+    def record_failure(self):
+        """Record a failed call"""
+        with self._lock:
+            self.counters['calls'] += 1
+            self.counters['failures'] += 1
+            if self._state == HALF_OPEN:
+                self._open("probe failed")
+                return
+            self._outcomes.append((True, False))
+            self._evaluate()
+
+    def _evaluate(self):
+        """Open the circuit if the rolling window crosses a threshold; caller holds the lock"""
+        if self._state != CLOSED or len(self._outcomes) < self.min_calls:
+            return
+        failure_rate = sum(1 for failed, _ in self._outcomes if failed) / len(self._outcomes)
+        slow_rate = sum(1 for _, slow in self._outcomes if slow) / len(self._outcomes)
+        if failure_rate >= self.failure_threshold:
+            self._open(f"failure rate {failure_rate:.0%}")
+        elif slow_rate >= self.failure_threshold:
+            self._open(f"slow-call rate {slow_rate:.0%}")
+
+    def _open(self, reason: str):
+        """Trip the circuit; caller holds the lock"""
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        self._outcomes.clear()
+        self.counters['opened'] += 1
+        logger.warning(f"Circuit '{self.name}' opened: {reason}")
+
+    def latency_percentile(self, q: float) -> Optional[float]:
+        """Rolling latency percentile of successful calls, None until min_calls samples"""
+        with self._lock:
+            if len(self._latencies) < self.min_calls:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """State, counters and latency percentiles"""
+        stats = {'state': self.state, **self.counters}
+        p50 = self.latency_percentile(50)
+        p95 = self.latency_percentile(95)
+        if p95 is not None:
+            stats.update({'latency_p50': p50, 'latency_p95': p95})
+        return stats
+
+_breaker = None
+_breaker_lock = threading.Lock()
+
+def get_circuit_breaker() -> Optional[CircuitBreaker]:
+    """Process-wide LLM circuit breaker, None when disabled"""
+    global _breaker
+    if os.getenv('CB_ENABLED', 'true').lower() != 'true':
+        return None
+    with _breaker_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker()
+        return _breaker
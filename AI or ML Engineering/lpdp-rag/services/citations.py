@@ -0,0 +1,77 @@
+"""
+Citations and compact prompt context for retrieved chunks
+
+Chunks are numbered by distinct (source, page) in retrieval order, so the [n]
+markers in the prompt context match the position of the source in the
+response's citation list.
+"""
+import os
+import re
+from urllib.parse import quote
+from typing import List, Dict, Any, Tuple
+
+try:
+    from langchain_core.documents import Document
+except ImportError:
+    from langchain.schema import Document
+
+DOCUMENTS_PATH = os.getenv('DOCUMENTS_PATH', './data/documents')
+CONTEXT_SNIPPET_CHARS = int(os.getenv('CONTEXT_SNIPPET_CHARS', 1200))
+
+def _source_key(metadata: Dict[str, Any]) -> Tuple[Any, Any]:
+    return metadata.get('source'), metadata.get('page')
+
+def _page_number(metadata: Dict[str, Any]):
+    """1-based page number of a PDF chunk (loaders store 0-based pages)"""
+    page = metadata.get('page')
+    return int(page) + 1 if isinstance(page, (int, float)) else None
+
+def source_citation(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Citation of one chunk: title, source, page and a link when one exists"""
+    source = metadata.get('source', 'unknown')
+    citation = {
+        'title': metadata.get('title', source),
+        'source': source
+    }
+    if metadata.get('page') is not None:
+        citation['page'] = metadata['page']
+
+    if metadata.get('url'):
+        citation['url'] = metadata['url']
+    else:
+        filename = os.path.basename(str(source))
+        if os.path.isfile(os.path.join(DOCUMENTS_PATH, filename)):
+            page = _page_number(metadata)
+            citation['url'] = f"/documents/{quote(filename)}" + (f"#page={page}" if page else "")
+    return citation
+
+def document_sources(documents: List[Document]) -> List[Dict[str, Any]]:
+    """Distinct source documents/pages of retrieved chunks, best first"""
+    sources, seen = [], set()
+    for doc in documents:
+        key = _source_key(doc.metadata)
+        if key not in seen:
+            seen.add(key)
+            sources.append(source_citation(doc.metadata))
+    return sources
+
+def format_context(documents: List[Document], max_chars: int = None) -> str:
+    """Compact prompt context: a numbered title/page header and a whitespace-collapsed snippet per chunk"""
+    max_chars = max_chars or CONTEXT_SNIPPET_CHARS
+    numbers: Dict[Tuple[Any, Any], int] = {}
+    blocks = []
+    for doc in documents:
+        key = _source_key(doc.metadata)
+        number = numbers.setdefault(key, len(numbers) + 1)
+        page = _page_number(doc.metadata)
+        header = f"[{number}] {doc.metadata.get('title', doc.metadata.get('source', 'dokumen'))}"
+        if isinstance(doc.metadata.get('page_start'), int) and doc.metadata.get('page_end') != doc.metadata['page_start']:
+            header += f", hlm. {doc.metadata['page_start'] + 1}-{doc.metadata['page_end'] + 1}"
+        elif page:
+            header += f", hlm. {page}"
+        snippet = re.sub(r'\s+', ' ', doc.page_content).strip()
+        # Parent spans are already trimmed to the parent token budget
+        if len(snippet) > max_chars and 'parent_id' not in doc.metadata:
+            snippet = snippet[:max_chars].rsplit(' ', 1)[0] + " ..."
+        blocks.append(f"{header}\n{snippet}")
+    return "\n\n".join(blocks)
@@ -0,0 +1,158 @@
+"""
+Near-duplicate chunk elimination using MinHash and LSH banding
+"""
+import os
+import re
+import zlib
+import logging
+from collections import defaultdict
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+
+try:
+    from langchain_core.documents import Document
+except ImportError:
+    from langchain.schema import Document
+
+logger = logging.getLogger(__name__)
+
+# Program value for chunks merged across several scholarship programs
+SHARED_PROGRAM = "umum"
+
+# Mersenne prime used for the universal hash family
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+class ChunkDeduplicator:
+    """
+    Clusters near-identical chunks (shared guidebook boilerplate) and keeps
+    one canonical chunk per cluster with the list of all source documents
+    """
+
+    def __init__(self, threshold: float = None, num_perm: int = None, shingle_size: int = 5, seed: int = 42):
+        """Initialize the deduplicator"""
+        self.threshold = threshold if threshold is not None else float(os.getenv('DEDUP_THRESHOLD', 0.85))
+        self.num_perm = num_perm or int(os.getenv('DEDUP_NUM_PERM', 128))
+        self.shingle_size = shingle_size
+        self.bands, self.rows = self._optimal_bands(self.threshold, self.num_perm)
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, np.iinfo(np.int64).max, size=self.num_perm, dtype=np.int64).astype(np.uint64)
+        self._b = rng.randint(0, np.iinfo(np.int64).max, size=self.num_perm, dtype=np.int64).astype(np.uint64)
+
+        self.last_stats: Dict[str, Any] = {}
+
+    @staticmethod
+    def _optimal_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+        """Pick (bands, rows) whose LSH S-curve midpoint is closest to the threshold"""
+        best = (num_perm, 1)
+        best_error = float('inf')
+        for rows in range(1, num_perm + 1):
+            if num_perm % rows:
+                continue
+            bands = num_perm // rows
+            error = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+            if error < best_error:
+                best, best_error = (bands, rows), error
+        return best
+
+    def _shingles(self, text: str) -> np.ndarray:
+        """Hash word n-gram shingles of normalized text"""
+        words = re.sub(r'\s+', ' ', text.lower()).strip().split(' ')
+        if len(words) <= self.shingle_size:
+            grams = {' '.join(words)}
+        else:
+            grams = {' '.join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+        return np.fromiter((zlib.crc32(g.encode('utf-8')) for g in grams), dtype=np.uint64, count=len(grams))
+
+    def signature(self, text: str) -> np.ndarray:
+        """Compute the MinHash signature of a text"""
+        shingles = self._shingles(text)
+        if shingles.size == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        hashed = (np.outer(self._a, shingles) + self._b[:, None]) % _MERSENNE_PRIME
+        return np.bitwise_and(hashed, _MAX_HASH).min(axis=1)
+
+    def find_clusters(self, texts: List[str]) -> List[List[int]]:
+        """Group indices of near-duplicate texts, each cluster ordered by first occurrence"""
+        signatures = [self.signature(text) for text in texts]
+
+        # Union-find over candidate pairs that pass signature verification
+        parent = list(range(len(texts)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for band in range(self.bands):
+            buckets = defaultdict(list)
+            start = band * self.rows
+            for idx, sig in enumerate(signatures):
+                buckets[sig[start:start + self.rows].tobytes()].append(idx)
+
+            for members in buckets.values():
+                if len(members) < 2:
+                    continue
+                head = members[0]
+                for other in members[1:]:
+                    root_head, root_other = find(head), find(other)
+                    if root_head == root_other:
+                        continue
+                    similarity = float(np.mean(signatures[head] == signatures[other]))
+                    if similarity >= self.threshold:
+                        parent[max(root_head, root_other)] = min(root_head, root_other)
+
+        clusters = defaultdict(list)
+        for idx in range(len(texts)):
+            clusters[find(idx)].append(idx)
+        return sorted(clusters.values(), key=lambda members: members[0])
+
+    def deduplicate(self, documents: List[Document]) -> List[Document]:
+        """Keep one canonical chunk per near-duplicate cluster"""
+        if not documents:
+            self.last_stats = {'input_chunks': 0, 'output_chunks': 0, 'removed_chunks': 0, 'reduction': 0.0}
+            return documents
+
+        clusters = self.find_clusters([doc.page_content for doc in documents])
+
+        deduplicated = []
+        for members in clusters:
+            canonical = documents[members[0]]
+            sources = []
+            programs = set()
+            for idx in members:
+                source = documents[idx].metadata.get('source', 'unknown')
+                if source not in sources:
+                    sources.append(source)
+                if 'program' in documents[idx].metadata:
+                    programs.add(documents[idx].metadata['program'])
+
+            # Chroma metadata only accepts scalar values, so sources are joined
+            metadata = {
+                **canonical.metadata,
+                'duplicate_count': len(members),
+                'sources': "; ".join(sources)
+            }
+
+            # Boilerplate shared by several programs is no longer program-specific
+            if len(programs) > 1:
+                metadata['program'] = SHARED_PROGRAM
+
+            deduplicated.append(Document(page_content=canonical.page_content, metadata=metadata))
+
+        removed = len(documents) - len(deduplicated)
+        self.last_stats = {
+            'input_chunks': len(documents),
+            'output_chunks': len(deduplicated),
+            'removed_chunks': removed,
+            'reduction': removed / len(documents),
+            'multi_member_clusters': sum(1 for members in clusters if len(members) > 1)
+        }
+        logger.info(
+            f"Deduplication removed {removed} of {len(documents)} chunks "
+            f"({self.last_stats['reduction']:.1%} reduction)"
+        )
+        return deduplicated
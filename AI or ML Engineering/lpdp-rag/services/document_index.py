@@ -0,0 +1,125 @@
+"""
+Document-level summary index for two-stage (document -> chunk) retrieval
+"""
+import os
+import logging
+from collections import OrderedDict
+from typing import List, Dict, Any
+
+try:
+    from langchain_core.documents import Document
+except ImportError:
+    from langchain.schema import Document
+
+try:
+    from langchain_chroma import Chroma
+except ImportError:
+    from langchain_community.vectorstores import Chroma
+
+logger = logging.getLogger(__name__)
+
+class DocumentIndex:
+    """
+    Holds a few summary embeddings per guidebook / JSON / web source so a
+    query can first pick the top-M documents before chunk-level search
+    """
+
+    def __init__(self, embeddings, client, collection_name: str):
+        """Initialize the document index on the same Chroma client as the chunk store"""
+        self.collection_name = f"{collection_name}_documents"
+        self.segments = int(os.getenv('DOC_SUMMARY_SEGMENTS', 4))
+        self.summary_chars = int(os.getenv('DOC_SUMMARY_CHARS', 600))
+
+        self.store = Chroma(
+            collection_name=self.collection_name,
+            embedding_function=embeddings,
+            client=client
+        )
+        self._populated = None
+
+    @staticmethod
+    def _readable_title(source: str) -> str:
+        """Turn a source filename into a readable title"""
+        name = os.path.splitext(source)[0]
+        return name.replace('_', ' ').replace('-', ' ').strip()
+
+    def build_summaries(self, documents: List[Document]) -> List[Document]:
+        """Build a few extractive summary documents per source"""
+        grouped = OrderedDict()
+        for doc in documents:
+            grouped.setdefault(doc.metadata.get('source', 'unknown'), []).append(doc)
+
+        summaries = []
+        for source, pages in grouped.items():
+            title = self._readable_title(source)
+            program = pages[0].metadata.get('program', '')
+            segment_count = max(1, min(self.segments, len(pages)))
+            segment_size = -(-len(pages) // segment_count)
+
+            for segment in range(segment_count):
+                segment_pages = pages[segment * segment_size:(segment + 1) * segment_size]
+                if not segment_pages:
+                    continue
+                text = " ".join(" ".join(page.page_content.split()) for page in segment_pages)
+                summaries.append(Document(
+                    page_content=f"{title}\n{text[:self.summary_chars]}",
+                    metadata={
+                        'source': source,
+                        'title': title,
+                        'program': program,
+                        'segment': segment,
+                        'type': 'document_summary'
+                    }
+                ))
+        return summaries
+
+    def add_documents(self, documents: List[Document]) -> int:
+        """Index summaries for the given (unsplit) documents; re-ingestion overwrites"""
+        summaries = self.build_summaries(documents)
+        if not summaries:
+            return 0
+
+        ids = [f"{doc.metadata['source']}#{doc.metadata['segment']}" for doc in summaries]
+        self.store.add_documents(summaries, ids=ids)
+        self._populated = True
+        sources = {doc.metadata['source'] for doc in summaries}
+        logger.info(f"Indexed {len(summaries)} document summaries for {len(sources)} sources")
+        return len(summaries)
+
+    def count(self) -> int:
+        """Get the number of summary entries"""
+        try:
+            return self.store._collection.count()
+        except Exception:
+            return 0
+
+    def is_populated(self) -> bool:
+        """Check (once) whether any summaries have been indexed"""
+        if self._populated is None:
+            self._populated = self.count() > 0
+        return self._populated
+
+    def select_sources(self, embedding: List[float], top_m: int = 3) -> List[str]:
+        """Pick the top-M distinct sources for a query embedding"""
+        try:
+            results = self.store.similarity_search_by_vector(embedding, k=top_m * self.segments)
+        except Exception as e:
+            logger.error(f"Error searching document index: {e}")
+            return []
+
+        sources = []
+        for doc in results:
+            source = doc.metadata.get('source')
+            if source and source not in sources:
+                sources.append(source)
+            if len(sources) >= top_m:
+                break
+        return sources
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get document index statistics"""
+        return {
+            'collection': self.collection_name,
+            'summaries': self.count(),
+            'segments_per_document': self.segments
+        }
@@ -0,0 +1,148 @@
+"""
+Out-of-domain gate: refuses off-topic questions before any LLM call
+"""
+import os
+import logging
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from .fork_safety import register_after_fork
+from .pipeline_metrics import get_pipeline_metrics
+
+logger = logging.getLogger(__name__)
+
+# Off-topic seed questions for the negative centroid (in-domain uses the canonical FAQ questions)
+_OFF_TOPIC_SEEDS = [
+    "Bagaimana resep membuat nasi goreng yang enak?",
+    "Siapa yang menang pertandingan sepak bola tadi malam?",
+    "Bagaimana cuaca hari ini di Jakarta?",
+    "Rekomendasikan film horor terbaru",
+    "Tuliskan kode Python untuk mengurutkan list",
+    "Berapa harga saham BBCA hari ini?",
+    "Bagaimana cara menurunkan berat badan dengan cepat?",
+    "Lirik lagu terbaru yang sedang viral",
+    "Apa obat untuk sakit kepala?",
+    "Tips bermain game mobile legends",
+    "Bagaimana cara memperbaiki motor yang mogok?",
+    "Where can I buy cheap flight tickets to Bali?",
+    "What is the capital of France?",
+    "Tell me a joke",
+    "How do I fix my wifi router?",
+]
+
+REFUSAL_MESSAGE = (
+    "Maaf, saya hanya dapat membantu pertanyaan seputar **Beasiswa LPDP**, seperti persyaratan, "
+    "jadwal pendaftaran, jenis program, dan informasi kelembagaan LPDP. "
+    "Silakan ajukan pertanyaan yang berkaitan dengan LPDP."
+)
+
+class DomainGate:
+    """
+    Two-signal relevance gate: a question is refused only when the best
+    retrieved chunk scores below a calibrated threshold and an embedding
+    centroid classifier (LPDP questions vs off-topic seeds) agrees
+    """
+
+    def __init__(self, vector_service, questions_path: Optional[str] = None):
+        """Initialize the domain gate"""
+        self.vector_service = vector_service
+        self.questions_path = questions_path or os.getenv('FAQ_QUESTIONS_PATH', './data/faq/canonical_questions.txt')
+        self.threshold = float(os.getenv('DOMAIN_GATE_THRESHOLD', 0.35))
+        self.centroid_margin = float(os.getenv('DOMAIN_CENTROID_MARGIN', 0.0))
+
+        self._centroids = None
+        self._lock = threading.Lock()
+        self.stats = {'checks': 0, 'refused': 0, 'low_score_kept': 0}
+        self.metrics = get_pipeline_metrics()
+        register_after_fork(self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        """Fresh lock in a forked worker"""
+        self._lock = threading.Lock()
+
+    def _load_centroids(self):
+        """Embed the in-domain and off-topic seed questions once"""
+        with self._lock:
+            if self._centroids is not None:
+                return
+            try:
+                with open(self.questions_path, 'r', encoding='utf-8') as f:
+                    in_domain = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+            except FileNotFoundError:
+                logger.warning(f"Domain gate seed questions not found: {self.questions_path}")
+                in_domain = []
+
+            if not in_domain:
+                self._centroids = np.zeros((0, 0), dtype=np.float32)
+                return
+
+            centroids = []
+            for seeds in (in_domain, _OFF_TOPIC_SEEDS):
+                vectors = np.asarray(self.vector_service.embeddings.embed_documents(seeds), dtype=np.float32)
+                vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+                centroids.append(vectors.mean(axis=0))
+            centroids = np.asarray(centroids)
+            self._centroids = centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+            logger.info(f"Domain gate centroids built from {len(in_domain)} in-domain seeds")
+
+    def classify(self, query_embedding: List[float]) -> Dict[str, Any]:
+        """Centroid classifier: margin = sim(LPDP) - sim(off-topic)"""
+        self._load_centroids()
+        if self._centroids.size == 0:
+            return {'in_domain': True, 'margin': None}
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        in_sim, off_sim = (self._centroids @ query).tolist()
+        margin = in_sim - off_sim
+        return {'in_domain': margin >= self.centroid_margin, 'margin': round(margin, 4)}
+
+    def check(self, question: str, query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        """Score a question; 'refuse' is True only when both signals say off-topic"""
+        if query_embedding is None:
+            with self.metrics.stage('query_embedding'):
+                query_embedding = self.vector_service.embed_query(question)
+
+        with self.metrics.stage('vector_search'):
+            scored = self.vector_service.similarity_search_with_score_by_vector(query_embedding, k=1)
+        best_score = scored[0][1] if scored else 0.0
+        classification = self.classify(query_embedding)
+
+        low_score = best_score < self.threshold
+        refuse = low_score and not classification['in_domain']
+
+        self.stats['checks'] += 1
+        if refuse:
+            self.stats['refused'] += 1
+        elif low_score:
+            self.stats['low_score_kept'] += 1
+
+        return {
+            'refuse': refuse,
+            'best_score': best_score,
+            'margin': classification['margin'],
+            'in_domain': classification['in_domain']
+        }
+
+    def refusal_response(self, session_id: str, decision: Dict[str, Any]) -> Dict[str, Any]:
+        """Polite refusal without any LLM call"""
+        return {
+            'answer': REFUSAL_MESSAGE,
+            'sources': [],
+            'confidence': decision['best_score'],
+            'needs_continuation': False,
+            'metadata': {
+                'session_id': session_id,
+                'timestamp': datetime.now().isoformat(),
+                'approach': 'out_of_domain',
+                'best_score': decision['best_score'],
+                'centroid_margin': decision['margin']
+            }
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Gate settings and counters"""
+        return {'threshold': self.threshold, 'centroid_margin': self.centroid_margin, **self.stats}
@@ -0,0 +1,115 @@
+"""
+Page-level extraction cache for parsed PDF documents
+"""
+import os
+import gzip
+import json
+import hashlib
+import logging
+from typing import List, Dict, Any, Optional
+
+try:
+    import pypdf
+    PARSER_VERSION = f"pypdf-{pypdf.__version__}-v1"
+except ImportError:
+    PARSER_VERSION = "pypdf-unknown-v1"
+
+logger = logging.getLogger(__name__)
+
+class ExtractionCache:
+    """
+    Stores extracted page text and metadata as gzip-compressed JSONL,
+    keyed by file content hash and parser version
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, parser_version: str = PARSER_VERSION):
+        """Initialize the extraction cache"""
+        self.cache_dir = cache_dir or os.getenv('EXTRACTION_CACHE_PATH', './data/cache/extracted')
+        self.parser_version = parser_version
+        self.enabled = os.getenv('EXTRACTION_CACHE_ENABLED', 'true').lower() == 'true'
+        self.hits = 0
+        self.misses = 0
+
+        if self.enabled:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def file_hash(file_path: str) -> str:
+        """Compute the SHA-256 content hash of a file"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _entry_path(self, content_hash: str) -> str:
+        """Get cache file path for a content hash"""
+        return os.path.join(self.cache_dir, f"{content_hash}.{self.parser_version}.jsonl.gz")
+
+    def get(self, file_path: str) -> Optional[List[Dict[str, Any]]]:
+        """Return cached pages as [{'page_content': ..., 'metadata': {...}}] or None"""
+        if not self.enabled:
+            return None
+
+        try:
+            entry_path = self._entry_path(self.file_hash(file_path))
+            if not os.path.exists(entry_path):
+                self.misses += 1
+                return None
+
+            pages = []
+            with gzip.open(entry_path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        pages.append(json.loads(line))
+
+            self.hits += 1
+            logger.info(f"Extraction cache hit for {os.path.basename(file_path)} ({len(pages)} pages)")
+            return pages
+
+        except Exception as e:
+            logger.warning(f"Error reading extraction cache for {file_path}: {e}")
+            self.misses += 1
+            return None
+
+    def put(self, file_path: str, pages: List[Dict[str, Any]]) -> bool:
+        """Store extracted pages for a file"""
+        if not self.enabled:
+            return False
+
+        try:
+            entry_path = self._entry_path(self.file_hash(file_path))
+            tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                for page in pages:
+                    f.write(json.dumps(page, ensure_ascii=False) + "\n")
+
+            # Atomic rename so concurrent readers never see partial files
+            os.replace(tmp_path, entry_path)
+            return True
+
+        except Exception as e:
+            logger.warning(f"Error writing extraction cache for {file_path}: {e}")
+            return False
+
+    def clear(self) -> int:
+        """Remove all cache entries, returns number of removed files"""
+        removed = 0
+        if not os.path.isdir(self.cache_dir):
+            return removed
+
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.jsonl.gz'):
+                os.remove(os.path.join(self.cache_dir, name))
+                removed += 1
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        return {
+            'enabled': self.enabled,
+            'parser_version': self.parser_version,
+            'hits': self.hits,
+            'misses': self.misses
+        }
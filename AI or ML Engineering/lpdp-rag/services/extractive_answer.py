@@ -0,0 +1,186 @@
+"""
+Extractive answer engine: builds answers from retrieved sentences without the LLM
+"""
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+
+try:
+    from langchain_core.documents import Document
+except ImportError:
+    from langchain.schema import Document
+
+from .citations import source_citation
+from .fork_safety import register_after_fork
+
+logger = logging.getLogger(__name__)
+
+# Sentence boundary: terminal punctuation followed by whitespace, or line breaks / list markers
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?;])\s+(?=[A-Z0-9"(])|\n+\s*(?:[-•*▪]\s+|\d+[.)]\s+)?')
+
+class ExtractiveAnswerer:
+    """
+    Splits retrieved chunks into sentences, scores them against the query
+    embedding with the already-loaded embedding model and selects a diverse
+    top set with MMR; sentence embeddings are cached per chunk
+    """
+
+    def __init__(self, embeddings):
+        """Initialize the extractive answerer with the vector store's embedding model"""
+        self.embeddings = embeddings
+        self.max_sentences = int(os.getenv('EXTRACTIVE_MAX_SENTENCES', 4))
+        self.mmr_lambda = float(os.getenv('EXTRACTIVE_MMR_LAMBDA', 0.7))
+        self.min_chars = int(os.getenv('EXTRACTIVE_MIN_CHARS', 30))
+        self.max_chars = 400
+        self.cache_size = int(os.getenv('EXTRACTIVE_CACHE_SIZE', 2000))
+
+        self._cache: "OrderedDict[str, Tuple[List[str], np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'answers': 0, 'cache_hits': 0, 'cache_misses': 0}
+        register_after_fork(self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        """Fresh lock in a forked worker; cached sentence embeddings stay shared"""
+        self._lock = threading.Lock()
+
+    def split_sentences(self, text: str) -> List[str]:
+        """Split chunk text into candidate sentences"""
+        sentences = []
+        for part in _SENTENCE_SPLIT.split(text or ""):
+            sentence = re.sub(r'\s+', ' ', part or '').strip(' -•*▪')
+            if len(sentence) < self.min_chars:
+                continue
+            if len(sentence) > self.max_chars:
+                sentence = sentence[:self.max_chars].rsplit(' ', 1)[0] + '…'
+            sentences.append(sentence)
+        return sentences
+
+    def _chunk_key(self, document) -> str:
+        """Cache key for a chunk (stored chunk_id or content hash)"""
+        return document.metadata.get('chunk_id') or hashlib.sha1(document.page_content.encode('utf-8')).hexdigest()
+
+    def _sentences_for(self, documents) -> List[Tuple[List[str], np.ndarray]]:
+        """Sentences and normalized embeddings per chunk, embedding only cache misses in one batch"""
+        keys = [self._chunk_key(doc) for doc in documents]
+        results = [None] * len(documents)
+        missing = []
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    results[i] = self._cache[key]
+                    self.stats['cache_hits'] += 1
+                else:
+                    missing.append(i)
+                    self.stats['cache_misses'] += 1
+
+        if missing:
+            split = {i: self.split_sentences(documents[i].page_content) for i in missing}
+            texts = [sentence for i in missing for sentence in split[i]]
+            vectors = np.zeros((0, 1), dtype=np.float32)
+            if texts:
+                vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+                vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+            offset = 0
+            with self._lock:
+                for i in missing:
+                    count = len(split[i])
+                    entry = (split[i], vectors[offset:offset + count])
+                    offset += count
+                    results[i] = entry
+                    self._cache[keys[i]] = entry
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return results
+
+    def _mmr(self, query: np.ndarray, vectors: np.ndarray, k: int) -> List[int]:
+        """Maximal marginal relevance selection"""
+        relevance = vectors @ query
+        selected = [int(np.argmax(relevance))]
+        while len(selected) < min(k, len(vectors)):
+            redundancy = (vectors @ vectors[selected].T).max(axis=1)
+            scores = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * redundancy
+            scores[selected] = -np.inf
+            selected.append(int(np.argmax(scores)))
+        return selected
+
+    def answer(self, question: str, documents, query_embedding=None) -> Dict[str, Any]:
+        """Build an extractive answer with numbered citations; returns answer, sources and confidence"""
+        start = time.perf_counter()
+        self.stats['answers'] += 1
+
+        per_chunk = self._sentences_for(documents)
+        sentences, owners, blocks = [], [], []
+        for doc_idx, (chunk_sentences, vectors) in enumerate(per_chunk):
+            if chunk_sentences:
+                sentences.extend(chunk_sentences)
+                owners.extend([doc_idx] * len(chunk_sentences))
+                blocks.append(vectors)
+
+        if not sentences:
+            return {
+                'answer': "Maaf, tidak ditemukan informasi yang relevan di dokumen LPDP untuk pertanyaan tersebut.",
+                'sources': [],
+                'confidence': 0.0,
+                'processing_time': time.perf_counter() - start
+            }
+
+        if query_embedding is None:
+            query_embedding = self.embeddings.embed_query(question)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        vectors = np.vstack(blocks)
+
+        selected = self._mmr(query, vectors, self.max_sentences)
+        relevance = vectors @ query
+
+        # Number citations by first appearance among the selected sentences
+        citation_of: Dict[int, int] = {}
+        sources = []
+        lines = []
+        for idx in selected:
+            doc_idx = owners[idx]
+            if doc_idx not in citation_of:
+                metadata = documents[doc_idx].metadata
+                citation_of[doc_idx] = len(citation_of) + 1
+                sources.append(source_citation(metadata))
+            lines.append(f"- {sentences[idx]} [{citation_of[doc_idx]}]")
+
+        references = []
+        for number, source in enumerate(sources, 1):
+            page = f", hlm. {int(source['page']) + 1}" if isinstance(source.get('page'), (int, float)) else ""
+            references.append(f"[{number}] {source['title']}{page}")
+
+        answer = (
+            "Berikut kutipan paling relevan dari dokumen LPDP:\n\n"
+            + "\n".join(lines)
+            + "\n\n**Sumber:**\n"
+            + "\n".join(references)
+        )
+
+        confidence = float(np.clip(np.mean(relevance[selected]), 0.0, 1.0))
+        return {
+            'answer': answer,
+            'sources': sources,
+            'confidence': round(confidence, 3),
+            'processing_time': time.perf_counter() - start
+        }
+
+    def answer_text(self, question: str, context: str) -> str:
+        """Extractive answer from a plain context string"""
+        return self.answer(question, [Document(page_content=context, metadata={'source': 'konteks'})])['answer']
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Answer counts and sentence-embedding cache statistics"""
+        with self._lock:
+            return {**self.stats, 'cached_chunks': len(self._cache)}
@@ -0,0 +1,384 @@
+"""
+Structured fact index for answering organizational, contact and schedule questions directly
+"""
+import os
+import re
+import json
+import time
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+ORG_FILE = "struktur_organisasi.json"
+INFO_FILE = "additional_info.json"
+
+# English position words -> Indonesian equivalents used in questions
+_TERM_TRANSLATIONS = {
+    "finance": ["keuangan"],
+    "general": ["umum"],
+    "affairs": [],
+    "investment": ["investasi"],
+    "scholarship": ["beasiswa"],
+    "research": ["riset", "penelitian"],
+    "facilitation": ["fasilitasi"],
+    "human": ["sdm"],
+    "resources": ["sdm"],
+    "information": ["ti", "it"],
+    "technology": ["ti", "it", "teknologi"],
+    "legal": ["hukum"],
+    "communication": ["komunikasi"],
+    "internal": [],
+    "compliance": ["kepatuhan"],
+    "risk": ["risiko"],
+    "management": ["manajemen"],
+    "money": ["uang"],
+    "market": ["pasar"],
+    "capital": ["modal"],
+    "asset": ["aset"],
+    "settlement": ["penyelesaian"],
+    "admission": ["penerimaan", "seleksi"],
+    "services": ["layanan", "pelayanan"],
+    "alumni": ["alumni"],
+    "talents": ["talenta"],
+    "partnership": ["kemitraan"],
+    "program": ["program"],
+    "development": ["pengembangan"],
+    "funding": ["pendanaan"],
+    "evaluation": ["evaluasi"],
+}
+
+_STOPWORDS = {"head", "of", "and", "the", "division", "director"}
+
+_PRESIDENT_PATTERN = re.compile(r'\b(direktur utama|president director|dirut)\b')
+_AUDIT_PATTERN = re.compile(r'\b(audit internal|internal audit|unit audit)\b')
+_DIRECTOR_PATTERN = re.compile(r'\b(direktur|director)\b')
+_DIVISION_PATTERN = re.compile(r'\b(kepala divisi|kadiv|divisi|division)\b')
+_LIST_DIVISIONS_PATTERN = re.compile(r'\b(membawahi|divisi apa|daftar divisi|divisions)\b')
+# Role answers need an explicit "who" question; "apakah direktur utama ..." asks about something else
+_WHO_PATTERN = re.compile(r'\b(siapa|siapakah|who|nama)\b')
+
+# Contact answers need both the LPDP/CS entity and an explicit contact field
+_CONTACT_ENTITY_PATTERN = re.compile(r'\b(lpdp|cs|customer service|call center|hotline)\b')
+# Contacts of someone else (campus, supervisor, embassy, ...) are not in the JSON
+_OTHER_CONTACT_PATTERN = re.compile(
+    r'\b(kampus|universitas|university|pembimbing|supervisor|profesor|professor|dosen|kedutaan|embassy|mitra|sponsor)\b'
+)
+_CONTACT_PATTERNS = [
+    ("phone", re.compile(r'\b(telepon|telpon|telp|phone|call center|hotline|whatsapp|nomor (?:telepon|telpon|telp|kontak|cs|hp))\b')),
+    ("email", re.compile(r'\b(email|e-mail|surel)\b')),
+    ("website", re.compile(r'\b(website|situs|laman|web)\b')),
+    ("operating_hours", re.compile(r'\b(jam operasional|jam kerja|jam layanan|operating hours|jam buka)\b')),
+    ("address", re.compile(r'\b(alamat|address|lokasi kantor|letak kantor)\b')),
+]
+_SOCIAL_PATTERN = re.compile(r'\b(instagram|twitter|facebook|youtube|linkedin|media sosial|sosmed|social media)\b')
+# A contact field must be what is asked for: a question word at most two words before it
+# ("apa alamat", "berapa nomor telepon", "apa akun instagram"), or a trailing one ("email cs lpdp apa")
+_ASK_WORDS = r'(?:apa|apakah|berapa|dimana|di mana|mana|kapan|what|where|which|sebutkan)'
+_ASK_BEFORE_PATTERN = _ASK_WORDS + r'(?:\s+\S+){0,2}\s+$'
+_ASK_AFTER_PATTERN = re.compile(r'\b' + _ASK_WORDS + r'(?:\s+saja)?$')
+
+# Schedule answers need a date question, a registration field (open/close/announcement)
+# and the registration period itself (a batch or "pendaftaran")
+_REGISTRATION_PATTERN = re.compile(r'\b(pendaftaran|registrasi|registration|mendaftar|daftar)\b')
+# Questions about other parts of the process are not answered by registration dates
+_OTHER_TOPIC_PATTERN = re.compile(
+    r'\b(syarat|persyaratan|requirement|requirements|dokumen|berkas|document|documents|wawancara|interview|'
+    r'substansi|tes|test|esai|essay|ujian|kuliah|keberangkatan|pencairan|tunjangan|biaya)\b'
+)
+_BATCH_PATTERN = re.compile(r'\b(?:batch|tahap|gelombang)\s*(\d+)\b')
+_WHEN_PATTERN = re.compile(r'\b(kapan|jadwal|tanggal|when|schedule|deadline)\b')
+_CLOSE_PATTERN = re.compile(r'\b(ditutup|tutup|berakhir|akhir|deadline|close|closes|batas)\b')
+_OPEN_PATTERN = re.compile(r'\b(dibuka|buka|mulai|dimulai|open|opens|start)\b')
+_ANNOUNCE_PATTERN = re.compile(r'\b(pengumuman|diumumkan|announcement|hasil)\b')
+
+_CONTACT_LABELS = {
+    "phone": "Nomor telepon Customer Service LPDP",
+    "email": "Email Customer Service LPDP",
+    "website": "Website resmi LPDP",
+    "operating_hours": "Jam operasional layanan LPDP",
+}
+
+class StructuredFactIndex:
+    """
+    In-memory index of structured facts from the JSON knowledge files with a
+    lightweight intent matcher that answers without retrieval or the LLM
+    """
+
+    def __init__(self, documents_dir: Optional[str] = None):
+        """Initialize the fact index"""
+        self.documents_dir = documents_dir or os.getenv('DOCUMENTS_PATH', './data/documents')
+        self.max_words = int(os.getenv('FACT_MAX_WORDS', 14))
+        self.org = self._load_json(ORG_FILE)
+        self.info = self._load_json(INFO_FILE)
+
+        self.directorates = self._build_directorates()
+        self.divisions = self._build_divisions()
+
+        self.hits = 0
+        self.misses = 0
+        logger.info(
+            f"Structured fact index initialized with {len(self.directorates)} directorates "
+            f"and {len(self.divisions)} divisions"
+        )
+
+    def _load_json(self, filename: str) -> Dict[str, Any]:
+        """Load a JSON knowledge file, empty dict if unavailable"""
+        path = os.path.join(self.documents_dir, filename)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Structured facts unavailable from {filename}: {e}")
+            return {}
+
+    @staticmethod
+    def _topic_terms(title: str) -> set:
+        """English and Indonesian topic terms for a position or division title"""
+        terms = set()
+        for word in re.findall(r'[a-z]+', title.lower()):
+            if word in _STOPWORDS:
+                continue
+            terms.add(word)
+            terms.update(_TERM_TRANSLATIONS.get(word, []))
+        return terms
+
+    def _build_directorates(self) -> List[Dict[str, Any]]:
+        """Flatten directorates with their topic terms"""
+        directorates = []
+        for idx, directorate in enumerate(self.org.get("Directorates", [])):
+            position = directorate.get("Position", "")
+            directorates.append({
+                "director": directorate.get("Director", ""),
+                "position": position,
+                "divisions": [div.get("Division", "") for div in directorate.get("Divisions", [])],
+                "terms": self._topic_terms(position),
+                "field": f"Directorates[{idx}]"
+            })
+        return directorates
+
+    def _build_divisions(self) -> List[Dict[str, Any]]:
+        """Flatten divisions with their hierarchy and topic terms"""
+        divisions = []
+        for d_idx, directorate in enumerate(self.org.get("Directorates", [])):
+            for v_idx, division in enumerate(directorate.get("Divisions", [])):
+                title = division.get("Division", "")
+                divisions.append({
+                    "head": division.get("Head"),
+                    "division": title,
+                    "director": directorate.get("Director", ""),
+                    "directorate": directorate.get("Position", ""),
+                    "terms": self._topic_terms(title),
+                    "field": f"Directorates[{d_idx}].Divisions[{v_idx}]"
+                })
+        return divisions
+
+    @staticmethod
+    def _normalize(question: str) -> str:
+        """Lowercase and strip punctuation"""
+        return re.sub(r'\s+', ' ', re.sub(r'[^\w\s\-]', ' ', question.lower())).strip()
+
+    @staticmethod
+    def _best_match(entries: List[Dict[str, Any]], words: set) -> Optional[Dict[str, Any]]:
+        """Entry with the most topic-term overlap; None if no overlap or ambiguous"""
+        scored = sorted(((len(entry["terms"] & words), entry) for entry in entries), key=lambda item: -item[0])
+        if not scored or scored[0][0] == 0:
+            return None
+        if len(scored) > 1 and scored[1][0] == scored[0][0]:
+            return None
+        return scored[0][1]
+
+    def _fact(self, answer: str, source_file: str, field: str, intent: str) -> Dict[str, Any]:
+        """Build a fact match"""
+        return {"answer": answer, "source": source_file, "field": field, "intent": intent}
+
+    def _match_organization(self, text: str, words: set) -> Optional[Dict[str, Any]]:
+        """Match role, directorate and division questions"""
+        if not self.org:
+            return None
+
+        if _LIST_DIVISIONS_PATTERN.search(text):
+            directorate = self._best_match(self.directorates, words)
+            if directorate:
+                division_list = "\n".join(f"- {name}" for name in directorate["divisions"])
+                return self._fact(
+                    f"Direktorat {directorate['position']} dipimpin oleh **{directorate['director']}** "
+                    f"dan membawahi divisi-divisi:\n{division_list}",
+                    ORG_FILE, directorate["field"], "directorate_summary"
+                )
+
+        if not _WHO_PATTERN.search(text):
+            return None
+
+        if _PRESIDENT_PATTERN.search(text) and "President Director" in self.org:
+            return self._fact(
+                f"Direktur Utama LPDP adalah **{self.org['President Director']}**.",
+                ORG_FILE, "President Director", "president_director"
+            )
+
+        if _AUDIT_PATTERN.search(text) and "Head of Internal Audit Unit" in self.org:
+            return self._fact(
+                f"Kepala Unit Audit Internal LPDP adalah **{self.org['Head of Internal Audit Unit']}**.",
+                ORG_FILE, "Head of Internal Audit Unit", "audit_head"
+            )
+
+        if _DIVISION_PATTERN.search(text):
+            division = self._best_match(self.divisions, words)
+            if division:
+                head = division["head"]
+                if head and str(head).lower() != "null":
+                    answer = (f"**{head}** adalah {division['division']} di bawah "
+                              f"{division['directorate']} ({division['director']}) di LPDP.")
+                else:
+                    answer = (f"Posisi {division['division']} di bawah {division['directorate']} "
+                              f"({division['director']}) saat ini kosong atau sedang dicari.")
+                return self._fact(answer, ORG_FILE, division["field"], "division_head")
+
+        if _DIRECTOR_PATTERN.search(text):
+            directorate = self._best_match(self.directorates, words)
+            if directorate:
+                return self._fact(
+                    f"**{directorate['director']}** adalah {directorate['position']} di LPDP.",
+                    ORG_FILE, f"{directorate['field']}.Director", "director"
+                )
+
+        return None
+
+    @staticmethod
+    def _asks_for(text: str, field_match: re.Match) -> bool:
+        """Whether the question asks for the matched field rather than merely mentioning it"""
+        return bool(re.search(r'\b' + _ASK_BEFORE_PATTERN, text[:field_match.start()])
+                    or _ASK_AFTER_PATTERN.search(text))
+
+    def _match_contact(self, text: str) -> Optional[Dict[str, Any]]:
+        """Match customer service, address and social media questions"""
+        contact = self.info.get("contact_information", {})
+        if not contact:
+            return None
+
+        social = self.info.get("social_media", {})
+        social_match = _SOCIAL_PATTERN.search(text)
+        if social_match and social and not _OTHER_CONTACT_PATTERN.search(text) and self._asks_for(text, social_match):
+            requested = [name for name in social if name in text]
+            names = requested or list(social)
+            lines = "\n".join(f"- {name.capitalize()}: {social[name]}" for name in names)
+            return self._fact(f"Media sosial resmi LPDP:\n{lines}", INFO_FILE, "social_media", "social_media")
+
+        if not _CONTACT_ENTITY_PATTERN.search(text) or _OTHER_CONTACT_PATTERN.search(text):
+            return None
+
+        for key, pattern in _CONTACT_PATTERNS:
+            field_match = pattern.search(text)
+            if not field_match or not self._asks_for(text, field_match):
+                continue
+            if key == "address":
+                address = contact.get("address", {})
+                if address:
+                    return self._fact(
+                        f"Alamat Kantor Pusat LPDP: **{address.get('head_office', '')}** "
+                        f"(Kode Pos {address.get('postal_code', '')}, {address.get('province', '')}).",
+                        INFO_FILE, "contact_information.address", "address"
+                    )
+            else:
+                value = contact.get("customer_service", {}).get(key)
+                if value:
+                    return self._fact(
+                        f"{_CONTACT_LABELS[key]}: **{value}**.",
+                        INFO_FILE, f"contact_information.customer_service.{key}", key
+                    )
+        return None
+
+    def _match_schedule(self, text: str) -> Optional[Dict[str, Any]]:
+        """Match registration schedule questions"""
+        periods = self.info.get("important_dates_2025", {}).get("registration_periods", [])
+        if not periods or not _WHEN_PATTERN.search(text) or _OTHER_TOPIC_PATTERN.search(text):
+            return None
+
+        batch_match = _BATCH_PATTERN.search(text)
+        registration = _REGISTRATION_PATTERN.search(text)
+        if not batch_match and not registration:
+            return None
+        # Without an open/close/announcement field only a registration schedule question qualifies
+        if not (_CLOSE_PATTERN.search(text) or _ANNOUNCE_PATTERN.search(text) or _OPEN_PATTERN.search(text)
+                or registration):
+            return None
+
+        selected = periods
+        if batch_match:
+            label = f"batch {batch_match.group(1)}"
+            selected = [p for p in periods if p.get("batch", "").lower() == label]
+            if not selected:
+                return None
+
+        if _CLOSE_PATTERN.search(text):
+            key, label = "registration_end", "Pendaftaran LPDP {batch} 2025 ditutup"
+        elif _ANNOUNCE_PATTERN.search(text):
+            key, label = "announcement", "Pengumuman hasil seleksi LPDP {batch} 2025"
+        elif _OPEN_PATTERN.search(text):
+            key, label = "registration_start", "Pendaftaran LPDP {batch} 2025 dibuka"
+        else:
+            key, label = None, None
+
+        lines = []
+        for period in selected:
+            if key:
+                lines.append(f"- {label.format(batch=period.get('batch', ''))} pada **{period.get(key, '')}**.")
+            else:
+                lines.append(
+                    f"- **{period.get('batch', '')} 2025**: pendaftaran dibuka {period.get('registration_start', '')}, "
+                    f"ditutup {period.get('registration_end', '')}, pengumuman {period.get('announcement', '')}."
+                )
+
+        field = "important_dates_2025.registration_periods"
+        if len(selected) == 1:
+            field += f"[{periods.index(selected[0])}]" + (f".{key}" if key else "")
+        return self._fact("\n".join(lines), INFO_FILE, field, "registration_schedule")
+
+    def lookup(self, question: str) -> Optional[Dict[str, Any]]:
+        """Return a fact match for the question, or None to fall through to RAG"""
+        text = self._normalize(question)
+        words = set(text.split())
+        if not words or len(words) > self.max_words:
+            return None
+
+        fact = self._match_organization(text, words) or self._match_schedule(text) or self._match_contact(text)
+        if fact:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return fact
+
+    def answer(self, question: str, session_id: str = "default") -> Optional[Dict[str, Any]]:
+        """Build a full RAG-shaped response for a fact question, or None"""
+        start = time.perf_counter()
+        fact = self.lookup(question)
+        if not fact:
+            return None
+
+        return {
+            "answer": f"{fact['answer']}\n\n_Sumber: {fact['source']}_",
+            "sources": [{
+                "title": fact["source"],
+                "source": fact["source"],
+                "field": fact["field"]
+            }],
+            "confidence": 1.0,
+            "needs_continuation": False,
+            "metadata": {
+                "session_id": session_id,
+                "timestamp": datetime.now().isoformat(),
+                "approach": "structured_fact",
+                "intent": fact["intent"],
+                "processing_time": time.perf_counter() - start
+            }
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get fact index statistics"""
+        return {
+            "directorates": len(self.directorates),
+            "divisions": len(self.divisions),
+            "hits": self.hits,
+            "misses": self.misses
+        }
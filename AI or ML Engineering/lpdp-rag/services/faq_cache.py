@@ -0,0 +1,285 @@
+"""
+Precomputed FAQ answer warm cache for high-traffic questions
+"""
+import os
+import re
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable
+
+import numpy as np
+
+from .fork_safety import register_after_fork
+from .pipeline_metrics import get_pipeline_metrics
+
+logger = logging.getLogger(__name__)
+
+# Pipeline approaches whose answers are real LLM generations and may be cached
+_GENERATED_APPROACHES = {'stateful_chain'}
+
+class FAQCache:
+    """
+    Serves precomputed answers for canonical questions by exact or high
+    similarity match; entries built against an older index version are
+    never served and are rebuilt in the background
+    """
+
+    def __init__(self, vector_service, cache_path: Optional[str] = None, questions_path: Optional[str] = None):
+        """Initialize the FAQ cache"""
+        self.vector_service = vector_service
+        self.cache_path = cache_path or os.getenv('FAQ_CACHE_PATH', './data/cache/faq_answers.json')
+        self.questions_path = questions_path or os.getenv('FAQ_QUESTIONS_PATH', './data/faq/canonical_questions.txt')
+        self.similarity_threshold = float(os.getenv('FAQ_SIMILARITY_THRESHOLD', 0.92))
+        self.auto_rebuild = os.getenv('FAQ_AUTO_REBUILD', 'true').lower() == 'true'
+        self.reload_interval = 30.0
+
+        self.entries: List[Dict[str, Any]] = []
+        self._exact: Dict[str, int] = {}
+        self._embeddings = None
+        self._loaded_mtime = None
+        self._last_reload_check = 0.0
+        self._lock = threading.Lock()
+        self._rebuild_thread = None
+        self._answer_fn = None
+
+        self.stats = {'lookups': 0, 'hits': 0, 'exact_hits': 0, 'similar_hits': 0, 'stale_skips': 0}
+        self.metrics = get_pipeline_metrics()
+        self.load()
+        register_after_fork(self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        """Fresh lock in a forked worker; a rebuild thread keeps running only in the parent"""
+        self._lock = threading.Lock()
+        self._rebuild_thread = None
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        """Normalize a question for exact matching"""
+        return re.sub(r'\s+', ' ', re.sub(r'[^\w\s]', ' ', question.lower())).strip()
+
+    def load_questions(self, path: Optional[str] = None) -> List[str]:
+        """Read canonical questions, one per line, '#' comments ignored"""
+        path = path or self.questions_path
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        except FileNotFoundError:
+            logger.warning(f"FAQ questions file not found: {path}")
+            return []
+
+    def load(self) -> bool:
+        """Load cached answers from disk and embed their questions"""
+        try:
+            if not os.path.exists(self.cache_path):
+                return False
+
+            mtime = os.path.getmtime(self.cache_path)
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            entries = data.get('entries', [])
+            embeddings = None
+            if entries:
+                vectors = np.asarray(
+                    self.vector_service.embeddings.embed_documents([entry['question'] for entry in entries]),
+                    dtype=np.float32
+                )
+                embeddings = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+            with self._lock:
+                self.entries = entries
+                self._exact = {entry['normalized']: idx for idx, entry in enumerate(entries)}
+                self._embeddings = embeddings
+                self._loaded_mtime = mtime
+
+            logger.info(f"Loaded {len(entries)} FAQ cache entries")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error loading FAQ cache: {e}")
+            return False
+
+    def _maybe_reload(self):
+        """Pick up a cache file rebuilt by another process"""
+        now = time.monotonic()
+        if now - self._last_reload_check < self.reload_interval:
+            return
+        self._last_reload_check = now
+        try:
+            if os.path.exists(self.cache_path) and os.path.getmtime(self.cache_path) != self._loaded_mtime:
+                self.load()
+        except OSError:
+            pass
+
+    def _is_fresh(self, entry: Dict[str, Any]) -> bool:
+        """Entry was built against the current index version"""
+        return entry.get('index_version') == self.vector_service.get_index_version()
+
+    def lookup(self, question: str, session_id: str = "default",
+               query_embedding: Optional[List[float]] = None) -> Optional[Dict[str, Any]]:
+        """Return a cached response for the question, or None (query_embedding: precomputed, e.g. batched)"""
+        self._maybe_reload()
+        if not self.entries:
+            return None
+
+        start = time.perf_counter()
+        self.stats['lookups'] += 1
+
+        with self._lock:
+            entries = self.entries
+            idx = self._exact.get(self.normalize(question))
+            embeddings = self._embeddings
+
+        match_type = 'exact'
+        similarity = 1.0
+        if idx is None and embeddings is not None:
+            if query_embedding is None:
+                with self.metrics.stage('query_embedding'):
+                    query_embedding = self.vector_service.embed_query(question)
+            query = np.asarray(query_embedding, dtype=np.float32)
+            query = query / max(float(np.linalg.norm(query)), 1e-12)
+            scores = embeddings @ query
+            best = int(np.argmax(scores))
+            if float(scores[best]) >= self.similarity_threshold:
+                idx, match_type, similarity = best, 'similar', float(scores[best])
+
+        if idx is None:
+            return None
+
+        entry = entries[idx]
+        if not self._is_fresh(entry):
+            self.stats['stale_skips'] += 1
+            # The index changed under us (possibly re-populated by another process)
+            if self._answer_fn:
+                self.ensure_fresh(self._answer_fn)
+            return None
+
+        self.stats['hits'] += 1
+        self.stats[f'{match_type}_hits'] += 1
+        entry['hits'] = entry.get('hits', 0) + 1
+
+        return {
+            'answer': entry['answer'],
+            'sources': entry.get('sources', []),
+            'confidence': entry.get('confidence', 0.8),
+            'needs_continuation': False,
+            'metadata': {
+                'session_id': session_id,
+                'timestamp': datetime.now().isoformat(),
+                'approach': 'faq_cache',
+                'faq_question': entry['question'],
+                'match': match_type,
+                'similarity': similarity,
+                'index_version': entry['index_version'],
+                'processing_time': time.perf_counter() - start
+            }
+        }
+
+    def build(self, answer_fn: Callable[[str], Dict[str, Any]], questions: Optional[List[str]] = None) -> int:
+        """Run questions through the RAG pipeline and store answers with the chunk IDs they were generated from"""
+        questions = questions if questions is not None else self.load_questions()
+        index_version = self.vector_service.get_index_version()
+
+        entries = []
+        for i, question in enumerate(questions, 1):
+            try:
+                result = answer_fn(question)
+                metadata = result.get('metadata', {})
+                if metadata.get('error') or metadata.get('fallback') or metadata.get('approach') not in _GENERATED_APPROACHES:
+                    logger.warning(f"Skipping FAQ question without a generated answer "
+                                   f"({metadata.get('approach', 'error')}): {question}")
+                    continue
+
+                entries.append({
+                    'question': question,
+                    'normalized': self.normalize(question),
+                    'answer': result['answer'],
+                    'sources': result.get('sources', []),
+                    'confidence': result.get('confidence', 0.8),
+                    'chunk_ids': metadata.get('chunk_ids', []),
+                    'index_version': index_version,
+                    'built_at': datetime.now().isoformat()
+                })
+                logger.info(f"Built FAQ answer {i}/{len(questions)}")
+            except Exception as e:
+                logger.error(f"Error building FAQ answer for '{question}': {e}")
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'index_version': index_version, 'entries': entries}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.cache_path)
+
+        self.load()
+        return len(entries)
+
+    def needs_rebuild(self) -> bool:
+        """Some canonical question is missing or was built against an older index"""
+        cached = {entry['normalized'] for entry in self.entries if self._is_fresh(entry)}
+        return any(self.normalize(q) not in cached for q in self.load_questions())
+
+    def ensure_fresh(self, answer_fn: Callable[[str], Dict[str, Any]]) -> bool:
+        """Start a background rebuild when stale; a lock file keeps it to one process"""
+        self._answer_fn = answer_fn
+        if self._rebuild_thread and self._rebuild_thread.is_alive():
+            return False
+        if not self.auto_rebuild or not self.needs_rebuild():
+            return False
+
+        lock_path = f"{self.cache_path}.lock"
+        try:
+            if os.path.exists(lock_path) and time.time() - os.path.getmtime(lock_path) > 3600:
+                os.remove(lock_path)
+            os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.close(fd)
+        except FileExistsError:
+            logger.info("FAQ cache rebuild already running in another process")
+            return False
+
+        def rebuild():
+            try:
+                count = self.build(answer_fn)
+                logger.info(f"FAQ cache rebuilt with {count} entries")
+            except Exception as e:
+                logger.error(f"FAQ cache rebuild failed: {e}")
+            finally:
+                try:
+                    os.remove(lock_path)
+                except OSError:
+                    pass
+
+        self._rebuild_thread = threading.Thread(target=rebuild, name="faq-cache-rebuild", daemon=True)
+        self._rebuild_thread.start()
+        logger.info("Started background FAQ cache rebuild")
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Coverage and hit-rate statistics"""
+        questions = self.load_questions()
+        fresh = [entry for entry in self.entries if self._is_fresh(entry)]
+        fresh_questions = {entry['normalized'] for entry in fresh}
+        covered = sum(1 for q in questions if self.normalize(q) in fresh_questions)
+
+        return {
+            'index_version': self.vector_service.get_index_version(),
+            'canonical_questions': len(questions),
+            'entries': len(self.entries),
+            'fresh_entries': len(fresh),
+            'coverage': covered / len(questions) if questions else 0.0,
+            'lookups': self.stats['lookups'],
+            'hits': self.stats['hits'],
+            'exact_hits': self.stats['exact_hits'],
+            'similar_hits': self.stats['similar_hits'],
+            'stale_skips': self.stats['stale_skips'],
+            'hit_rate': self.stats['hits'] / self.stats['lookups'] if self.stats['lookups'] else 0.0,
+            'rebuilding': bool(self._rebuild_thread and self._rebuild_thread.is_alive()),
+            'top_entries': sorted(
+                ({'question': entry['question'], 'hits': entry.get('hits', 0), 'fresh': self._is_fresh(entry)}
+                 for entry in self.entries),
+                key=lambda item: -item['hits']
+            )[:10]
+        }
@@ -0,0 +1,46 @@
+"""
+Post-fork re-initialization for preloaded deployments (gunicorn preload_app)
+
+Services build heavy, read-only state (model weights, indexes) once in the
+master process and register a callback that re-opens their per-process
+handles (Chroma client, HTTP pools, locks, sockets) in every forked worker.
+"""
+import os
+import logging
+import weakref
+from typing import Callable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+_callbacks: List[Tuple[str, Callable[[], Callable]]] = []
+_initialized_pid = os.getpid()
+
+def register_after_fork(callback: Callable[[], None]):
+    """Register a callback to run in each forked worker; bound methods are held weakly"""
+    name = getattr(callback, '__qualname__', repr(callback))
+    if hasattr(callback, '__self__'):
+        ref = weakref.WeakMethod(callback)
+    else:
+        ref = lambda: callback
+    _callbacks.append((name, ref))
+
+def run_after_fork() -> int:
+    """Run the registered callbacks once per process; returns how many ran"""
+    global _initialized_pid
+    pid = os.getpid()
+    if pid == _initialized_pid:
+        return 0
+    _initialized_pid = pid
+
+    count = 0
+    for name, ref in list(_callbacks):
+        callback = ref()
+        if callback is None:
+            continue
+        try:
+            callback()
+            count += 1
+        except Exception as e:
+            logger.error(f"After-fork handler {name} failed: {e}")
+    logger.info(f"Re-initialized {count} per-process handles in worker {pid}")
+    return count
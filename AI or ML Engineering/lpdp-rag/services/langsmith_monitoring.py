@@ -2,47 +2,79 @@
 LangSmith Monitoring Service for LPDP Scholarship AI Assistant
 """
 import os
+import uuid
 import logging
+import threading
+import contextvars
+import importlib.util
+from contextlib import contextmanager
 from typing import Dict, Any, Optional, List
-from datetime import datetime
-import uuid
+from datetime import datetime, timezone
+
+from .fork_safety import register_after_fork
+from .trace_exporter import TraceExporter, create_sink
 
-# LangSmith imports
-try:
-    from langsmith import Client
-    from langsmith.run_helpers import traceable
-    from langchain.callbacks.tracers import LangChainTracer
-    from langchain.callbacks.manager import CallbackManager
-    LANGSMITH_AVAILABLE = True
-except ImportError:
-    LANGSMITH_AVAILABLE = False
+# LangSmith itself is imported only when monitoring is configured
+LANGSMITH_AVAILABLE = importlib.util.find_spec('langsmith') is not None
 
 logger = logging.getLogger(__name__)
 
+# Root run of the chat turn being traced; spans recorded inside it become its children
+_current_trace: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    'langsmith_current_trace', default=None
+)
+
+def _dotted_order(start_time: datetime, run_id: str) -> str:
+    """LangSmith run ordering key segment"""
+    return f"{start_time.strftime('%Y%m%dT%H%M%S%fZ')}{run_id}"
+
+def _message_payload(messages) -> List[Dict[str, str]]:
+    """Compact, JSON-safe form of an LLM prompt (string or message list)"""
+    if isinstance(messages, str):
+        return [{'type': 'human', 'content': messages}]
+    return [{'type': getattr(m, 'type', 'unknown'), 'content': str(getattr(m, 'content', m))} for m in messages]
+
 class LangSmithMonitoring:
     """
     LangSmith monitoring and observability service for LPDP RAG system
+    
+    Spans are handed to a TraceExporter and exported in batches by a background
+    thread, so tracing never adds network latency to a chat request.
     """
     
     def __init__(self):
         self.client = None
-        self.tracer = None
         self.enabled = False
         self.project_name = os.getenv('LANGCHAIN_PROJECT', 'lpdp-rag-assistant')
         
-        # Initialize LangSmith if available and configured
+        self._init_client()
+        self.exporter = TraceExporter(
+            create_sink(self.client, self.project_name),
+            max_queue=int(os.getenv('TRACE_QUEUE_SIZE', 1000)),
+            batch_size=int(os.getenv('TRACE_BATCH_SIZE', 50)),
+            flush_interval=float(os.getenv('TRACE_FLUSH_INTERVAL', 2.0))
+        )
+        
+        # The API client's HTTP session is per process
+        register_after_fork(self._reinit_after_fork)
+    
+    def _reinit_after_fork(self):
+        """New API client in a forked worker, bound to the existing sink"""
+        self._init_client()
+        if self.exporter.sink.name == 'langsmith' and self.client:
+            self.exporter.sink.client = self.client
+    
+    def _init_client(self):
+        """Initialize LangSmith if available and configured"""
         if LANGSMITH_AVAILABLE and os.getenv('LANGCHAIN_API_KEY'):
             try:
+                from langsmith import Client
+                
                 self.client = Client(
                     api_url=os.getenv('LANGCHAIN_ENDPOINT', 'https://api.smith.langchain.com'),
                     api_key=os.getenv('LANGCHAIN_API_KEY')
                 )
                 
-                self.tracer = LangChainTracer(
-                    project_name=self.project_name,
-                    client=self.client
-                )
-                
                 self.enabled = True
                 logger.info(f"LangSmith monitoring initialized successfully for project: {self.project_name}")
                 
@@ -56,63 +88,99 @@ class LangSmithMonitoring:
                 logger.info("LangSmith API key not found. Set LANGCHAIN_API_KEY environment variable to enable monitoring.")
             self.enabled = False
     
-    def get_callback_manager(self) -> Optional[CallbackManager]:
-        """Get callback manager with LangSmith tracer"""
-        if self.enabled and self.tracer:
-            return CallbackManager([self.tracer])
-        return None
-    
     def get_callbacks(self) -> List:
-        """Get callbacks list for langchain operations"""
-        if self.enabled and self.tracer:
-            return [self.tracer]
+        """Callbacks for langchain models; empty, LLM calls are traced by LLMService through the exporter"""
         return []
     
-    @traceable(name="document_retrieval")
-    def trace_retrieval(self, query: str, documents: list, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+    @contextmanager
+    def trace_context(self):
+        """Open the root run of a chat turn; spans recorded inside it are nested under it"""
+        run_id = str(uuid.uuid4())
+        start_time = datetime.now(timezone.utc)
+        token = _current_trace.set({
+            'id': run_id, 'start_time': start_time, 'dotted_order': _dotted_order(start_time, run_id)
+        })
+        try:
+            yield
+        finally:
+            _current_trace.reset(token)
+    
+    def _record(self, name: str, run_type: str, inputs: Dict[str, Any], outputs: Dict[str, Any],
+                latency: float, error: Optional[str] = None, metadata: Dict[str, Any] = None, root: bool = False):
+        """Build a span ending now and queue it for export"""
+        end_time = datetime.now(timezone.utc)
+        parent = _current_trace.get()
+        if root and parent:
+            run_id, start_time, parent_id = parent['id'], parent['start_time'], None
+            trace_id, dotted_order = parent['id'], parent['dotted_order']
+        else:
+            run_id = str(uuid.uuid4())
+            start_time = datetime.fromtimestamp(end_time.timestamp() - latency, timezone.utc)
+            parent_id = parent['id'] if parent else None
+            trace_id = parent['id'] if parent else run_id
+            own_order = _dotted_order(start_time, run_id)
+            dotted_order = f"{parent['dotted_order']}.{own_order}" if parent else own_order
+        
+        self.exporter.submit({
+            'id': run_id,
+            'trace_id': trace_id,
+            'parent_run_id': parent_id,
+            'dotted_order': dotted_order,
+            'name': name,
+            'run_type': run_type,
+            'start_time': start_time.isoformat(),
+            'end_time': end_time.isoformat(),
+            'latency': latency,
+            'inputs': inputs,
+            'outputs': outputs,
+            'error': error,
+            'metadata': metadata or {},
+        })
+    
+    def trace_retrieval(self, query: str, documents: list, metadata: Dict[str, Any] = None,
+                        latency: float = 0.0) -> Dict[str, Any]:
         """Trace document retrieval operations"""
-        if not self.enabled:
-            return {}
-            
-        return {
-            "query": query,
+        outputs = {
             "num_documents": len(documents),
             "document_sources": [doc.metadata.get('source', 'unknown') for doc in documents] if documents else [],
-            "metadata": metadata or {},
-            "timestamp": datetime.now().isoformat()
         }
+        self._record("document_retrieval", "retriever", {"query": query}, outputs, latency, metadata=metadata)
+        return outputs
     
-    @traceable(name="answer_generation")
-    def trace_generation(self, query: str, context: str, answer: str, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+    def trace_llm_call(self, node: str, messages, response=None, latency: float = 0.0,
+                       error: Optional[str] = None) -> None:
+        """Trace one LLM provider call made from a graph node"""
+        outputs = {}
+        if response is not None:
+            outputs = {
+                "content": str(getattr(response, 'content', response)),
+                "tool_calls": getattr(response, 'tool_calls', None) or [],
+                "usage": getattr(response, 'usage_metadata', None) or {},
+            }
+        self._record(node, "llm", {"messages": _message_payload(messages)}, outputs, latency, error=error)
+    
+    def trace_generation(self, query: str, context: str, answer: str, metadata: Dict[str, Any] = None,
+                         latency: float = 0.0) -> Dict[str, Any]:
         """Trace answer generation"""
-        if not self.enabled:
-            return {}
-            
-        return {
-            "query": query,
-            "context_length": len(context),
-            "answer_length": len(answer),
-            "answer": answer,
-            "metadata": metadata or {},
-            "timestamp": datetime.now().isoformat()
-        }
+        outputs = {"context_length": len(context), "answer_length": len(answer), "answer": answer}
+        self._record("answer_generation", "chain", {"query": query}, outputs, latency, metadata=metadata)
+        return outputs
     
-    @traceable(name="rag_chain_execution")
     def trace_rag_chain(self, query: str, result: Dict[str, Any], session_id: str) -> Dict[str, Any]:
-        """Trace complete RAG chain execution"""
-        if not self.enabled:
-            return {}
-            
-        return {
-            "query": query,
-            "session_id": session_id,
+        """Trace complete RAG chain execution (the root run when inside trace_context)"""
+        metadata = result.get("metadata", {})
+        outputs = {
             "answer": result.get("answer", ""),
             "confidence": result.get("confidence", 0.0),
             "num_sources": len(result.get("sources", [])),
             "needs_continuation": result.get("needs_continuation", False),
-            "metadata": result.get("metadata", {}),
-            "timestamp": datetime.now().isoformat()
         }
+        self._record(
+            "rag_chain_execution", "chain", {"query": query, "session_id": session_id}, outputs,
+            metadata.get("processing_time", 0.0), error=str(metadata["error"]) if metadata.get("error") else None,
+            metadata=metadata, root=True
+        )
+        return outputs
     
     def log_user_feedback(self, run_id: str, feedback: Dict[str, Any]) -> bool:
         """Log user feedback to LangSmith"""
@@ -133,49 +201,12 @@ class LangSmithMonitoring:
             return False
     
     def get_run_stats(self, limit: int = 100) -> Dict[str, Any]:
-        """Get run statistics from LangSmith"""
-        if not self.client:
-            return {}
-            
-        try:
-            runs = self.client.list_runs(
-                project_name=self.project_name,
-                limit=limit
-            )
-            
-            stats = {
-                "total_runs": len(runs),
-                "avg_latency": 0,
-                "error_rate": 0,
-                "run_types": {}
-            }
-            
-            if runs:
-                total_latency = 0
-                errors = 0
-                
-                for run in runs:
-                    # Calculate latency
-                    if run.end_time and run.start_time:
-                        latency = (run.end_time - run.start_time).total_seconds()
-                        total_latency += latency
-                    
-                    # Count errors
-                    if run.error:
-                        errors += 1
-                    
-                    # Count run types
-                    run_type = run.run_type or "unknown"
-                    stats["run_types"][run_type] = stats["run_types"].get(run_type, 0) + 1
-                
-                stats["avg_latency"] = total_latency / len(runs)
-                stats["error_rate"] = errors / len(runs)
-            
-            return stats
-            
-        except Exception as e:
-            logger.error(f"Error getting run stats: {e}")
-            return {}
+        """Run statistics of the most recent spans, from local rolling aggregates"""
+        return self.exporter.get_run_stats(limit)
+    
+    def get_trace_stats(self) -> Dict[str, Any]:
+        """Trace exporter queue depth and counters"""
+        return self.exporter.get_stats()
     
     def create_dataset(self, name: str, examples: list) -> bool:
         """Create a dataset in LangSmith"""
@@ -202,5 +233,13 @@ class LangSmithMonitoring:
             logger.error(f"Error creating dataset: {e}")
             return False
 
-# Global monitoring instance
-monitoring = LangSmithMonitoring()
+_monitoring = None
+_monitoring_lock = threading.Lock()
+
+def get_langsmith_monitoring() -> LangSmithMonitoring:
+    """Process-wide LangSmith monitoring, created on first use"""
+    global _monitoring
+    with _monitoring_lock:
+        if _monitoring is None:
+            _monitoring = LangSmithMonitoring()
+        return _monitoring
@@ -2,7 +2,12 @@
 Simple LLM Service for LPDP RAG System
 """
 import os
+import time
 import logging
+import threading
+import contextvars
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, wait, FIRST_COMPLETED
 from typing import Optional, Dict, Any
 
 try:
@@ -13,34 +18,101 @@ except ImportError:
     except ImportError:
         ChatGroq = None
 
+from .admission_control import get_admission_controller, AdmissionController, AdmissionRejected
+from .circuit_breaker import get_circuit_breaker
+from .fork_safety import register_after_fork
+from .pipeline_metrics import get_pipeline_metrics
+from .token_usage import get_token_usage_tracker
+
 logger = logging.getLogger(__name__)
 
+_hedge_executor = None
+_hedge_executor_lock = threading.Lock()
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    """Shared worker pool for hedged LLM requests"""
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv('HEDGE_MAX_WORKERS', 16)),
+                thread_name_prefix="llm-hedge"
+            )
+        return _hedge_executor
+
+def _reset_hedge_executor():
+    """Executor threads do not survive fork; the child builds its own pool"""
+    global _hedge_executor, _hedge_executor_lock
+    _hedge_executor = None
+    _hedge_executor_lock = threading.Lock()
+
+register_after_fork(_reset_hedge_executor)
+
 class LLMService:
     """Simple LLM service using Groq"""
     
-    def __init__(self, langsmith_monitoring=None):
+    def __init__(self, langsmith_monitoring=None, extractive_answerer=None):
         """Initialize the LLM service"""
-        self.llm = None
         self.langsmith = langsmith_monitoring
+        self.extractive_answerer = extractive_answerer
+        self.max_tokens = 512
+        
+        # Process-wide quota/concurrency gate shared by every LLMService instance
+        self.admission = get_admission_controller()
+        
+        # Process-wide circuit breaker; open circuit fails fast to the degraded path
+        self.breaker = get_circuit_breaker()
+        
+        self.metrics = get_pipeline_metrics()
+        
+        # Token accounting per session/day/node and the token budgets
+        self.token_usage = get_token_usage_tracker()
         
+        # Optional hedging to a secondary model/endpoint when the primary exceeds its rolling p95
+        self.hedge_enabled = os.getenv('HEDGE_ENABLED', 'false').lower() == 'true'
+        self.hedge_min_delay = float(os.getenv('HEDGE_MIN_DELAY', 1.0))
+        self.hedge_stats = {'hedged': 0, 'secondary_wins': 0, 'skipped_no_slot': 0, 'skipped_budget': 0}
+        self._hedge_lock = threading.Lock()
+        
+        self._init_models()
+        
+        # HTTP connection pools must not be shared with the parent after fork
+        register_after_fork(self._init_models)
+        register_after_fork(self._reset_hedge_lock)
+    
+    def _reset_hedge_lock(self):
+        """A lock held at fork time would deadlock the worker"""
+        self._hedge_lock = threading.Lock()
+    
+    def _count_hedge(self, key: str):
+        with self._hedge_lock:
+            self.hedge_stats[key] += 1
+    
+    def _init_models(self):
+        """Create the primary (and secondary) chat models"""
+        self.llm = None
+        self.secondary_llm = None
         if ChatGroq and os.getenv('GROQ_API_KEY'):
             try:                
-                # Get LangSmith callbacks if available
+                # LangSmith callbacks if any (calls are otherwise traced asynchronously in _admitted_call)
                 callbacks = []
                 if self.langsmith:
                     langsmith_callbacks = self.langsmith.get_callbacks()
                     if langsmith_callbacks:
                         callbacks.extend(langsmith_callbacks)
 
-                self.llm = ChatGroq(
-                    groq_api_key=os.getenv('GROQ_API_KEY'),
-                    model_name=os.getenv('GROQ_MODEL', 'llama3-8b-8192'),
-                    temperature=0.1,
-                    max_retries=1,
-                    request_timeout=15.0,
-                    max_tokens=512,
-                    callbacks=callbacks if callbacks else None
+                self.llm = self._create_chat_model(
+                    os.getenv('GROQ_MODEL', 'llama3-8b-8192'),
+                    os.getenv('GROQ_BASE_URL'),
+                    callbacks
                 )
+                
+                if self.hedge_enabled:
+                    self.secondary_llm = self._create_chat_model(
+                        os.getenv('LLM_SECONDARY_MODEL') or os.getenv('GROQ_MODEL', 'llama3-8b-8192'),
+                        os.getenv('LLM_SECONDARY_BASE_URL') or os.getenv('GROQ_BASE_URL'),
+                        callbacks
+                    )
                 logger.info("LLM Service initialized with Groq")
             except Exception as e:
                 logger.error(f"Failed to initialize Groq LLM: {e}")
@@ -48,18 +120,161 @@ class LLMService:
         else:
             logger.warning("Groq LLM not available")
     
+    def _create_chat_model(self, model_name: str, base_url: Optional[str], callbacks):
+        """Create a Groq chat model, optionally against a custom (e.g. stub) endpoint"""
+        kwargs = {}
+        if base_url:
+            kwargs['base_url'] = base_url
+        return ChatGroq(
+            groq_api_key=os.getenv('GROQ_API_KEY'),
+            model_name=model_name,
+            temperature=0.1,
+            max_retries=1,
+            request_timeout=15.0,
+            max_tokens=self.max_tokens,
+            callbacks=callbacks if callbacks else None,
+            **kwargs
+        )
+    
     def bind_tools(self, tools):
         """Bind tools to LLM"""
         if self.llm:
             return self.llm.bind_tools(tools)
         return None
     
-    def invoke(self, messages):
-        """Invoke LLM with messages"""
+    def invoke(self, messages, node: str = 'generate'):
+        """Invoke LLM with messages (node labels the call in metrics)"""
+        if self.llm:
+            secondary = (lambda: self.secondary_llm.invoke(messages)) if self.secondary_llm else None
+            return self._admitted_call(lambda: self.llm.invoke(messages), messages, secondary, node=node)
+        return None
+    
+    def invoke_with_tools(self, tools, messages, node: str = 'query_or_respond'):
+        """Invoke LLM with tools bound"""
         if self.llm:
-            return self.llm.invoke(messages)
+            llm_with_tools = self.llm.bind_tools(tools)
+            secondary = None
+            if self.secondary_llm:
+                secondary_with_tools = self.secondary_llm.bind_tools(tools)
+                secondary = lambda: secondary_with_tools.invoke(messages)
+            return self._admitted_call(lambda: llm_with_tools.invoke(messages), messages, secondary, node=node)
         return None
     
+    def _admitted_call(self, call, messages, secondary_call=None, node: str = 'llm'):
+        """Run an LLM call through the circuit breaker and admission control
+        
+        Raises AdmissionRejected (or its CircuitOpen / BudgetExceeded subclasses) when the call must fail fast.
+        """
+        estimated_tokens = AdmissionController.estimate_tokens(messages, self.max_tokens)
+        self.token_usage.check(estimated_tokens)
+        
+        if self.breaker:
+            self.breaker.before_call()
+        
+        # The slot is released by whichever thread finishes the call (hedged calls may outlive this request)
+        queued = time.monotonic()
+        slot = ExitStack()
+        try:
+            if self.admission:
+                slot.enter_context(self.admission.slot(estimated_tokens))
+        except AdmissionRejected:
+            if self.breaker:
+                self.breaker.abandon()
+            raise
+        
+        start = time.monotonic()
+        self.metrics.observe('llm_queue', start - queued)
+        try:
+            response = self._hedged_call(call, slot, secondary_call, estimated_tokens, node)
+        except Exception as e:
+            latency = time.monotonic() - start
+            self.metrics.observe_llm_call(node, latency, outcome='error')
+            if self.langsmith:
+                self.langsmith.trace_llm_call(node, messages, latency=latency, error=str(e))
+            if self.breaker:
+                self.breaker.record_failure()
+            raise
+        latency = time.monotonic() - start
+        self.metrics.observe_llm_call(node, latency, getattr(response, 'usage_metadata', None))
+        if self.langsmith:
+            self.langsmith.trace_llm_call(node, messages, response, latency)
+        if self.breaker:
+            self.breaker.record_success(latency)
+        return response
+    
+    def _attempt(self, call, slot: ExitStack, estimated_tokens: int, node: str):
+        """Run one provider request inside its admission slot and record its own token usage"""
+        with slot:
+            response = call()
+        usage = getattr(response, 'usage_metadata', None) or {}
+        self.token_usage.record(node, usage)
+        if self.admission:
+            self.admission.record_usage(estimated_tokens, usage.get('total_tokens', 0))
+        return response
+    
+    def _secondary_slot(self, estimated_tokens: int) -> Optional[ExitStack]:
+        """Admission slot for a hedge request, or None when quota, concurrency or budget has no room"""
+        try:
+            # Both requests of a hedged call are charged to the session
+            self.token_usage.check(2 * estimated_tokens, count=False)
+        except AdmissionRejected:
+            self._count_hedge('skipped_budget')
+            return None
+        slot = ExitStack()
+        if self.admission:
+            try:
+                slot.enter_context(self.admission.slot(estimated_tokens, timeout=0.0, count_rejections=False))
+            except AdmissionRejected:
+                self._count_hedge('skipped_no_slot')
+                return None
+        return slot
+    
+    def _hedged_call(self, call, slot: ExitStack, secondary_call=None, estimated_tokens: int = 0, node: str = 'llm'):
+        """Run the primary call; past its rolling p95, race a secondary request with its own slot"""
+        p95 = self.breaker.latency_percentile(95) if self.hedge_enabled and secondary_call and self.breaker else None
+        if p95 is None:
+            return self._attempt(call, slot, estimated_tokens, node)
+        
+        # Worker threads run in a copy of the request context so usage is charged to the right session
+        executor = _get_hedge_executor()
+        primary = executor.submit(contextvars.copy_context().run, self._attempt, call, slot, estimated_tokens, node)
+        try:
+            return primary.result(timeout=max(p95, self.hedge_min_delay))
+        except FutureTimeout:
+            pass
+        
+        secondary_slot = self._secondary_slot(estimated_tokens)
+        if secondary_slot is None:
+            return primary.result()
+        
+        # The losing request keeps running; it releases its slot and records its usage when it completes
+        self._count_hedge('hedged')
+        secondary = executor.submit(contextvars.copy_context().run, self._attempt, secondary_call, secondary_slot,
+                                    estimated_tokens, node)
+        done, _ = wait([primary, secondary], return_when=FIRST_COMPLETED)
+        first = done.pop()
+        other = secondary if first is primary else primary
+        
+        if first.exception() is None:
+            if first is secondary:
+                self._count_hedge('secondary_wins')
+            return first.result()
+        
+        # First finisher failed; the other request is our last chance
+        result = other.result()
+        if other is secondary:
+            self._count_hedge('secondary_wins')
+        return result
+    
+    def get_resilience_stats(self) -> Dict[str, Any]:
+        """Circuit breaker and hedging statistics"""
+        with self._hedge_lock:
+            hedge_stats = dict(self.hedge_stats)
+        return {
+            'circuit_breaker': self.breaker.get_stats() if self.breaker else {'enabled': False},
+            'hedging': {'enabled': self.hedge_enabled, **hedge_stats}
+        }
+    
     def generate_answer(self, context: str, question: str) -> str:
         """Generate answer from context and question"""
         if not self.llm:
@@ -75,7 +290,7 @@ class LLMService:
 
                     JAWABAN (gunakan format markdown, maksimal 300 kata):"""
             
-            response = self.llm.invoke(prompt)
+            response = self.invoke(prompt)
             return response.content if hasattr(response, 'content') else str(response)
             
         except Exception as e:
@@ -84,6 +299,11 @@ class LLMService:
     
     def _fallback_answer(self, context: str, question: str) -> str:
         """Fallback answer when LLM is not available"""
+        if self.extractive_answerer:
+            try:
+                return self.extractive_answerer.answer_text(question, context)
+            except Exception as e:
+                logger.error(f"Error building extractive answer: {str(e)}")
         return f"Berdasarkan dokumen yang tersedia, berikut informasi terkait '{question}':\n\n{context[:500]}..."
     
     def is_available(self) -> bool:
@@ -0,0 +1,151 @@
+"""
+Versioned local bundles of the embedding model for network-free startup
+
+A bundle is a directory produced by scripts/export_model_bundle.py holding the
+sentence-transformers model, its tokenizer and a bundle_manifest.json with the
+SHA-256 and size of every file. VectorStoreService loads from it with hub
+access disabled.
+"""
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+MANIFEST_NAME = "bundle_manifest.json"
+
+class ModelBundleError(Exception):
+    """Raised when a model bundle is missing, incomplete or corrupted"""
+    pass
+
+def disable_hub_access():
+    """Force huggingface_hub/transformers into offline mode, also if they are already imported"""
+    os.environ['HF_HUB_OFFLINE'] = '1'
+    os.environ['TRANSFORMERS_OFFLINE'] = '1'
+    os.environ['HF_DATASETS_OFFLINE'] = '1'
+    try:
+        from huggingface_hub import constants
+        constants.HF_HUB_OFFLINE = True
+    except (ImportError, AttributeError):
+        pass
+
+def _sha256(path: Path) -> str:
+    """Streaming SHA-256 of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _bundle_files(root: Path) -> Dict[str, Dict[str, Any]]:
+    """Checksum and size of every file in a bundle directory (manifest excluded)"""
+    files = {}
+    for path in sorted(root.rglob('*')):
+        if path.is_file() and path.name != MANIFEST_NAME:
+            files[path.relative_to(root).as_posix()] = {'sha256': _sha256(path), 'size': path.stat().st_size}
+    return files
+
+def export_bundle(model_name: str, output_root: str, version: Optional[str] = None) -> str:
+    """
+    Download (or take from the local cache) a sentence-transformers model and
+    write it with a checksum manifest to <output_root>/<name>-<version>
+
+    The version defaults to a digest of the exported files, so re-exporting an
+    unchanged model yields the same directory. Returns the bundle path.
+    """
+    from sentence_transformers import SentenceTransformer
+    import sentence_transformers
+
+    output_root = Path(output_root)
+    output_root.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix='.bundle-', dir=output_root))
+
+    try:
+        model = SentenceTransformer(model_name, device='cpu')
+        model.save(str(staging))
+
+        files = _bundle_files(staging)
+        content_digest = hashlib.sha256(
+            json.dumps({name: info['sha256'] for name, info in files.items()}, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+        version = version or content_digest[:12]
+
+        manifest = {
+            'model_name': model_name,
+            'version': version,
+            'content_sha256': content_digest,
+            'embedding_dimension': model.get_sentence_embedding_dimension(),
+            'sentence_transformers_version': sentence_transformers.__version__,
+            'created_at': datetime.now().isoformat(),
+            'files': files,
+        }
+        with open(staging / MANIFEST_NAME, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+        target = output_root / f"{model_name.split('/')[-1]}-{version}"
+        if target.exists():
+            existing = read_manifest(str(target))
+            if existing.get('content_sha256') != content_digest:
+                raise ModelBundleError(f"{target} already exists with different content; pass another --version")
+            logger.info(f"Model bundle {target} is already up to date")
+            return str(target)
+
+        staging.rename(target)
+        logger.info(f"Exported {model_name} ({len(files)} files) to {target}")
+        return str(target)
+    finally:
+        if staging.exists():
+            shutil.rmtree(staging, ignore_errors=True)
+
+def read_manifest(bundle_path: str) -> Dict[str, Any]:
+    """Load a bundle's manifest"""
+    manifest_path = Path(bundle_path) / MANIFEST_NAME
+    if not manifest_path.is_file():
+        raise ModelBundleError(f"No {MANIFEST_NAME} in {bundle_path}; export it with scripts/export_model_bundle.py")
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def verify_bundle(bundle_path: str, checksums: bool = True) -> List[str]:
+    """
+    Compare bundle files with the manifest; returns a list of problems (empty when intact)
+    Without checksums only presence and sizes are checked, which is cheap enough for every start
+    """
+    root = Path(bundle_path)
+    manifest = read_manifest(bundle_path)
+    problems = []
+    for name, expected in manifest['files'].items():
+        path = root / name
+        if not path.is_file():
+            problems.append(f"missing {name}")
+        elif path.stat().st_size != expected['size']:
+            problems.append(f"size mismatch {name}")
+        elif checksums and _sha256(path) != expected['sha256']:
+            problems.append(f"checksum mismatch {name}")
+    return problems
+
+def load_bundle_embeddings(bundle_path: str, checksums: bool = False):
+    """Build HuggingFaceEmbeddings from a verified local bundle with hub access disabled"""
+    problems = verify_bundle(bundle_path, checksums=checksums)
+    if problems:
+        raise ModelBundleError(f"Model bundle {bundle_path} is corrupted: {', '.join(problems[:5])}")
+    manifest = read_manifest(bundle_path)
+
+    disable_hub_access()
+    try:
+        from langchain_huggingface import HuggingFaceEmbeddings
+    except ImportError:
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    embeddings = HuggingFaceEmbeddings(
+        model_name=str(Path(bundle_path).resolve()),
+        model_kwargs={'local_files_only': True}
+    )
+    logger.info(f"Loaded embedding model {manifest['model_name']} from bundle {manifest['version']}")
+    return embeddings, manifest
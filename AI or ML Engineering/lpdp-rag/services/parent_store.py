@@ -0,0 +1,308 @@
+"""
+Small-to-big (parent document) retrieval
+
+Ingestion indexes small token-aligned child chunks, which embed well within the
+embedding model's sequence length, and records for every child the parent it
+came from: a span of consecutive pages, or a section of a long page. Parent
+text and the child -> parent map (with the child's character offsets in the
+parent) live in a SQLite file read through a memory map, so Chroma only holds
+the children. After search, children are replaced by their deduplicated
+parents, trimmed around the matching child to fit a token budget.
+"""
+import os
+import math
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Dict, Any, Tuple
+
+try:
+    from langchain_core.documents import Document
+except ImportError:
+    from langchain.schema import Document
+
+logger = logging.getLogger(__name__)
+
+# Characters per token assumed for chunks without a parent (indexed before parent retrieval)
+_CHARS_PER_TOKEN = 4
+
+class ParentChildSplitter:
+    """Splits loaded pages into parent spans/sections and token-aligned child chunks"""
+
+    def __init__(self, count_tokens: Callable[[str], int], child_tokens: int = None, child_overlap: int = None,
+                 parent_tokens: int = None):
+        """Initialize the splitter; count_tokens measures text in embedding model tokens"""
+        try:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+        except ImportError:
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+        self.count_tokens = count_tokens
+        self.parent_tokens = parent_tokens or int(os.getenv('PARENT_MAX_TOKENS', 1024))
+        separators = ["\n\n", "\n", ". ", "!", "?", ",", " ", ""]
+        self.child_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=child_tokens or int(os.getenv('CHILD_CHUNK_TOKENS', 120)),
+            chunk_overlap=child_overlap if child_overlap is not None else int(os.getenv('CHILD_CHUNK_OVERLAP', 20)),
+            length_function=count_tokens,
+            separators=separators
+        )
+        self.section_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.parent_tokens,
+            chunk_overlap=0,
+            length_function=count_tokens,
+            separators=separators
+        )
+
+    def split(self, documents: List[Document]) -> Tuple[List[Dict[str, Any]], List[Document]]:
+        """Return (parent records, child chunks carrying parent_id and their offsets in the parent)"""
+        grouped = OrderedDict()
+        for doc in documents:
+            grouped.setdefault(doc.metadata.get('source', 'unknown'), []).append(doc)
+
+        parents, children = [], []
+        for pages in grouped.values():
+            buffer, buffer_tokens = [], 0
+            for page in pages:
+                tokens = self.count_tokens(page.page_content)
+                if tokens > self.parent_tokens:
+                    self._flush(buffer, parents, children)
+                    buffer, buffer_tokens = [], 0
+                    # A long page becomes several section parents
+                    for section in self.section_splitter.split_documents([page]):
+                        self._flush([section], parents, children)
+                elif buffer_tokens + tokens > self.parent_tokens:
+                    self._flush(buffer, parents, children)
+                    buffer, buffer_tokens = [page], tokens
+                else:
+                    buffer.append(page)
+                    buffer_tokens += tokens
+            self._flush(buffer, parents, children)
+        return parents, children
+
+    def _flush(self, pages: List[Document], parents: List[Dict[str, Any]], children: List[Document]):
+        """Make one parent of consecutive pages and split each page into its children"""
+        if not pages:
+            return
+        separator = "\n\n"
+        offsets, text = [], ""
+        for page in pages:
+            offsets.append(len(text) + (len(separator) if text else 0))
+            text = f"{text}{separator}{page.page_content}" if text else page.page_content
+
+        metadata = pages[0].metadata
+        page_numbers = [p.metadata.get('page') for p in pages if isinstance(p.metadata.get('page'), (int, float))]
+        source = metadata.get('source', 'unknown')
+        parent_id = hashlib.sha1(f"{source}|{text}".encode('utf-8')).hexdigest()[:16]
+        parents.append({
+            'parent_id': parent_id,
+            'source': source,
+            'title': metadata.get('title', source),
+            'page_start': min(page_numbers) if page_numbers else None,
+            'page_end': max(page_numbers) if page_numbers else None,
+            'tokens': self.count_tokens(text),
+            'text': text
+        })
+
+        for page, offset in zip(pages, offsets):
+            # Locate children in the page ourselves: the splitter's start_index mixes token and
+            # character units when chunk sizes are measured in tokens
+            cursor = 0
+            for child in self.child_splitter.split_documents([page]):
+                position = page.page_content.find(child.page_content, cursor)
+                if position == -1:
+                    position = max(0, page.page_content.find(child.page_content))
+                cursor = position + 1
+                start = offset + position
+                child.metadata.update({
+                    'parent_id': parent_id,
+                    'parent_start': start,
+                    'parent_end': start + len(child.page_content)
+                })
+                children.append(child)
+
+class ParentStore:
+    """Parent spans and the child -> parent map in a memory-mapped SQLite file"""
+
+    def __init__(self, db_path: str = None, token_budget: int = None):
+        """Open (or create) the store; connections are short-lived and safe across forks"""
+        self.db_path = db_path or os.getenv('PARENT_STORE_PATH', './data/cache/parents.sqlite')
+        self.token_budget = token_budget or int(os.getenv('PARENT_CONTEXT_TOKENS', 2000))
+        self.min_tokens = int(os.getenv('PARENT_MIN_TOKENS', 32))
+        self.mmap_bytes = int(os.getenv('PARENT_STORE_MMAP_MB', 64)) * 1024 * 1024
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS parents (parent_id TEXT PRIMARY KEY, source TEXT, title TEXT, "
+                    "page_start INTEGER, page_end INTEGER, tokens INTEGER, text TEXT)"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS children (chunk_id TEXT PRIMARY KEY, parent_id TEXT, "
+                    "start INTEGER, end INTEGER)"
+                )
+        finally:
+            conn.close()
+        self.stats = {'expanded': 0, 'parents_returned': 0, 'trimmed': 0, 'unmapped': 0, 'over_budget': 0,
+                      'tokens_returned': 0}
+
+    def _connect(self):
+        """Open a short-lived connection with memory-mapped reads"""
+        conn = sqlite3.connect(self.db_path, timeout=5.0)
+        conn.execute(f"PRAGMA mmap_size={self.mmap_bytes}")
+        return conn
+
+    def add_parents(self, parents: List[Dict[str, Any]]):
+        """Upsert parent records (ids are content-derived, so re-ingestion overwrites)"""
+        if not parents:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO parents VALUES (:parent_id, :source, :title, :page_start, :page_end, "
+                    ":tokens, :text)", parents
+                )
+        finally:
+            conn.close()
+
+    def add_children(self, rows: List[Tuple[str, str, int, int]]):
+        """Upsert (chunk_id, parent_id, start, end) map rows"""
+        if not rows:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO children VALUES (?, ?, ?, ?)", rows)
+        finally:
+            conn.close()
+
+    def lookup(self, chunk_ids: List[str]) -> Dict[str, Tuple]:
+        """chunk_id -> (parent_id, start, end, page_start, page_end, tokens, text)"""
+        chunk_ids = [chunk_id for chunk_id in chunk_ids if chunk_id]
+        if not chunk_ids:
+            return {}
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT c.chunk_id, p.parent_id, c.start, c.end, p.page_start, p.page_end, p.tokens, p.text "
+                "FROM children c JOIN parents p ON p.parent_id = c.parent_id "
+                f"WHERE c.chunk_id IN ({','.join('?' * len(chunk_ids))})", chunk_ids
+            ).fetchall()
+        finally:
+            conn.close()
+        return {row[0]: row[1:] for row in rows}
+
+    @staticmethod
+    def _window(text: str, start: int, end: int, max_chars: int) -> str:
+        """Span of at most max_chars around text[start:end], widened to word boundaries"""
+        if max_chars <= end - start:
+            return text[start:end]
+        extra = max_chars - (end - start)
+        left = max(0, start - extra // 2)
+        right = min(len(text), left + max_chars)
+        left = max(0, right - max_chars)
+        if left > 0:
+            space = text.find(' ', left, start)
+            left = space + 1 if space != -1 else left
+        if right < len(text):
+            space = text.rfind(' ', end, right)
+            right = space if space != -1 else right
+        return text[left:right].strip()
+
+    def expand(self, documents: List[Document], token_budget: int = None) -> List[Document]:
+        """Replace children with their deduplicated parents, best first, within the token budget"""
+        remaining = token_budget or self.token_budget
+        try:
+            parents = self.lookup([doc.metadata.get('chunk_id') for doc in documents])
+        except sqlite3.Error as e:
+            logger.error(f"Parent lookup failed: {e}")
+            return documents
+
+        self.stats['expanded'] += 1
+        expanded, seen = [], set()
+        for doc in documents:
+            parent = parents.get(doc.metadata.get('chunk_id'))
+            if parent is None:
+                # Chunk indexed without a parent: pass it through at its approximate size; an oversized
+                # one is skipped so smaller chunks further down can still use the budget
+                self.stats['unmapped'] += 1
+                cost = math.ceil(len(doc.page_content) / _CHARS_PER_TOKEN)
+                if cost > remaining:
+                    self.stats['over_budget'] += 1
+                    continue
+                expanded.append(doc)
+                remaining -= cost
+                continue
+
+            parent_id, start, end, page_start, page_end, tokens, text = parent
+            if parent_id in seen:
+                continue
+            if remaining < self.min_tokens:
+                self.stats['over_budget'] += 1
+                break
+            seen.add(parent_id)
+
+            chars_per_token = len(text) / max(tokens, 1)
+            if tokens <= remaining:
+                span, cost = text, tokens
+            else:
+                span = self._window(text, start, end, int(remaining * chars_per_token))
+                cost = min(remaining, math.ceil(len(span) / chars_per_token))
+                self.stats['trimmed'] += 1
+            remaining -= cost
+
+            metadata = {
+                **doc.metadata,
+                'parent_id': parent_id,
+                'parent_tokens': cost,
+                'page_start': page_start,
+                'page_end': page_end
+            }
+            expanded.append(Document(page_content=span, metadata={k: v for k, v in metadata.items() if v is not None}))
+            self.stats['parents_returned'] += 1
+            self.stats['tokens_returned'] += cost
+        return expanded
+
+    def clear(self):
+        """Drop all parents and map rows (re-population rebuilds them)"""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM children")
+                conn.execute("DELETE FROM parents")
+        finally:
+            conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Store size and expansion counters"""
+        try:
+            conn = self._connect()
+            try:
+                parent_count = conn.execute("SELECT COUNT(*) FROM parents").fetchone()[0]
+                child_count = conn.execute("SELECT COUNT(*) FROM children").fetchone()[0]
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading parent store stats: {e}")
+            parent_count = child_count = None
+        return {
+            'path': self.db_path,
+            'parents': parent_count,
+            'children': child_count,
+            'token_budget': self.token_budget,
+            **self.stats
+        }
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_parent_store() -> ParentStore:
+    """Process-wide parent store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ParentStore()
+        return _store
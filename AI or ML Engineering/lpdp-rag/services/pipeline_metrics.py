@@ -0,0 +1,143 @@
+"""
+Per-stage latency metrics for the RAG pipeline in Prometheus text format
+
+Stages are timed where the pipeline calls them (validation, query embedding,
+vector search, prompt assembly, LLM calls, checkpointer reads/writes) into
+process histograms. With METRICS_MULTIPROC_DIR set, every gunicorn worker writes
+its samples to that directory and /metrics aggregates all workers.
+"""
+import os
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+# prometheus_client picks its storage backend at import time
+_multiproc_dir = os.getenv('METRICS_MULTIPROC_DIR')
+if _multiproc_dir and not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+    os.makedirs(_multiproc_dir, exist_ok=True)
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = _multiproc_dir
+
+try:
+    from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+    from prometheus_client import multiprocess
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = 'text/plain; version=0.0.4; charset=utf-8'
+
+logger = logging.getLogger(__name__)
+
+_STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_REQUEST_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0, 60.0)
+
+# Stage durations (ms) of the request being served, shared with graph node threads
+_request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    'rag_request_timings', default=None
+)
+
+class PipelineMetrics:
+    """Stage, request and LLM call histograms with a per-request breakdown"""
+
+    def __init__(self):
+        """Register the metrics (once per process, see get_pipeline_metrics)"""
+        self.enabled = PROMETHEUS_AVAILABLE and os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+        self.multiprocess = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+        if not self.enabled:
+            if not PROMETHEUS_AVAILABLE:
+                logger.info("prometheus_client not installed; /metrics is disabled")
+            return
+
+        self.stage_seconds = Histogram(
+            'lpdp_rag_stage_seconds', 'Latency of RAG pipeline stages', ['stage'], buckets=_STAGE_BUCKETS
+        )
+        self.request_seconds = Histogram(
+            'lpdp_rag_request_seconds', 'End-to-end answer latency by answer approach', ['approach'],
+            buckets=_REQUEST_BUCKETS
+        )
+        self.llm_seconds = Histogram(
+            'lpdp_llm_call_seconds', 'LLM provider call latency by graph node', ['node', 'outcome'],
+            buckets=_REQUEST_BUCKETS
+        )
+        self.llm_tokens = Counter('lpdp_llm_tokens', 'LLM tokens by graph node', ['node', 'kind'])
+
+    @contextmanager
+    def request(self):
+        """Collect the stage timings of one request; yields the dict they accumulate in (ms)"""
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        try:
+            yield timings
+        finally:
+            _request_timings.reset(token)
+
+    def observe(self, stage: str, seconds: float):
+        """Record a stage duration"""
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0.0) + seconds * 1000, 2)
+        if self.enabled:
+            self.stage_seconds.labels(stage=stage).observe(seconds)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block as a pipeline stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, stage: str, func):
+        """Wrap a callable so every call is recorded as a stage"""
+        def wrapper(*args, **kwargs):
+            with self.stage(stage):
+                return func(*args, **kwargs)
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def observe_llm_call(self, node: str, seconds: float, usage: Optional[Dict[str, Any]] = None,
+                         outcome: str = 'ok'):
+        """Record one provider call with its prompt/completion token counts"""
+        self.observe('llm_call', seconds)
+        if not self.enabled:
+            return
+        self.llm_seconds.labels(node=node, outcome=outcome).observe(seconds)
+        usage = usage or {}
+        if usage.get('input_tokens'):
+            self.llm_tokens.labels(node=node, kind='prompt').inc(usage['input_tokens'])
+        if usage.get('output_tokens'):
+            self.llm_tokens.labels(node=node, kind='completion').inc(usage['output_tokens'])
+
+    def observe_request(self, approach: str, seconds: float):
+        """Record an end-to-end answer"""
+        if self.enabled:
+            self.request_seconds.labels(approach=approach).observe(seconds)
+
+    def render(self):
+        """Prometheus exposition of this process, or of all workers in multiprocess mode"""
+        if not self.enabled:
+            return b"# metrics disabled\n", CONTENT_TYPE_LATEST
+        if self.multiprocess:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            return generate_latest(registry), CONTENT_TYPE_LATEST
+        return generate_latest(), CONTENT_TYPE_LATEST
+
+def mark_worker_dead(pid: int):
+    """Drop a dead worker's live gauges from the multiprocess directory (gunicorn child_exit)"""
+    if PROMETHEUS_AVAILABLE and os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+def get_pipeline_metrics() -> PipelineMetrics:
+    """Process-wide metrics (Prometheus metrics can only be registered once)"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = PipelineMetrics()
+        return _metrics
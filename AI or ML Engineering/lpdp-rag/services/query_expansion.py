@@ -0,0 +1,296 @@
+"""
+Local multi-query expansion with parallel retrieval and reciprocal rank fusion
+
+Questions mix Indonesian and English ("syarat IELTS untuk LPDP reguler") while
+the corpus is mostly Indonesian. A question is rewritten locally, without an
+LLM call, into a few variants: dictionary ID->EN and EN->ID term swaps, acronym
+expansion (S2, S3, PNS, TNI, ...) and a stripped keyword form. The variants are
+embedded in one batch and searched in parallel with the original question; the
+rankings are merged with reciprocal rank fusion (RRF).
+
+The original question is searched on the calling thread exactly as without
+expansion. Variant searches that have not finished QUERY_EXPANSION_BUDGET_MS
+after it are left out of the fusion, which bounds the added latency.
+"""
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from typing import Callable, Dict, Any, List, Optional
+
+from langchain_core.documents import Document
+
+from .fork_safety import register_after_fork
+from .pipeline_metrics import get_pipeline_metrics
+
+logger = logging.getLogger(__name__)
+
+# (Indonesian, English) term pairs of the scholarship domain; multi-word terms win over single words
+_TERM_PAIRS = [
+    ("persyaratan", "requirements"),
+    ("syarat", "requirements"),
+    ("beasiswa", "scholarship"),
+    ("pendaftaran", "registration"),
+    ("mendaftar", "apply"),
+    ("daftar", "register"),
+    ("batas usia", "age limit"),
+    ("usia", "age"),
+    ("umur", "age"),
+    ("ijazah", "diploma"),
+    ("transkrip nilai", "academic transcript"),
+    ("nilai", "score"),
+    ("skor", "score"),
+    ("minimal", "minimum"),
+    ("maksimal", "maximum"),
+    ("berkas", "documents"),
+    ("dokumen", "documents"),
+    ("tunjangan", "allowance"),
+    ("biaya hidup", "living allowance"),
+    ("biaya pendidikan", "tuition fee"),
+    ("biaya", "cost"),
+    ("dana", "funding"),
+    ("pendanaan", "funding"),
+    ("perguruan tinggi", "university"),
+    ("kampus tujuan", "target university"),
+    ("kampus", "campus"),
+    ("luar negeri", "abroad"),
+    ("dalam negeri", "domestic"),
+    ("jadwal", "schedule"),
+    ("batas waktu", "deadline"),
+    ("tenggat", "deadline"),
+    ("tahap", "stage"),
+    ("seleksi", "selection"),
+    ("wawancara", "interview"),
+    ("esai", "essay"),
+    ("surat rekomendasi", "recommendation letter"),
+    ("pengumuman", "announcement"),
+    ("kewajiban", "obligations"),
+    ("kembali ke indonesia", "return to indonesia"),
+    ("kontribusi", "contribution"),
+    ("program studi", "study program"),
+    ("jurusan", "major"),
+    ("masa studi", "study period"),
+    ("durasi", "duration"),
+    ("magister", "master"),
+    ("doktor", "doctoral"),
+    ("sarjana", "bachelor"),
+    ("pascasarjana", "postgraduate"),
+    ("gelar", "degree"),
+    ("lulusan", "graduate"),
+    ("dokter spesialis", "medical specialist"),
+    ("penyandang disabilitas", "persons with disabilities"),
+    ("bahasa inggris", "english"),
+    ("sertifikat", "certificate"),
+    ("pengalaman kerja", "work experience"),
+    ("bekerja", "work"),
+    ("pasangan", "spouse"),
+    ("keluarga", "family"),
+    ("cuti", "leave"),
+    ("kuliah", "study"),
+]
+
+# Acronym -> expansion, appended after the acronym in the acronym variant
+_ACRONYMS = {
+    "s1": "sarjana",
+    "s2": "magister",
+    "s3": "doktor",
+    "pns": "pegawai negeri sipil",
+    "asn": "aparatur sipil negara",
+    "tni": "tentara nasional indonesia",
+    "polri": "kepolisian negara republik indonesia",
+    "bumn": "badan usaha milik negara",
+    "ipk": "indeks prestasi kumulatif",
+    "gpa": "indeks prestasi kumulatif",
+    "loa": "letter of acceptance",
+    "ptud": "perguruan tinggi utama dunia",
+    "3t": "daerah tertinggal terdepan terluar",
+    "ktp": "kartu tanda penduduk",
+    "skck": "surat keterangan catatan kepolisian",
+    "sktm": "surat keterangan tidak mampu",
+}
+
+# Question and function words dropped from the keyword form (both languages)
+_STOPWORDS = {
+    "apa", "apakah", "bagaimana", "berapa", "siapa", "kapan", "dimana", "di", "mana", "yang", "untuk",
+    "dan", "atau", "ke", "dari", "dengan", "saya", "aku", "kami", "adalah", "itu", "ini", "bisa",
+    "boleh", "tolong", "mohon", "jelaskan", "tentang", "ada", "saja", "harus", "akan", "jika",
+    "kalau", "apabila", "pada", "dalam", "sebagai", "agar", "juga", "sudah", "belum", "ya", "kah",
+    "the", "what", "is", "are", "a", "an", "for", "of", "to", "how", "do", "does", "can", "i",
+    "my", "please", "in", "on", "about", "which", "when", "where", "who", "there", "be", "and", "or",
+}
+
+def _term_pattern(terms) -> re.Pattern:
+    """Whole-word alternation over terms, longest first"""
+    alternation = '|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+    return re.compile(r'\b(' + alternation + r')\b', re.IGNORECASE)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Shared worker pool for variant embedding and searches"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv('QUERY_EXPANSION_WORKERS', 8)),
+                thread_name_prefix="query-expansion"
+            )
+        return _executor
+
+def _reset_executor():
+    """Executor threads do not survive fork; the child builds its own pool"""
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+register_after_fork(_reset_executor)
+
+class QueryExpander:
+    """Generates local query variants and fuses their rankings with the original's"""
+
+    def __init__(self, max_variants: int = None, budget_ms: float = None):
+        """Initialize the expander from QUERY_EXPANSION_* settings"""
+        self.max_variants = max_variants if max_variants is not None else int(os.getenv('QUERY_EXPANSION_MAX_VARIANTS', 3))
+        budget_ms = budget_ms if budget_ms is not None else float(os.getenv('QUERY_EXPANSION_BUDGET_MS', 150))
+        self.budget = budget_ms / 1000
+        self.rrf_k = int(os.getenv('QUERY_EXPANSION_RRF_K', 60))
+
+        self._to_english = {}
+        self._to_indonesian = {}
+        for indonesian, english in _TERM_PAIRS:
+            self._to_english.setdefault(indonesian, english)
+            self._to_indonesian.setdefault(english, indonesian)
+        self._indonesian_pattern = _term_pattern(self._to_english)
+        self._english_pattern = _term_pattern(self._to_indonesian)
+        self._acronym_pattern = _term_pattern(_ACRONYMS)
+
+        self.metrics = get_pipeline_metrics()
+        self.stats = {'queries': 0, 'expanded': 0, 'variants_searched': 0, 'variants_fused': 0,
+                      'late_variants': 0, 'variant_errors': 0, 'added_ms_total': 0.0}
+
+    @staticmethod
+    def _swap(text: str, pattern: re.Pattern, table: Dict[str, str]) -> str:
+        return pattern.sub(lambda match: table[match.group(0).lower()], text)
+
+    def _expand_acronyms(self, text: str) -> str:
+        return self._acronym_pattern.sub(lambda match: f"{match.group(0)} {_ACRONYMS[match.group(0).lower()]}", text)
+
+    @staticmethod
+    def _keywords(text: str) -> str:
+        tokens = []
+        for token in re.findall(r"[\w/\-]+", text.lower()):
+            if token not in _STOPWORDS and token not in tokens:
+                tokens.append(token)
+        return ' '.join(tokens)
+
+    def expand(self, question: str) -> List[str]:
+        """The question followed by up to max_variants distinct variants"""
+        candidates = [
+            self._swap(question, self._english_pattern, self._to_indonesian),
+            self._expand_acronyms(question),
+            self._keywords(question),
+            self._swap(question, self._indonesian_pattern, self._to_english),
+        ]
+        variants = [question]
+        seen = {' '.join(question.lower().split())}
+        for candidate in candidates:
+            normalized = ' '.join(candidate.lower().split())
+            if len(variants) > self.max_variants:
+                break
+            if normalized and normalized not in seen:
+                seen.add(normalized)
+                variants.append(candidate)
+        return variants
+
+    def fuse(self, rankings: List[List[Document]], k: int) -> List[Document]:
+        """Reciprocal rank fusion; relevance_score keeps the best similarity of a chunk across rankings"""
+        scores: Dict[str, float] = {}
+        documents: Dict[str, Document] = {}
+        for ranking in rankings:
+            for rank, doc in enumerate(ranking):
+                key = doc.metadata.get('chunk_id') or hashlib.sha1(
+                    f"{doc.metadata.get('source')}|{doc.metadata.get('page')}|{doc.page_content}".encode('utf-8')
+                ).hexdigest()
+                scores[key] = scores.get(key, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+                best = documents.get(key)
+                if best is None or doc.metadata.get('relevance_score', 0.0) > best.metadata.get('relevance_score', 0.0):
+                    documents[key] = doc
+
+        fused = []
+        for key in sorted(scores, key=scores.get, reverse=True)[:k]:
+            doc = documents[key]
+            doc.metadata['rrf_score'] = round(scores[key], 5)
+            fused.append(doc)
+        return fused
+
+    def _embed_and_search(self, variants: List[str], embed_queries: Callable, search_one: Callable) -> list:
+        """Embed all variants in one batch and start their searches; returns the search futures"""
+        with self.metrics.stage('expansion_embedding'):
+            embeddings = embed_queries(variants)
+        executor = _get_executor()
+        return [executor.submit(search_one, variant, embedding) for variant, embedding in zip(variants, embeddings)]
+
+    def search(self, question: str, search_one: Callable, embed_queries: Callable, k: int = 5,
+               query_embedding: Optional[List[float]] = None) -> List[Document]:
+        """Search the question and its variants in parallel and fuse the rankings
+
+        search_one(query, query_embedding) is the single-query retrieval (embedding None: it embeds
+        the query itself); embed_queries embeds a list of queries in one batch.
+        """
+        self.stats['queries'] += 1
+        variants = self.expand(question)[1:]
+        if not variants:
+            return search_one(question, query_embedding)
+
+        # Variant work runs off the request context, so request stage timings keep the critical path only
+        pending = _get_executor().submit(self._embed_and_search, variants, embed_queries, search_one)
+        original = search_one(question, query_embedding)
+
+        wait_start = time.perf_counter()
+        deadline = wait_start + self.budget
+        rankings = [original]
+        futures = []
+        try:
+            futures = pending.result(timeout=max(0.0, deadline - time.perf_counter()))
+        except FutureTimeout:
+            pending.cancel()
+            self.stats['late_variants'] += len(variants)
+        except Exception as e:
+            self.stats['variant_errors'] += len(variants)
+            logger.warning(f"Query variant embedding failed: {e}")
+
+        if futures:
+            done, not_done = wait(futures, timeout=max(0.0, deadline - time.perf_counter()))
+            for future in futures:
+                if future in not_done:
+                    future.cancel()
+                    self.stats['late_variants'] += 1
+                elif future.exception() is not None:
+                    self.stats['variant_errors'] += 1
+                    logger.warning(f"Query variant search failed: {future.exception()}")
+                else:
+                    rankings.append(future.result())
+        added = time.perf_counter() - wait_start
+        self.metrics.observe('query_expansion', added)
+
+        self.stats['expanded'] += 1
+        self.stats['variants_searched'] += len(variants)
+        self.stats['variants_fused'] += len(rankings) - 1
+        self.stats['added_ms_total'] += added * 1000
+        return self.fuse(rankings, k)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Expansion counters and the mean latency added per expanded query"""
+        stats = dict(self.stats)
+        added_ms_total = stats.pop('added_ms_total')
+        return {
+            'enabled': True,
+            'max_variants': self.max_variants,
+            'budget_ms': round(self.budget * 1000, 1),
+            'avg_added_ms': round(added_ms_total / stats['expanded'], 2) if stats['expanded'] else 0.0,
+            **stats
+        }
@@ -0,0 +1,230 @@
+"""
+Scholarship-aware query router for narrowing retrieval to specific programs
+"""
+import os
+import re
+import glob
+import logging
+import threading
+from collections import defaultdict
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from .fork_safety import register_after_fork
+from .pipeline_metrics import get_pipeline_metrics
+
+logger = logging.getLogger(__name__)
+
+PROGRAM_FILE_PREFIX = "buku_panduan_beasiswa_"
+
+# Program value for chunks that are not specific to one scholarship program
+GENERAL_PROGRAM = "umum"
+
+# Filename tokens that are too generic to identify a program on their own
+_GENERIC_TOKENS = {
+    "beasiswa", "lpdp", "doktor", "dokter", "master", "phd", "dan", "or", "of",
+    "prioritas", "degree", "pendidikan", "perguruan", "tinggi", "utama", "dunia",
+    "university", "life", "science", "warga", "asia", "pacific", "spesialis"
+}
+
+# Hand-maintained synonyms, mapped onto the program slugs derived from filenames
+_EXTRA_ALIASES = {
+    "regular": ["reguler"],
+    "dokter spesialis": ["dokter_spesialis", "dokter_spesialis_dan_subspesialis"],
+    "subspesialis": ["dokter_spesialis_dan_subspesialis"],
+    "3t": ["daerah_afirmasi"],
+    "wirausaha": ["kewirausahaan"],
+    "entrepreneur": ["kewirausahaan"],
+    "difabel": ["penyandang_disabilitas"],
+    "disability": ["penyandang_disabilitas"],
+    "asn": ["pns_tni_polri"],
+    "polisi": ["pns_tni_polri"],
+    "tentara": ["pns_tni_polri"],
+    "ptud": ["perguruan_utama_tinggi_dunia"],
+    "perguruan tinggi utama dunia": ["perguruan_utama_tinggi_dunia"],
+    "double degree": ["double_or_joint_degree"],
+    "joint degree": ["double_or_joint_degree"],
+    "dual degree": ["double_or_joint_degree"],
+    "doktor riset": ["doktor_riset"],
+    "nanyang": ["prioritas_lpdp-ntu_doktor"],
+    "national university of singapore": ["prioritas_lpdp-nus_BIZ_master"],
+    "new south wales": ["prioritas_lpdp-unsw_doktor"],
+    "pra sejahtera": ["prasejahtera"],
+}
+
+def program_from_filename(filename: str) -> str:
+    """Derive the program slug from a guidebook filename"""
+    name = os.path.splitext(os.path.basename(filename))[0]
+    if name.startswith(PROGRAM_FILE_PREFIX):
+        return name[len(PROGRAM_FILE_PREFIX):]
+    return GENERAL_PROGRAM
+
+class QueryRouter:
+    """
+    Maps a question to zero or more scholarship programs using keyword/alias
+    tables and an embedding-centroid classifier, then searches with a
+    Chroma metadata filter; falls back to global search on low confidence
+    """
+
+    def __init__(self, vector_service, documents_dir: Optional[str] = None):
+        """Initialize the query router"""
+        self.vector_service = vector_service
+        self.documents_dir = documents_dir or os.getenv('DOCUMENTS_PATH', './data/documents')
+        self.centroid_min_similarity = float(os.getenv('ROUTER_CENTROID_MIN_SIM', 0.55))
+        self.centroid_margin = float(os.getenv('ROUTER_CENTROID_MARGIN', 0.05))
+
+        self.programs = self._discover_programs()
+        self.aliases = self._build_alias_table(self.programs)
+        self._alias_patterns = [
+            (re.compile(r'\b' + re.escape(alias) + r'\b'), programs)
+            for alias, programs in sorted(self.aliases.items(), key=lambda item: -len(item[0]))
+        ]
+
+        self._centroids = None
+        self._centroid_programs: List[str] = []
+        self._centroid_lock = threading.Lock()
+
+        self.stats = defaultdict(int)
+        self.metrics = get_pipeline_metrics()
+        register_after_fork(self._reinit_after_fork)
+        logger.info(f"Query router initialized with {len(self.programs)} programs and {len(self.aliases)} aliases")
+
+    def _reinit_after_fork(self):
+        """Fresh lock in a forked worker"""
+        self._centroid_lock = threading.Lock()
+
+    def _discover_programs(self) -> List[str]:
+        """List program slugs from guidebook filenames"""
+        pattern = os.path.join(self.documents_dir, f"{PROGRAM_FILE_PREFIX}*.pdf")
+        return sorted(program_from_filename(path) for path in glob.glob(pattern))
+
+    @staticmethod
+    def _build_alias_table(programs: List[str]) -> Dict[str, List[str]]:
+        """Build alias -> programs table from distinctive filename tokens and synonyms"""
+        token_programs = defaultdict(set)
+        for program in programs:
+            for token in re.split(r'[_\-]', program.lower()):
+                if token and token not in _GENERIC_TOKENS:
+                    token_programs[token].add(program)
+
+        aliases = {}
+        for token, owners in token_programs.items():
+            # Only tokens that identify exactly one program are used as aliases
+            if len(owners) == 1:
+                aliases[token] = sorted(owners)
+
+        for program in programs:
+            aliases.setdefault(re.sub(r'[_\-]', ' ', program.lower()), [program])
+
+        known = set(programs)
+        for alias, targets in _EXTRA_ALIASES.items():
+            targets = [target for target in targets if target in known]
+            if targets:
+                aliases[alias] = targets
+
+        return aliases
+
+    def match_keywords(self, question: str) -> List[str]:
+        """Return programs whose aliases appear in the question"""
+        text = question.lower()
+        matched = []
+        for pattern, programs in self._alias_patterns:
+            if pattern.search(text):
+                for program in programs:
+                    if program not in matched:
+                        matched.append(program)
+        return matched
+
+    def _load_centroids(self):
+        """Compute per-program embedding centroids from the indexed chunks"""
+        with self._centroid_lock:
+            if self._centroids is not None:
+                return
+
+            try:
+                embeddings, metadatas = self.vector_service.get_embeddings_with_metadata()
+                grouped = defaultdict(list)
+                for embedding, metadata in zip(embeddings, metadatas):
+                    program = (metadata or {}).get("program")
+                    if program and program != GENERAL_PROGRAM:
+                        grouped[program].append(embedding)
+
+                self._centroid_programs = sorted(grouped)
+                if self._centroid_programs:
+                    centroids = np.array([np.mean(grouped[p], axis=0) for p in self._centroid_programs], dtype=np.float32)
+                    self._centroids = centroids / np.clip(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12, None)
+                else:
+                    self._centroids = np.zeros((0, 0), dtype=np.float32)
+
+                logger.info(f"Computed embedding centroids for {len(self._centroid_programs)} programs")
+            except Exception as e:
+                logger.error(f"Error computing program centroids: {e}")
+                self._centroids = np.zeros((0, 0), dtype=np.float32)
+
+    def classify_embedding(self, query_embedding: List[float]) -> Dict[str, Any]:
+        """Classify a query embedding against program centroids"""
+        self._load_centroids()
+        if self._centroids.size == 0:
+            return {"programs": [], "confidence": 0.0}
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        similarities = self._centroids @ query
+        order = np.argsort(-similarities)
+
+        best = float(similarities[order[0]])
+        runner_up = float(similarities[order[1]]) if len(order) > 1 else -1.0
+        if best >= self.centroid_min_similarity and best - runner_up >= self.centroid_margin:
+            return {"programs": [self._centroid_programs[order[0]]], "confidence": best}
+        return {"programs": [], "confidence": best}
+
+    def route(self, question: str, query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        """Decide which programs a question targets"""
+        programs = self.match_keywords(question)
+        if programs:
+            return {"programs": programs, "method": "keyword", "confidence": 1.0}
+
+        if query_embedding is not None:
+            decision = self.classify_embedding(query_embedding)
+            if decision["programs"]:
+                return {"programs": decision["programs"], "method": "centroid", "confidence": decision["confidence"]}
+            return {"programs": [], "method": "global", "confidence": decision["confidence"]}
+
+        return {"programs": [], "method": "global", "confidence": 0.0}
+
+    @staticmethod
+    def build_filter(programs: List[str]) -> Optional[Dict[str, Any]]:
+        """Build a Chroma where filter for programs, always including general chunks"""
+        if not programs:
+            return None
+        return {"program": {"$in": list(programs) + [GENERAL_PROGRAM]}}
+
+    def search(self, query: str, k: int = 5, query_embedding: Optional[List[float]] = None):
+        """Routed similarity search with global fallback (query_embedding: precomputed, e.g. batched)"""
+        if query_embedding is None:
+            with self.metrics.stage('query_embedding'):
+                query_embedding = self.vector_service.embed_query(query)
+        decision = self.route(query, query_embedding)
+        self.stats[decision["method"]] += 1
+
+        if decision["programs"]:
+            with self.metrics.stage('vector_search'):
+                documents = self.vector_service.similarity_search_by_vector(
+                    query_embedding, k=k, filter=self.build_filter(decision["programs"])
+                )
+            if documents:
+                logger.info(f"Routed query to {decision['programs']} via {decision['method']}")
+                return documents
+            self.stats["empty_fallback"] += 1
+
+        with self.metrics.stage('vector_search'):
+            return self.vector_service.search_by_vector(query_embedding, k=k)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get routing statistics"""
+        return {
+            "programs": len(self.programs),
+            "aliases": len(self.aliases),
+            "decisions": dict(self.stats)
+        }
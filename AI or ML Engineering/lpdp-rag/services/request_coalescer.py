@@ -0,0 +1,84 @@
+"""
+Single-flight coalescing of identical concurrent requests
+"""
+import os
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from .fork_safety import register_after_fork
+
+logger = logging.getLogger(__name__)
+
+class _InFlightCall:
+    """State of one in-flight call shared by its waiters"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; concurrent callers with the
+    same key wait for the in-flight call and receive its result
+    """
+
+    def __init__(self, wait_timeout: float = None):
+        """Initialize the coalescer"""
+        self.wait_timeout = wait_timeout if wait_timeout is not None else float(os.getenv('COALESCE_WAIT_TIMEOUT', 30.0))
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _InFlightCall] = {}
+        self.stats = {'executions': 0, 'coalesced': 0, 'wait_timeouts': 0}
+        register_after_fork(self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        """In-flight calls belong to the parent; start clean in a forked worker"""
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run fn for key, or share the in-flight result; returns (result, shared)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call:
+                call.waiters += 1
+                self.stats['coalesced'] += 1
+                leader = False
+            else:
+                call = _InFlightCall()
+                self._calls[key] = call
+                self.stats['executions'] += 1
+                leader = True
+
+        if leader:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+
+            if call.waiters:
+                logger.info(f"Coalesced {call.waiters} identical concurrent requests")
+            if call.error:
+                raise call.error
+            return call.result, False
+
+        if not call.done.wait(self.wait_timeout):
+            # Leader is stuck; do not hold this caller hostage
+            with self._lock:
+                self.stats['wait_timeouts'] += 1
+            return fn(), False
+
+        if call.error:
+            raise call.error
+        return call.result, True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get coalescing counters"""
+        with self._lock:
+            return {**self.stats, 'in_flight': len(self._calls)}
@@ -0,0 +1,203 @@
+"""
+Opt-in sampling profiler for individual chat requests
+
+A sampled request gets a background thread that snapshots the stacks of the
+request thread and of the threads running pipeline code (LangGraph nodes,
+tools) every few milliseconds. On completion the samples are written as a
+speedscope profile or as collapsed stacks (flamegraph.pl / speedscope input)
+to a directory that keeps only the most recent files. Threads of concurrent
+requests that run pipeline code at the same time show up in the samples too.
+"""
+import os
+import sys
+import hmac
+import json
+import time
+import random
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+
+def _in_project(filename: str) -> bool:
+    """Source file of this project (not an installed package inside it)"""
+    return filename.startswith(_PROJECT_ROOT) and 'site-packages' not in filename
+
+def _frame_label(code) -> str:
+    """function (file:line) with project files relative to the project root"""
+    filename = code.co_filename
+    if _in_project(filename):
+        filename = os.path.relpath(filename, _PROJECT_ROOT)
+    else:
+        filename = '/'.join(Path(filename).parts[-2:])
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+class _StackSampler(threading.Thread):
+    """Collects stack samples (stack -> milliseconds) until stopped"""
+
+    def __init__(self, request_thread: int, interval: float):
+        super().__init__(name='request-profiler', daemon=True)
+        self.request_thread = request_thread
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        last = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            # Weight each sample by the real time since the previous one; under GIL
+            # contention the sampler wakes up later than the interval
+            now = time.perf_counter()
+            elapsed_ms, last = (now - last) * 1000, now
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident:
+                    continue
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                # Other requests' samplers are not pipeline work
+                if _SAMPLER_CODE in codes:
+                    continue
+                if ident == self.request_thread or any(_in_project(code.co_filename) for code in codes):
+                    thread = 'request' if ident == self.request_thread else 'worker'
+                    self.samples[(thread,) + tuple(_frame_label(code) for code in reversed(codes))] += elapsed_ms
+
+    def stop(self) -> Counter:
+        self._stop_event.set()
+        self.join()
+        return self.samples
+
+_SAMPLER_CODE = _StackSampler.run.__code__
+
+class RequestProfiler:
+    """Decides which requests to profile and writes their profiles to a rotating directory"""
+
+    def __init__(self, sample_rate: float = None, admin_token: Optional[str] = None):
+        """Initialize the profiler from PROFILE_* settings"""
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.getenv('PROFILE_SAMPLE_RATE', 0.0))
+        self.admin_token = admin_token if admin_token is not None else os.getenv('PROFILE_ADMIN_TOKEN')
+        self.interval = float(os.getenv('PROFILE_INTERVAL_MS', 5)) / 1000
+        self.output_format = os.getenv('PROFILE_FORMAT', 'speedscope').lower()
+        self.max_files = int(os.getenv('PROFILE_MAX_FILES', 50))
+        self.directory = Path(os.getenv('PROFILE_DIR', './data/profiles'))
+        self._lock = threading.Lock()
+        self.stats = {'profiled': 0, 'sampled': 0, 'requested': 0, 'write_errors': 0}
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any request can be profiled at all"""
+        return self.sample_rate > 0 or bool(self.admin_token)
+
+    def should_profile(self, requested: bool = False) -> bool:
+        """Profile on an authorized admin request, or on the random sample"""
+        if requested:
+            self.stats['requested'] += 1
+            return True
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            self.stats['sampled'] += 1
+            return True
+        return False
+
+    def is_authorized(self, token: Optional[str]) -> bool:
+        """Check a request header value against PROFILE_ADMIN_TOKEN"""
+        return bool(self.admin_token and token) and hmac.compare_digest(token, self.admin_token)
+
+    @contextmanager
+    def profile(self, label: str):
+        """Sample the wrapped block; yields a dict that receives the profile name and duration"""
+        info: Dict[str, Any] = {}
+        sampler = _StackSampler(threading.get_ident(), self.interval)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            yield info
+        finally:
+            samples = sampler.stop()
+            info['duration_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            info['profile'] = self._write(label, samples, info['duration_ms'])
+            self.stats['profiled'] += 1
+
+    def _write(self, label: str, samples: Counter, duration_ms: float) -> Optional[str]:
+        """Write one profile and drop the oldest files beyond PROFILE_MAX_FILES"""
+        safe_label = ''.join(c if c.isalnum() or c in '-_' else '_' for c in label)[:40]
+        stem = f"{datetime.now().strftime('%Y%m%dT%H%M%S_%f')}_{safe_label}_{int(duration_ms)}ms"
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if self.output_format == 'collapsed':
+                name = f"{stem}.folded"
+                body = ''.join(f"{';'.join(stack)} {round(ms)}\n" for stack, ms in samples.most_common())
+            else:
+                name = f"{stem}.speedscope.json"
+                body = json.dumps(self._speedscope(stem, samples, duration_ms))
+            with open(self.directory / name, 'w', encoding='utf-8') as f:
+                f.write(body)
+            self._rotate()
+            return name
+        except Exception as e:
+            self.stats['write_errors'] += 1
+            logger.error(f"Failed to write request profile: {e}")
+            return None
+
+    def _speedscope(self, name: str, samples: Counter, duration_ms: float) -> Dict[str, Any]:
+        """Speedscope 'sampled' profile of the collected stacks"""
+        frames: List[Dict[str, Any]] = []
+        index: Dict[str, int] = {}
+        stacks, weights = [], []
+        for stack, ms in samples.items():
+            ids = []
+            for label in stack:
+                if label not in index:
+                    index[label] = len(frames)
+                    frames.append({'name': label})
+                ids.append(index[label])
+            stacks.append(ids)
+            weights.append(round(ms, 3))
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'lpdp-rag request profiler',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled', 'name': name, 'unit': 'milliseconds',
+                'startValue': 0, 'endValue': max(duration_ms, sum(weights)),
+                'samples': stacks, 'weights': weights
+            }]
+        }
+
+    def _rotate(self):
+        """Keep only the most recent profiles"""
+        with self._lock:
+            files = sorted((p for p in self.directory.iterdir() if p.is_file()), key=lambda p: p.stat().st_mtime)
+            for path in files[:max(0, len(files) - self.max_files)]:
+                path.unlink(missing_ok=True)
+
+    def list_profiles(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent profiles first"""
+        if not self.directory.is_dir():
+            return []
+        files = sorted((p for p in self.directory.iterdir() if p.is_file()), key=lambda p: p.stat().st_mtime,
+                       reverse=True)
+        return [{
+            'name': p.name,
+            'size': p.stat().st_size,
+            'created_at': datetime.fromtimestamp(p.stat().st_mtime).isoformat(),
+            'format': 'collapsed' if p.suffix == '.folded' else 'speedscope'
+        } for p in files[:limit]]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Profiler settings and counters"""
+        return {
+            'sample_rate': self.sample_rate,
+            'admin_header': bool(self.admin_token),
+            'format': self.output_format,
+            'directory': str(self.directory),
+            **self.stats
+        }
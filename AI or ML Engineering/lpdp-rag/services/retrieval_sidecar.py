@@ -0,0 +1,389 @@
+"""
+Retrieval sidecar: one local process owns the embedding model and the Chroma index
+and serves embed/search to gunicorn workers over a Unix domain socket
+
+Wire format (network byte order, vectors as little-endian float32):
+    request  = op:u8  length:u32  payload
+    response = status:u8  length:u32  payload      (status 0 ok, 1 error -> utf-8 message)
+
+    EMBED    texts:  count:u16 { len:u32 utf8 }*             -> rows:u32 dim:u32 f32[rows*dim]
+    SEARCH   mode:u8 k:u16 top_docs:u16 filter_len:u32 filter_json f32[dim]
+                                                             -> count:u16 { score:f32 len:u32 text len:u32 meta_json }*
+    INFO     -                                               -> count:u32 len:u16 index_version
+    DUMP     -                                               -> rows:u32 dim:u32 f32[rows*dim] len:u32 metadatas_json
+    PING     -                                               -> b"pong"
+"""
+import os
+import json
+import time
+import socket
+import struct
+import logging
+import threading
+import socketserver
+from typing import List, Dict, Any, Tuple, Optional
+
+import numpy as np
+
+try:
+    from langchain_core.documents import Document
+except ImportError:
+    from langchain.schema import Document
+
+from .fork_safety import register_after_fork
+
+logger = logging.getLogger(__name__)
+
+OP_PING, OP_EMBED, OP_SEARCH, OP_INFO, OP_DUMP = range(5)
+STATUS_OK, STATUS_ERROR = 0, 1
+
+# SEARCH modes
+MODE_FLAT, MODE_AUTO, MODE_HIERARCHICAL = range(3)
+
+_HEADER = struct.Struct('!BI')
+_MAX_FRAME = 64 * 1024 * 1024
+_F32 = np.dtype('<f4')
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    """Read exactly size bytes or raise ConnectionError"""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:], size - received)
+        if not count:
+            raise ConnectionError("sidecar connection closed")
+        received += count
+    return bytes(buffer)
+
+def _read_frame(sock: socket.socket) -> Tuple[int, bytes]:
+    """Read one (code, payload) frame"""
+    code, length = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    if length > _MAX_FRAME:
+        raise ValueError(f"frame too large: {length} bytes")
+    return code, _recv_exact(sock, length) if length else b''
+
+def _write_frame(sock: socket.socket, code: int, payload: bytes = b''):
+    """Write one (code, payload) frame"""
+    sock.sendall(_HEADER.pack(code, len(payload)) + payload)
+
+def _pack_matrix(vectors: np.ndarray) -> bytes:
+    """Encode a 2-D float32 matrix with its shape"""
+    rows, dim = vectors.shape
+    return struct.pack('!II', rows, dim) + np.ascontiguousarray(vectors, dtype=_F32).tobytes()
+
+def _unpack_matrix(payload: bytes, offset: int = 0) -> Tuple[np.ndarray, int]:
+    """Decode a matrix written by _pack_matrix; returns (matrix, next offset)"""
+    rows, dim = struct.unpack_from('!II', payload, offset)
+    offset += 8
+    size = rows * dim * 4
+    vectors = np.frombuffer(payload, dtype=_F32, count=rows * dim, offset=offset).reshape(rows, dim)
+    return vectors, offset + size
+
+class _SidecarHandler(socketserver.BaseRequestHandler):
+    """Serves frames on one worker connection until it closes"""
+
+    def handle(self):
+        vector_service = self.server.vector_service
+        while True:
+            try:
+                op, payload = _read_frame(self.request)
+            except (ConnectionError, OSError):
+                return
+            try:
+                response = self.server.dispatch(vector_service, op, payload)
+                _write_frame(self.request, STATUS_OK, response)
+            except Exception as e:
+                logger.error(f"Sidecar op {op} failed: {e}")
+                try:
+                    _write_frame(self.request, STATUS_ERROR, str(e).encode('utf-8'))
+                except OSError:
+                    return
+
+class RetrievalSidecarServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded Unix-socket server wrapping a local VectorStoreService"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, vector_service):
+        """Bind the socket (replacing a stale one) and keep the vector service"""
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.vector_service = vector_service
+        self.requests_served = 0
+        super().__init__(socket_path, _SidecarHandler)
+        os.chmod(socket_path, 0o660)
+
+    def dispatch(self, vector_service, op: int, payload: bytes) -> bytes:
+        """Execute one operation and return the encoded response payload"""
+        self.requests_served += 1
+
+        if op == OP_PING:
+            return b'pong'
+
+        if op == OP_EMBED:
+            (count,) = struct.unpack_from('!H', payload, 0)
+            offset, texts = 2, []
+            for _ in range(count):
+                (length,) = struct.unpack_from('!I', payload, offset)
+                texts.append(payload[offset + 4:offset + 4 + length].decode('utf-8'))
+                offset += 4 + length
+            vectors = np.asarray(vector_service.embeddings.embed_documents(texts), dtype=_F32) if texts \
+                else np.zeros((0, 0), dtype=_F32)
+            return _pack_matrix(vectors)
+
+        if op == OP_SEARCH:
+            mode, k, top_docs, filter_len = struct.unpack_from('!BHHI', payload, 0)
+            offset = struct.calcsize('!BHHI')
+            where = json.loads(payload[offset:offset + filter_len]) if filter_len else None
+            embedding = np.frombuffer(payload, dtype=_F32, offset=offset + filter_len).tolist()
+
+            if mode == MODE_FLAT or where:
+                scored = vector_service.similarity_search_with_score_by_vector(embedding, k=k, filter=where)
+                documents = [doc for doc, _ in scored]
+                for doc, score in scored:
+                    doc.metadata['relevance_score'] = score
+            elif mode == MODE_HIERARCHICAL:
+                documents = vector_service.hierarchical_search_by_vector(embedding, k=k, top_docs=top_docs or None)
+            else:
+                documents = vector_service.search_by_vector(embedding, k=k)
+
+            parts = [struct.pack('!H', len(documents))]
+            for doc in documents:
+                text = doc.page_content.encode('utf-8')
+                metadata = json.dumps(doc.metadata, ensure_ascii=False).encode('utf-8')
+                parts.append(struct.pack('!fI', float(doc.metadata.get('relevance_score', 0.0)), len(text)))
+                parts.append(text)
+                parts.append(struct.pack('!I', len(metadata)))
+                parts.append(metadata)
+            return b''.join(parts)
+
+        if op == OP_INFO:
+            version = vector_service.get_index_version().encode('utf-8')
+            return struct.pack('!IH', vector_service.get_collection_count(), len(version)) + version
+
+        if op == OP_DUMP:
+            embeddings, metadatas = vector_service.get_embeddings_with_metadata()
+            vectors = np.asarray(embeddings, dtype=_F32) if len(embeddings) else np.zeros((0, 0), dtype=_F32)
+            metadata = json.dumps(metadatas, ensure_ascii=False).encode('utf-8')
+            return _pack_matrix(vectors) + struct.pack('!I', len(metadata)) + metadata
+
+        raise ValueError(f"unknown op {op}")
+
+class RetrievalSidecarClient:
+    """Thin client with one persistent connection per thread"""
+
+    def __init__(self, socket_path: str, timeout: float = 10.0):
+        """Initialize the client (connections are opened lazily)"""
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+        register_after_fork(self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        """Never share the parent's sockets; each worker connects on first use"""
+        self._local = threading.local()
+
+    def _socket(self) -> socket.socket:
+        """This thread's connection, opened on first use"""
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _reset(self):
+        """Drop this thread's connection"""
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    def call(self, op: int, payload: bytes = b'') -> bytes:
+        """Send one request; reconnects once if the sidecar restarted"""
+        for attempt in range(2):
+            try:
+                sock = self._socket()
+                _write_frame(sock, op, payload)
+                status, response = _read_frame(sock)
+                break
+            except (ConnectionError, OSError):
+                self._reset()
+                if attempt:
+                    raise
+        if status != STATUS_OK:
+            raise RuntimeError(f"retrieval sidecar error: {response.decode('utf-8', 'replace')}")
+        return response
+
+    def ping(self) -> bool:
+        """Check that the sidecar answers"""
+        try:
+            return self.call(OP_PING) == b'pong'
+        except Exception:
+            return False
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts in the sidecar; returns a (len(texts), dim) float32 matrix"""
+        parts = [struct.pack('!H', len(texts))]
+        for text in texts:
+            encoded = text.encode('utf-8')
+            parts.append(struct.pack('!I', len(encoded)))
+            parts.append(encoded)
+        vectors, _ = _unpack_matrix(self.call(OP_EMBED, b''.join(parts)))
+        return vectors
+
+    def search(self, embedding, k: int = 5, filter: Optional[Dict[str, Any]] = None,
+               mode: int = MODE_AUTO, top_docs: int = 0) -> List[Document]:
+        """Search by vector; documents carry metadata['relevance_score']"""
+        where = json.dumps(filter).encode('utf-8') if filter else b''
+        payload = (
+            struct.pack('!BHHI', mode, k, top_docs, len(where)) + where
+            + np.asarray(embedding, dtype=_F32).tobytes()
+        )
+        response = self.call(OP_SEARCH, payload)
+
+        (count,) = struct.unpack_from('!H', response, 0)
+        offset, documents = 2, []
+        for _ in range(count):
+            _, text_len = struct.unpack_from('!fI', response, offset)
+            offset += 8
+            text = response[offset:offset + text_len].decode('utf-8')
+            offset += text_len
+            (meta_len,) = struct.unpack_from('!I', response, offset)
+            offset += 4
+            metadata = json.loads(response[offset:offset + meta_len])
+            offset += meta_len
+            documents.append(Document(page_content=text, metadata=metadata))
+        return documents
+
+    def info(self) -> Tuple[int, str]:
+        """(collection count, index version)"""
+        response = self.call(OP_INFO)
+        count, length = struct.unpack_from('!IH', response, 0)
+        return count, response[6:6 + length].decode('utf-8')
+
+    def dump(self) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """All chunk embeddings with metadata"""
+        response = self.call(OP_DUMP)
+        vectors, offset = _unpack_matrix(response)
+        (length,) = struct.unpack_from('!I', response, offset)
+        return vectors, json.loads(response[offset + 4:offset + 4 + length])
+
+class RemoteEmbeddings:
+    """Embeddings interface backed by the sidecar's model"""
+
+    def __init__(self, client: RetrievalSidecarClient):
+        """Wrap a sidecar client"""
+        self.client = client
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts in one round trip"""
+        return self.client.embed(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query"""
+        return self.client.embed([text])[0].tolist()
+
+class RemoteVectorStoreService:
+    """
+    Serving subset of VectorStoreService backed by the retrieval sidecar,
+    so workers never load torch, the embedding model or a Chroma client
+    """
+
+    def __init__(self, socket_path: Optional[str] = None):
+        """Connect to the sidecar, waiting briefly for it to come up"""
+        self.socket_path = socket_path or os.getenv('RETRIEVAL_SIDECAR_SOCKET')
+        self.client = RetrievalSidecarClient(self.socket_path, float(os.getenv('RETRIEVAL_SIDECAR_TIMEOUT', 10.0)))
+        self.embeddings = RemoteEmbeddings(self.client)
+        self.hierarchical_enabled = True
+        self._info_cache = (0.0, 0, "unknown")
+        self._info_ttl = 5.0
+
+        deadline = time.monotonic() + float(os.getenv('RETRIEVAL_SIDECAR_WAIT', 30.0))
+        while not self.client.ping():
+            if time.monotonic() > deadline:
+                raise ConnectionError(f"Retrieval sidecar not reachable at {self.socket_path}")
+            time.sleep(0.5)
+        logger.info(f"Using retrieval sidecar at {self.socket_path}")
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query with the sidecar's model"""
+        return self.embeddings.embed_query(query)
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed many queries in one sidecar round trip"""
+        return self.embeddings.embed_documents(queries)
+
+    def similarity_search(self, query: str, k: int = 5) -> List[Document]:
+        """Perform similarity search"""
+        try:
+            return self.client.search(self.embed_query(query), k=k, mode=MODE_FLAT)
+        except Exception as e:
+            logger.error(f"Error in sidecar similarity search: {str(e)}")
+            return []
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 5,
+                                    filter: Dict[str, Any] = None) -> List[Document]:
+        """Similarity search with a precomputed embedding and optional metadata filter"""
+        try:
+            return self.client.search(embedding, k=k, filter=filter, mode=MODE_FLAT)
+        except Exception as e:
+            logger.error(f"Error in sidecar similarity search by vector: {str(e)}")
+            return []
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 5,
+                                               filter: Dict[str, Any] = None) -> List[Tuple[Document, float]]:
+        """Similarity search returning (document, cosine similarity) pairs"""
+        return [(doc, doc.metadata.get('relevance_score', 0.0))
+                for doc in self.similarity_search_by_vector(embedding, k=k, filter=filter)]
+
+    def hierarchical_search_by_vector(self, embedding: List[float], k: int = 5,
+                                      top_docs: int = None) -> List[Document]:
+        """Two-stage document -> chunk search in the sidecar"""
+        try:
+            return self.client.search(embedding, k=k, mode=MODE_HIERARCHICAL, top_docs=top_docs or 0)
+        except Exception as e:
+            logger.error(f"Error in sidecar hierarchical search: {str(e)}")
+            return []
+
+    def search_by_vector(self, embedding: List[float], k: int = 5) -> List[Document]:
+        """Unfiltered search, hierarchical when the sidecar's index supports it"""
+        try:
+            return self.client.search(embedding, k=k, mode=MODE_AUTO)
+        except Exception as e:
+            logger.error(f"Error in sidecar search: {str(e)}")
+            return []
+
+    def get_embeddings_with_metadata(self) -> Tuple[List[List[float]], List[Dict[str, Any]]]:
+        """All stored chunk embeddings with their metadata"""
+        vectors, metadatas = self.client.dump()
+        return list(vectors), metadatas
+
+    def _info(self) -> Tuple[int, str]:
+        """Collection count and index version, cached briefly to keep per-request calls local"""
+        fetched_at, count, version = self._info_cache
+        if time.monotonic() - fetched_at > self._info_ttl:
+            try:
+                count, version = self.client.info()
+                self._info_cache = (time.monotonic(), count, version)
+            except Exception as e:
+                logger.error(f"Error fetching sidecar index info: {str(e)}")
+        return count, version
+
+    def get_collection_count(self) -> int:
+        """Get the number of documents in the collection"""
+        return self._info()[0]
+
+    def get_index_version(self) -> str:
+        """Fingerprint of the collection contents"""
+        return self._info()[1]
+
+    def add_documents_from_files(self, file_paths: List[str]) -> bool:
+        """Ingestion runs against the index directly (scripts/simple_populate.py), not through workers"""
+        logger.error("Document upload is not supported while using the retrieval sidecar")
+        return False
@@ -5,10 +5,23 @@ This service integrates all components while maintaining Single Responsibility P
 import os
 import logging
 import re
+import uuid
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Tuple, Iterator, Optional
 
-from .vector_store import VectorStoreService
+from .fact_index import StructuredFactIndex
+from .faq_cache import FAQCache
+from .request_coalescer import SingleFlight
+from .admission_control import AdmissionRejected
+from .extractive_answer import ExtractiveAnswerer
+from .domain_gate import DomainGate
+from .langsmith_monitoring import get_langsmith_monitoring
+from .pipeline_metrics import get_pipeline_metrics
+from .request_profiler import RequestProfiler
+from .token_usage import BudgetExceeded, get_token_usage_tracker
 from services.llm_service import LLMService
 from core.rag_chain import SimpleRAGChain
 
@@ -23,50 +36,337 @@ class SimpleRAGService:
     def __init__(self):
         """Initialize the simple RAG service"""
         self.max_input_tokens = int(os.getenv('MAX_INPUT_TOKENS', 1000))
+        self.overload_mode = os.getenv('LLM_OVERLOAD_MODE', 'degraded').lower()
+        self.batch_concurrency = int(os.getenv('BATCH_CONCURRENCY', os.getenv('LLM_MAX_CONCURRENCY', 4)))
+        self.batch_max_concurrency = int(os.getenv('BATCH_MAX_CONCURRENCY', 8))
+        self.batch_search_workers = int(os.getenv('BATCH_SEARCH_WORKERS', 8))
+        
+        # Per-component construction time in milliseconds (see scripts/profile_startup.py)
+        self.init_timings: Dict[str, float] = {}
+        
+        # Per-stage latency histograms served on /metrics
+        self.metrics = get_pipeline_metrics()
+        
+        # Token usage per session/day/node, shared with LLMService which records it
+        self.token_usage = get_token_usage_tracker()
+        
+        # Opt-in sampling profiler; None (no per-request cost) unless a rate or admin token is set
+        profiler = RequestProfiler()
+        self.profiler = profiler if profiler.enabled else None
         
         # Initialize components
         try:
-            # Vector store service for document storage and retrieval
-            self.vector_service = VectorStoreService()
+            # Vector store service for document storage and retrieval; with a sidecar
+            # socket configured, workers use a thin client and never load the model
+            with self._timed('vector_store'):
+                sidecar_socket = os.getenv('RETRIEVAL_SIDECAR_SOCKET')
+                if sidecar_socket:
+                    from .retrieval_sidecar import RemoteVectorStoreService
+                    self.vector_service = RemoteVectorStoreService(sidecar_socket)
+                else:
+                    from .vector_store import VectorStoreService
+                    self.vector_service = VectorStoreService()
+            
+            # Extractive no-LLM answers for load shedding and missing LLM
+            with self._timed('extractive'):
+                self.extractive = ExtractiveAnswerer(self.vector_service.embeddings)
             
-            # LLM service for answer generation
-            self.llm_service = LLMService()
+            # One LangSmith monitor and one LLM service, shared with the RAG chain
+            with self._timed('llm_service'):
+                self.langsmith = get_langsmith_monitoring()
+                self.llm_service = LLMService(
+                    langsmith_monitoring=self.langsmith,
+                    extractive_answerer=self.extractive
+                )
             
             # RAG chain for orchestrating the retrieval-augmented generation
             # Note: Chat history is handled by the stateful chain (MessagesState + checkpointer)
-            self.rag_chain = SimpleRAGChain(self.vector_service)
+            with self._timed('rag_chain'):
+                self.rag_chain = SimpleRAGChain(
+                    self.vector_service,
+                    llm_service=self.llm_service,
+                    langsmith=self.langsmith
+                )
+            
+            # Structured fact index answers org/contact/schedule questions without the LLM
+            with self._timed('fact_index'):
+                if os.getenv('FACT_INDEX_ENABLED', 'true').lower() == 'true':
+                    self.fact_index = StructuredFactIndex()
+                else:
+                    self.fact_index = None
+            
+            # Precomputed answers for canonical high-traffic questions
+            with self._timed('faq_cache'):
+                if os.getenv('FAQ_CACHE_ENABLED', 'true').lower() == 'true':
+                    self.faq_cache = FAQCache(self.vector_service)
+                    self.faq_cache.ensure_fresh(self._build_faq_answer)
+                else:
+                    self.faq_cache = None
+            
+            # Score-based out-of-domain early exit before any LLM call
+            if os.getenv('DOMAIN_GATE_ENABLED', 'true').lower() == 'true':
+                self.domain_gate = DomainGate(self.vector_service)
+            else:
+                self.domain_gate = None
+            
+            # Identical concurrent first-turn questions share one retrieval + generation
+            if os.getenv('COALESCE_ENABLED', 'true').lower() == 'true':
+                self.coalescer = SingleFlight()
+            else:
+                self.coalescer = None
             
-            logger.info("Simple RAG Service initialized successfully")
+            logger.info(f"Simple RAG Service initialized successfully in {sum(self.init_timings.values()):.0f}ms")
             
         except Exception as e:
             logger.error(f"Failed to initialize RAG service: {e}")
             raise
     
-    def get_answer(self, question: str, session_id: str = "default") -> Dict[str, Any]:
+    @contextmanager
+    def _timed(self, component: str):
+        """Record how long a component takes to construct"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.init_timings[component] = round((time.perf_counter() - start) * 1000, 1)
+    
+    def get_answer(self, question: str, session_id: str = "default", profile: bool = False) -> Dict[str, Any]:
         """
         Get answer for a question using the RAG pipeline
         This is the main interface method that coordinates all components
+        (profile: an authorized admin asked for this request to be profiled)
         """
+        if self.profiler and self.profiler.should_profile(profile):
+            # Files are labelled with a random request id; session ids must not leak into the listing
+            with self.profiler.profile(f"req_{uuid.uuid4().hex[:12]}") as profile_info:
+                result = self._measured_answer(question, session_id)
+            return {**result, 'metadata': {**result['metadata'], 'profile': profile_info['profile']}}
+        return self._measured_answer(question, session_id)
+    
+    def _measured_answer(self, question: str, session_id: str) -> Dict[str, Any]:
+        """Answer with per-stage timings and the end-to-end latency recorded"""
+        with self.metrics.request() as stage_timings, self.token_usage.scope(session_id) as token_usage:
+            start = time.perf_counter()
+            result = self._get_answer(question, session_id)
+            elapsed = time.perf_counter() - start
+        
+        metadata = result.get('metadata', {})
+        self.metrics.observe_request(metadata.get('approach', 'error' if metadata.get('error') else 'unknown'), elapsed)
+        return {**result, 'metadata': {**metadata, 'stage_timings_ms': stage_timings, 'token_usage': token_usage}}
+    
+    def _get_answer(self, question: str, session_id: str) -> Dict[str, Any]:
+        """Run the answer fast paths and the RAG chain"""
+        query_embedding = None
         try:
             # Validate input
-            is_valid, error_msg = self._validate_input(question)
+            with self.metrics.stage('input_validation'):
+                is_valid, error_msg = self._validate_input(question)
             if not is_valid:
                 return self._create_error_response(error_msg)
             
+            # Fast path: direct structured answer, bypassing retrieval and the LLM
+            if self.fact_index:
+                fact_result = self.fact_index.answer(question, session_id)
+                if fact_result:
+                    self.rag_chain.record_exchange(session_id, question, fact_result['answer'])
+                    return fact_result
+            
+            # One question embedding serves the FAQ cache, the domain gate and retrieval
+            if self.faq_cache or self.domain_gate:
+                with self.metrics.stage('query_embedding'):
+                    query_embedding = self.vector_service.embed_query(question)
+            
+            # Warm cache of precomputed FAQ answers
+            if self.faq_cache:
+                cached_result = self.faq_cache.lookup(question, session_id, query_embedding=query_embedding)
+                if cached_result:
+                    self.rag_chain.record_exchange(session_id, question, cached_result['answer'])
+                    return cached_result
+            
+            # Off-topic first-turn questions are refused without calling the LLM;
+            # follow-ups skip the gate since they lean on the conversation context
+            if self.domain_gate and not self.rag_chain.has_history(session_id):
+                decision = self.domain_gate.check(question, query_embedding=query_embedding)
+                if decision['refuse']:
+                    refusal = self.domain_gate.refusal_response(session_id, decision)
+                    self.rag_chain.record_exchange(session_id, question, refusal['answer'])
+                    return refusal
+            
+            # Without an LLM the chain can only apologize; answer extractively instead
+            if not self.rag_chain.llm:
+                extractive_result = self._create_extractive_response(question, session_id, {'reason': 'llm_unavailable'},
+                                                                     query_embedding=query_embedding)
+                if extractive_result:
+                    return extractive_result
+            
             # Use RAG chain to get answer
-            result = self.rag_chain.invoke(question, session_id)
+            result = self._invoke_chain(question, session_id, query_embedding)
             
             # Note: Chat history is automatically managed by the stateful chain
             # No need to manually add to separate chat history manager
             
             return result
             
+        except AdmissionRejected as e:
+            logger.warning(f"LLM overloaded ({e.reason}), serving {self.overload_mode} response")
+            return self._create_overload_response(question, session_id, e, query_embedding)
         except Exception as e:
             logger.error(f"Error in RAG service: {str(e)}")
             return self._create_error_response(
                 "Maaf, terjadi kesalahan dalam memproses pertanyaan Anda. Silakan coba lagi nanti."
             )
     
+    def _invoke_chain(self, question: str, session_id: str, query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        """Invoke the RAG chain, coalescing identical first-turn questions"""
+        if not self.coalescer or self.rag_chain.has_history(session_id):
+            return self.rag_chain.invoke(question, session_id, query_embedding=query_embedding)
+        
+        key = FAQCache.normalize(question)
+        result, shared = self.coalescer.do(
+            key, lambda: self.rag_chain.invoke(question, session_id, query_embedding=query_embedding)
+        )
+        if not shared:
+            return result
+        
+        # The leader's session holds the generated turn; mirror it into this session
+        self.rag_chain.record_exchange(session_id, question, result['answer'])
+        return {
+            **result,
+            'metadata': {**result.get('metadata', {}), 'session_id': session_id, 'coalesced': True}
+        }
+    
+    def _build_faq_answer(self, question: str) -> Dict[str, Any]:
+        """Answer a canonical FAQ question in a throwaway session"""
+        build_session = f"faq_build_{uuid.uuid4()}"
+        try:
+            return self.rag_chain.invoke(question, build_session)
+        finally:
+            self.rag_chain.clear_session(build_session)
+    
+    def answer_batch(self, questions: List[str], concurrency: Optional[int] = None,
+                     session_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Answer independent questions, yielding {'index', 'question', answer fields} as each completes
+        
+        All queries are embedded in one batched forward pass, searched concurrently,
+        and generated with at most `concurrency` LLM calls in flight. Items carry no
+        conversation history; token usage is charged to session_id (the caller's
+        session, so its budget applies) or to a one-off batch session when none is given.
+        """
+        concurrency = max(1, min(concurrency or self.batch_concurrency, self.batch_max_concurrency))
+        batch_session = session_id or f"batch_{uuid.uuid4()}"
+        
+        # Validation and the structured fact index need no embedding
+        pending = []
+        for index, question in enumerate(questions):
+            question = str(question or '').strip()
+            is_valid, error_msg = self._validate_input(question) if question else (False, "Pertanyaan tidak boleh kosong")
+            if not is_valid:
+                yield self._batch_item(index, question, self._create_error_response(error_msg))
+                continue
+            fact_result = self.fact_index.answer(question, batch_session) if self.fact_index else None
+            if fact_result:
+                yield self._batch_item(index, question, fact_result)
+                continue
+            pending.append((index, question))
+        if not pending:
+            return
+        
+        with self.metrics.stage('query_embedding'):
+            embeddings = self.vector_service.embed_queries([question for _, question in pending])
+        
+        # FAQ cache and domain gate reuse the batched embeddings
+        to_answer = []
+        for (index, question), embedding in zip(pending, embeddings):
+            cached_result = self.faq_cache.lookup(question, batch_session, query_embedding=embedding) if self.faq_cache else None
+            if cached_result:
+                yield self._batch_item(index, question, cached_result)
+                continue
+            if self.domain_gate:
+                decision = self.domain_gate.check(question, query_embedding=embedding)
+                if decision['refuse']:
+                    yield self._batch_item(index, question, self.domain_gate.refusal_response(batch_session, decision))
+                    continue
+            to_answer.append((index, question, embedding))
+        if not to_answer:
+            return
+        
+        # Searches run together; each finished search feeds the bounded generation pool
+        search_workers = max(1, min(self.batch_search_workers, len(to_answer)))
+        with ThreadPoolExecutor(search_workers, thread_name_prefix='batch-search') as search_pool, \
+                ThreadPoolExecutor(concurrency, thread_name_prefix='batch-llm') as llm_pool:
+            searches = {
+                search_pool.submit(self._batch_retrieve, question, embedding): (index, question)
+                for index, question, embedding in to_answer
+            }
+            generations = {}
+            try:
+                for future in as_completed(searches):
+                    index, question = searches[future]
+                    generations[llm_pool.submit(self._batch_generate, question, future.result(), batch_session)] = (index, question)
+                for future in as_completed(generations):
+                    index, question = generations[future]
+                    yield self._batch_item(index, question, future.result())
+            except GeneratorExit:
+                # Client went away: drop queued work instead of spending LLM quota on it
+                for future in list(searches) + list(generations):
+                    future.cancel()
+                raise
+    
+    def _batch_retrieve(self, question: str, embedding: List[float]) -> list:
+        """Retrieval for one batch item; failures yield no documents"""
+        try:
+            return self.rag_chain.retrieve(question, query_embedding=embedding)
+        except Exception as e:
+            logger.error(f"Error in batch retrieval: {str(e)}")
+            return []
+    
+    def _batch_generate(self, question: str, documents: list, batch_session: str) -> Dict[str, Any]:
+        """One LLM generation for a batch item, degrading to an extractive answer when the LLM is unavailable"""
+        start = time.perf_counter()
+        with self.token_usage.scope(batch_session):
+            try:
+                result = self.rag_chain.answer_from_documents(question, documents)
+            except AdmissionRejected as e:
+                metadata = {
+                    'error': True,
+                    'overloaded': True,
+                    'reason': e.reason,
+                    'retry_after': e.retry_after,
+                    'degraded': False,
+                    'session_id': batch_session,
+                    'timestamp': datetime.now().isoformat()
+                }
+                result = self._create_extractive_response(question, batch_session, metadata, documents=documents) or {
+                    **self._create_error_response("Layanan sedang sibuk. Silakan coba lagi dalam beberapa saat."),
+                    'metadata': metadata
+                }
+            except Exception as e:
+                logger.error(f"Error in batch generation: {str(e)}")
+                result = self._create_error_response("Maaf, terjadi kesalahan dalam memproses pertanyaan ini.")
+        
+        metadata = result.get('metadata', {})
+        self.metrics.observe_request(metadata.get('approach', 'error'), time.perf_counter() - start)
+        return result
+    
+    @staticmethod
+    def _batch_item(index: int, question: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """One NDJSON record of a batch answer"""
+        return {
+            'index': index,
+            'question': question,
+            'answer': result['answer'],
+            'sources': result.get('sources', []),
+            'confidence': result.get('confidence', 0.0),
+            'metadata': result.get('metadata', {})
+        }
+    
+    def get_faq_cache_stats(self) -> Dict[str, Any]:
+        """Get FAQ warm cache coverage and hit rate (read-only; rebuilds start on init and ingestion)"""
+        if not self.faq_cache:
+            return {'enabled': False}
+        return {'enabled': True, **self.faq_cache.get_stats()}
+    
     def get_session_history(self, session_id: str) -> List[Dict[str, Any]]:
         """Get chat history for a session"""
         try:
@@ -90,7 +390,12 @@ class SimpleRAGService:
     def add_documents(self, file_paths: List[str]) -> bool:
         """Add documents to the vector store"""
         try:
-            return self.vector_service.add_documents_from_files(file_paths)
+            success = self.vector_service.add_documents_from_files(file_paths)
+            
+            # New chunks change the index version, so cached FAQ answers are rebuilt
+            if success and self.faq_cache:
+                self.faq_cache.ensure_fresh(self._build_faq_answer)
+            return success
         except Exception as e:
             logger.error(f"Error adding documents: {str(e)}")
             return False
@@ -99,14 +404,28 @@ class SimpleRAGService:
         """Get collection statistics"""
         try:
             doc_count = self.vector_service.get_collection_count()
+            bundle = getattr(self.vector_service, 'embedding_bundle', None)
             
             return {
                 'document_count': doc_count,
                 'vector_store_type': 'Chroma',
                 'embedding_model': 'paraphrase-multilingual-MiniLM-L12-v2',
+                'embedding_bundle': bundle['version'] if bundle else None,
                 'llm_available': self.llm_service.is_available(),
                 'rag_approach': 'stateful_chain',
-                'chat_history_managed_by': 'langgraph_checkpointer'
+                'chat_history_managed_by': 'langgraph_checkpointer',
+                'structured_facts': self.fact_index.get_stats() if self.fact_index else None,
+                'coalescing': self.coalescer.get_stats() if self.coalescer else None,
+                'llm_admission': self.get_admission_stats(),
+                'llm_health': self.get_llm_health(),
+                'extractive': self.extractive.get_stats(),
+                'domain_gate': self.domain_gate.get_stats() if self.domain_gate else None,
+                'query_expansion': self.rag_chain.query_expander.get_stats() if self.rag_chain.query_expander else None,
+                'parent_retrieval': self.rag_chain.parent_store.get_stats() if self.rag_chain.parent_store else None,
+                'tracing': self.langsmith.get_trace_stats(),
+                'profiler': self.profiler.get_stats() if self.profiler else None,
+                'token_usage': self.token_usage.get_stats(),
+                'init_timings_ms': self.init_timings
             }
         except Exception as e:
             logger.error(f"Error getting collection stats: {str(e)}")
@@ -132,6 +451,84 @@ class SimpleRAGService:
         
         return True, ""
     
+    def _create_overload_response(self, question: str, session_id: str, rejection: AdmissionRejected,
+                                  query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        """Degraded retrieval-only answer, or a fast rejection marker for a 503"""
+        metadata = {
+            'error': True,
+            'overloaded': True,
+            'reason': rejection.reason,
+            'retry_after': rejection.retry_after,
+            'degraded': False,
+            'session_id': session_id,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        # Budgets exist to save quota, so they always take the cheap path
+        if self.overload_mode == 'degraded' or isinstance(rejection, BudgetExceeded):
+            result = self._create_extractive_response(question, session_id, metadata, query_embedding=query_embedding)
+            if result:
+                return result
+        
+        return {
+            'answer': "Layanan sedang sibuk. Silakan coba lagi dalam beberapa saat.",
+            'sources': [],
+            'confidence': 0.0,
+            'needs_continuation': False,
+            'metadata': metadata
+        }
+    
+    def _create_extractive_response(self, question: str, session_id: str, metadata: Dict[str, Any],
+                                    documents: Optional[list] = None,
+                                    query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        """Millisecond-latency answer built from retrieved sentences, no LLM call
+        
+        With documents given (batch answering) nothing is retrieved or recorded in the session;
+        otherwise retrieval reuses query_embedding when the question was already embedded.
+        """
+        try:
+            start = datetime.now()
+            stateless = documents is not None
+            if not stateless:
+                documents = self.rag_chain.retrieve(question, query_embedding=query_embedding)
+            if not documents:
+                return None
+            
+            result = self.extractive.answer(question, documents)
+            if not stateless:
+                self.rag_chain.record_exchange(session_id, question, result['answer'])
+            return {
+                'answer': result['answer'],
+                'sources': result['sources'],
+                'confidence': result['confidence'],
+                'needs_continuation': False,
+                'metadata': {
+                    **metadata,
+                    'error': False,
+                    'degraded': True,
+                    'approach': 'extractive',
+                    'session_id': session_id,
+                    'timestamp': datetime.now().isoformat(),
+                    'processing_time': (datetime.now() - start).total_seconds()
+                }
+            }
+        except Exception as e:
+            logger.error(f"Error building extractive answer: {str(e)}")
+            return None
+    
+    def get_llm_health(self) -> Dict[str, Any]:
+        """Get LLM circuit breaker and hedging state"""
+        return self.llm_service.get_resilience_stats()
+    
+    def list_profiles(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Recent request profiles, newest first"""
+        return self.profiler.list_profiles(limit) if self.profiler else []
+    
+    def get_admission_stats(self) -> Dict[str, Any]:
+        """Get LLM admission control metrics"""
+        admission = self.llm_service.admission
+        return admission.get_stats() if admission else {'enabled': False}
+    
     def _create_error_response(self, error_message: str) -> Dict[str, Any]:
         """Create standardized error response"""
         return {
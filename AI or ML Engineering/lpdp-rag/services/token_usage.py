@@ -0,0 +1,259 @@
+"""
+Token usage accounting per session, day and graph node, with token budgets
+
+Every LLM call reports Groq's prompt/completion token counts here. Usage is
+charged to the session of the request being served (set by SimpleRAGService
+through TokenUsageTracker.scope). Per-session and global budgets, both reset daily, are checked before
+each call; a call that would cross a budget raises BudgetExceeded, which the
+service answers on the extractive degraded path instead of spending quota.
+"""
+import os
+import hmac
+import hashlib
+import secrets
+import sqlite3
+import logging
+import threading
+import contextvars
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+
+from .admission_control import AdmissionRejected
+from .fork_safety import register_after_fork
+
+logger = logging.getLogger(__name__)
+
+# (session id, usage of the current request) of the request being served
+_usage_scope: contextvars.ContextVar[Optional[tuple]] = contextvars.ContextVar('token_usage_scope', default=None)
+
+class BudgetExceeded(AdmissionRejected):
+    """Raised when an LLM call would cross the session or daily token budget"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason, retry_after)
+
+# Stats label sessions by a salted hash: raw session ids are conversation thread keys and
+# /admin/stats is unauthenticated. SECRET_KEY keeps labels stable across workers and restarts.
+_SESSION_SALT = (os.getenv('SECRET_KEY') or secrets.token_hex(16)).encode('utf-8')
+
+def _session_label(session_id: str) -> str:
+    return hmac.new(_SESSION_SALT, str(session_id).encode('utf-8'), hashlib.sha256).hexdigest()[:12]
+
+def _today() -> str:
+    return datetime.now().strftime('%Y-%m-%d')
+
+def _seconds_until_tomorrow() -> float:
+    now = datetime.now()
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (tomorrow - now).total_seconds()
+
+def _empty() -> Dict[str, int]:
+    return {'prompt_tokens': 0, 'completion_tokens': 0, 'calls': 0}
+
+class MemoryUsageStore:
+    """Process-local usage counters (recent days only)"""
+
+    def __init__(self, keep_days: int = 7):
+        self.keep_days = keep_days
+        self._reinit_after_fork()
+        register_after_fork(self._reinit_after_fork)
+
+    def _reinit_after_fork(self):
+        """Fresh lock in a forked worker"""
+        self._lock = threading.Lock()
+        self._days: Dict[str, Dict[str, int]] = defaultdict(_empty)
+        self._nodes: Dict[tuple, Dict[str, int]] = defaultdict(_empty)
+        self._sessions: Dict[tuple, Dict[str, int]] = defaultdict(_empty)
+
+    def add(self, day: str, session_id: str, node: str, prompt: int, completion: int):
+        with self._lock:
+            for bucket in (self._days[day], self._nodes[(day, node)], self._sessions[(day, session_id)]):
+                bucket['prompt_tokens'] += prompt
+                bucket['completion_tokens'] += completion
+                bucket['calls'] += 1
+            if len(self._days) > self.keep_days:
+                self._prune(sorted(self._days)[-self.keep_days])
+
+    def _prune(self, oldest_day: str):
+        """Drop days before oldest_day"""
+        for table in (self._days, self._nodes, self._sessions):
+            for key in [k for k in table if (k if isinstance(k, str) else k[0]) < oldest_day]:
+                del table[key]
+
+    def session_total(self, day: str, session_id: str) -> int:
+        usage = self._sessions.get((day, session_id))
+        return usage['prompt_tokens'] + usage['completion_tokens'] if usage else 0
+
+    def day_total(self, day: str) -> int:
+        usage = self._days.get(day)
+        return usage['prompt_tokens'] + usage['completion_tokens'] if usage else 0
+
+    def summary(self, day: str, top_sessions: int) -> Dict[str, Any]:
+        with self._lock:
+            nodes = {node: dict(usage) for (d, node), usage in self._nodes.items() if d == day}
+            sessions = [(session, usage) for (d, session), usage in self._sessions.items() if d == day]
+            days = {d: dict(usage) for d, usage in self._days.items()}
+        sessions.sort(key=lambda item: -(item[1]['prompt_tokens'] + item[1]['completion_tokens']))
+        return {
+            'by_day': days,
+            'by_node': nodes,
+            'top_sessions': [{'session': _session_label(s), **u} for s, u in sessions[:top_sessions]],
+            'sessions_today': len(sessions),
+        }
+
+class SQLiteUsageStore:
+    """Usage counters shared across gunicorn workers through a SQLite file"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS token_usage (day TEXT, session_id TEXT, node TEXT, "
+                "prompt_tokens INTEGER, completion_tokens INTEGER, calls INTEGER, "
+                "PRIMARY KEY (day, session_id, node))"
+            )
+
+    def _connect(self):
+        """Open a short-lived connection (safe across forks)"""
+        return sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+
+    def add(self, day: str, session_id: str, node: str, prompt: int, completion: int):
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO token_usage VALUES (?, ?, ?, ?, ?, 1) ON CONFLICT (day, session_id, node) DO UPDATE SET "
+                "prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                "completion_tokens = completion_tokens + excluded.completion_tokens, calls = calls + 1",
+                (day, session_id, node, prompt, completion)
+            )
+        finally:
+            conn.close()
+
+    def _scalar(self, sql: str, params: tuple) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchone()[0] or 0
+        finally:
+            conn.close()
+
+    def session_total(self, day: str, session_id: str) -> int:
+        return self._scalar(
+            "SELECT SUM(prompt_tokens + completion_tokens) FROM token_usage WHERE day = ? AND session_id = ?",
+            (day, session_id)
+        )
+
+    def day_total(self, day: str) -> int:
+        return self._scalar("SELECT SUM(prompt_tokens + completion_tokens) FROM token_usage WHERE day = ?", (day,))
+
+    def summary(self, day: str, top_sessions: int) -> Dict[str, Any]:
+        columns = "SUM(prompt_tokens), SUM(completion_tokens), SUM(calls)"
+        as_usage = lambda row: {'prompt_tokens': row[0], 'completion_tokens': row[1], 'calls': row[2]}
+        conn = self._connect()
+        try:
+            days = conn.execute(
+                f"SELECT {columns}, day FROM token_usage GROUP BY day ORDER BY day DESC LIMIT 7"
+            ).fetchall()
+            nodes = conn.execute(f"SELECT {columns}, node FROM token_usage WHERE day = ? GROUP BY node", (day,)).fetchall()
+            sessions = conn.execute(
+                f"SELECT {columns}, session_id FROM token_usage WHERE day = ? GROUP BY session_id "
+                "ORDER BY SUM(prompt_tokens + completion_tokens) DESC", (day,)
+            ).fetchall()
+        finally:
+            conn.close()
+        return {
+            'by_day': {row[3]: as_usage(row) for row in days},
+            'by_node': {row[3]: as_usage(row) for row in nodes},
+            'top_sessions': [{'session': _session_label(row[3]), **as_usage(row)} for row in sessions[:top_sessions]],
+            'sessions_today': len(sessions),
+        }
+
+class TokenUsageTracker:
+    """Records provider-reported token usage and enforces the token budgets"""
+
+    def __init__(self):
+        """Initialize the tracker from environment settings"""
+        self.session_budget = int(os.getenv('SESSION_TOKEN_BUDGET', 0))
+        self.daily_budget = int(os.getenv('DAILY_TOKEN_BUDGET', 0))
+        backend = os.getenv('TOKEN_USAGE_BACKEND', 'memory').lower()
+        if backend == 'sqlite':
+            self.store = SQLiteUsageStore(os.getenv('TOKEN_USAGE_DB', './data/cache/token_usage.sqlite'))
+        else:
+            self.store = MemoryUsageStore()
+        self.backend = backend
+        self.stats = {'budget_degraded_session': 0, 'budget_degraded_daily': 0, 'record_errors': 0}
+
+    @contextmanager
+    def scope(self, session_id: str):
+        """Charge LLM calls made inside the block to session_id; yields this request's usage"""
+        usage = _empty()
+        token = _usage_scope.set((session_id, usage))
+        try:
+            yield usage
+        finally:
+            _usage_scope.reset(token)
+
+    def check(self, estimated_tokens: int, count: bool = True):
+        """Raise BudgetExceeded when the call would cross the session or daily budget (count: record the degradation)"""
+        scope = _usage_scope.get()
+        try:
+            if self.session_budget and scope:
+                if self.store.session_total(_today(), scope[0]) + estimated_tokens > self.session_budget:
+                    if count:
+                        self.stats['budget_degraded_session'] += 1
+                    raise BudgetExceeded('session_budget', _seconds_until_tomorrow())
+            if self.daily_budget and self.store.day_total(_today()) + estimated_tokens > self.daily_budget:
+                if count:
+                    self.stats['budget_degraded_daily'] += 1
+                raise BudgetExceeded('daily_budget', _seconds_until_tomorrow())
+        except sqlite3.Error as e:
+            logger.error(f"Token budget check failed: {e}")
+
+    def record(self, node: str, usage_metadata: Optional[Dict[str, Any]]):
+        """Add one call's prompt/completion tokens to the session, day and node totals"""
+        usage_metadata = usage_metadata or {}
+        prompt = int(usage_metadata.get('input_tokens', 0))
+        completion = int(usage_metadata.get('output_tokens', 0))
+        scope = _usage_scope.get()
+        session_id = scope[0] if scope else 'background'
+        if scope:
+            scope[1]['prompt_tokens'] += prompt
+            scope[1]['completion_tokens'] += completion
+            scope[1]['calls'] += 1
+        try:
+            self.store.add(_today(), session_id, node, prompt, completion)
+        except Exception as e:
+            self.stats['record_errors'] += 1
+            logger.error(f"Failed to record token usage: {e}")
+
+    def get_stats(self, top_sessions: int = 10) -> Dict[str, Any]:
+        """Totals per day and node, top sessions today, budgets and degradations"""
+        today = _today()
+        try:
+            summary = self.store.summary(today, top_sessions)
+        except Exception as e:
+            logger.error(f"Error getting token usage: {e}")
+            summary = {}
+        return {
+            'backend': self.backend,
+            'today': today,
+            'budgets': {
+                'session': self.session_budget or None,
+                'daily': self.daily_budget or None,
+            },
+            **summary,
+            **self.stats
+        }
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+def get_token_usage_tracker() -> TokenUsageTracker:
+    """Process-wide token usage tracker"""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = TokenUsageTracker()
+        return _tracker
@@ -0,0 +1,175 @@
+"""
+Asynchronous batched trace export off the request path
+
+Spans are plain dicts pushed onto a bounded in-memory queue; a background
+thread drains it in batches to a pluggable sink (LangSmith, a local JSONL file
+or nothing). When the queue is full spans are dropped and counted instead of
+blocking the request. Rolling aggregates of recent spans are kept locally so
+run statistics never need the remote API.
+"""
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from .fork_safety import register_after_fork
+
+logger = logging.getLogger(__name__)
+
+class NoopSink:
+    """Discards spans (aggregates and counters still work)"""
+    name = 'none'
+
+    def export(self, spans: List[Dict[str, Any]]):
+        pass
+
+class JsonlSink:
+    """Appends spans as JSON lines to a local file"""
+    name = 'jsonl'
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def export(self, spans: List[Dict[str, Any]]):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for span in spans:
+                f.write(json.dumps(span, ensure_ascii=False, default=str) + '\n')
+
+class LangSmithSink:
+    """Ingests spans as runs in one LangSmith batch request"""
+    name = 'langsmith'
+
+    def __init__(self, client, project_name: str):
+        self.client = client
+        self.project_name = project_name
+
+    def export(self, spans: List[Dict[str, Any]]):
+        runs = []
+        for span in spans:
+            run = {key: value for key, value in span.items() if key not in ('latency', 'metadata')}
+            run['extra'] = {'metadata': span.get('metadata', {})}
+            run['session_name'] = self.project_name
+            runs.append(run)
+        self.client.batch_ingest_runs(create=runs)
+
+class TraceExporter:
+    """Bounded span queue drained in batches by a background thread"""
+
+    def __init__(self, sink, max_queue: int = 1000, batch_size: int = 50, flush_interval: float = 2.0,
+                 window: int = 1000):
+        """Initialize the exporter; the worker thread starts on the first span"""
+        self.sink = sink
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        # (end time, name, run_type, latency seconds, error) of recent spans
+        self._recent = deque(maxlen=window)
+        self.stats = {'enqueued': 0, 'dropped': 0, 'exported': 0, 'batches': 0, 'export_errors': 0}
+        self._reinit_after_fork()
+
+        register_after_fork(self._reinit_after_fork)
+        atexit.register(self.flush)
+
+    def _reinit_after_fork(self):
+        """The drain thread does not survive fork; start over with an empty queue"""
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_thread(self):
+        """Start the drain thread once per process"""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+                    self._thread.start()
+
+    def submit(self, span: Dict[str, Any]) -> bool:
+        """Queue a span without blocking; returns False when it was dropped"""
+        self._recent.append((time.time(), span.get('name'), span.get('run_type'),
+                             span.get('latency', 0.0), bool(span.get('error'))))
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.stats['dropped'] += 1
+            return False
+        self.stats['enqueued'] += 1
+        self._ensure_thread()
+        return True
+
+    def _run(self):
+        """Collect spans until the batch is full or the flush interval passes, then export"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._export(batch)
+
+    def _export(self, batch: List[Dict[str, Any]]):
+        """Hand one batch to the sink; failures are counted, never raised"""
+        try:
+            self.sink.export(batch)
+            self.stats['exported'] += len(batch)
+            self.stats['batches'] += 1
+        except Exception as e:
+            self.stats['export_errors'] += 1
+            logger.warning(f"Trace export of {len(batch)} spans to {self.sink.name} failed: {e}")
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self, timeout: float = 2.0) -> bool:
+        """Wait up to timeout for queued spans to be exported (used at exit)"""
+        if self._thread is None:
+            return True
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return not self._queue.unfinished_tasks
+
+    def get_run_stats(self, limit: int = 100) -> Dict[str, Any]:
+        """Latency, error rate and run types of the last `limit` spans, from local aggregates"""
+        runs = list(self._recent)[-limit:]
+        stats = {"total_runs": len(runs), "avg_latency": 0, "error_rate": 0, "run_types": {}}
+        if runs:
+            for _, _, run_type, _, _ in runs:
+                run_type = run_type or "unknown"
+                stats["run_types"][run_type] = stats["run_types"].get(run_type, 0) + 1
+            stats["avg_latency"] = sum(run[3] for run in runs) / len(runs)
+            stats["error_rate"] = sum(1 for run in runs if run[4]) / len(runs)
+        return stats
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Exporter counters and queue depth"""
+        return {
+            'sink': self.sink.name,
+            'queue_depth': self._queue.qsize(),
+            'max_queue': self.max_queue,
+            **self.stats
+        }
+
+def create_sink(client=None, project_name: Optional[str] = None):
+    """Sink from TRACE_SINK: langsmith (default when a client exists), jsonl or none"""
+    sink_name = os.getenv('TRACE_SINK', 'langsmith' if client else 'none').lower()
+    if sink_name == 'langsmith' and client:
+        return LangSmithSink(client, project_name)
+    if sink_name == 'jsonl':
+        return JsonlSink(os.getenv('TRACE_JSONL_PATH', './data/traces/spans.jsonl'))
+    if sink_name == 'langsmith':
+        logger.warning("TRACE_SINK=langsmith but LangSmith is not configured; traces are not exported")
+    return NoopSink()
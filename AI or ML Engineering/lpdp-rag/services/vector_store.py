@@ -3,8 +3,12 @@ Simple Vector Store Service for LPDP RAG System
 """
 import os
 import json
+import time
+import hashlib
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
 
 # Import langchain components with fallbacks
 try:
@@ -31,21 +35,24 @@ except ImportError:
     except ImportError:
         from langchain.embeddings import HuggingFaceEmbeddings
 
-try:
-    from langchain_text_splitters import RecursiveCharacterTextSplitter
-except ImportError:
-    from langchain.text_splitter import RecursiveCharacterTextSplitter
-
-try:
-    from langchain_community.document_loaders import PyPDFLoader, TextLoader, WebBaseLoader
-except ImportError:
-    from langchain.document_loaders import PyPDFLoader, TextLoader, WebBaseLoader
-
-import bs4
-from .translation_service import TranslationService
+from .extraction_cache import ExtractionCache
+from .deduplication import ChunkDeduplicator
+from .query_router import program_from_filename, GENERAL_PROGRAM
+from .document_index import DocumentIndex
+from .parent_store import ParentChildSplitter, get_parent_store
+from .model_bundle import DEFAULT_EMBEDDING_MODEL, load_bundle_embeddings
+from .fork_safety import register_after_fork
 
 logger = logging.getLogger(__name__)
 
+def _document_loader(name: str):
+    """Import a document loader class on first use (ingestion only; serving never needs them)"""
+    try:
+        from langchain_community import document_loaders
+    except ImportError:
+        from langchain import document_loaders
+    return getattr(document_loaders, name)
+
 class VectorStoreService:
     """Simple vector store service using ChromaDB with translation support"""
     
@@ -57,30 +64,92 @@ class VectorStoreService:
         # Ensure directory exists
         os.makedirs(self.db_path, exist_ok=True)
         
-        # Initialize embeddings
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="paraphrase-multilingual-MiniLM-L12-v2"
-        )
+        # Initialize embeddings (from a local model bundle when configured)
+        self.embedding_bundle = None
+        self.embeddings = self._create_embeddings()
         
-        # Initialize vector store
-        self.vectorstore = Chroma(
-            collection_name=self.collection_name,
-            embedding_function=self.embeddings,
-            persist_directory=self.db_path
-        )
+        # Document-level summary index for two-stage retrieval
+        self.hierarchical_enabled = os.getenv('HIERARCHICAL_ENABLED', 'true').lower() == 'true'
+        self.hierarchical_top_docs = int(os.getenv('HIERARCHICAL_TOP_DOCS', 3))
         
-        # Initialize text splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=800,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", ". ", "!", "?", ",", " ", ""]
-        )
+        # Initialize vector store and document index (re-opened per worker after fork)
+        self._open_store()
+        register_after_fork(self._reinit_after_fork)
+        
+        # Text splitter and translation service are ingestion-only and built on first use
+        self._text_splitter = None
+        self._translation_service = None
+        
+        # Page-level cache so re-ingestion does not re-parse unchanged PDFs
+        self.extraction_cache = ExtractionCache()
+        
+        # Near-duplicate elimination for boilerplate shared across guidebooks
+        self.dedup_enabled = os.getenv('DEDUP_ENABLED', 'true').lower() == 'true'
+        self.deduplicator = ChunkDeduplicator()
         
-        # Initialize translation service
-        self.translation_service = TranslationService()
+        # Small-to-big retrieval: token-aligned children indexed, parent spans kept in the parent store
+        self.parent_retrieval = os.getenv('PARENT_RETRIEVAL_ENABLED', 'false').lower() == 'true'
+        self._parent_splitter = None
         
-        # LPDP web sources configuration for import
-        self.lpdp_web_sources = [
+        # Index version cached briefly: re-population by another process (simple_populate.py, another
+        # worker) must show up here too, so it is recomputed at most every INDEX_VERSION_TTL seconds
+        self.index_version_ttl = float(os.getenv('INDEX_VERSION_TTL', 5.0))
+        self._index_version = (0.0, None)
+        
+        logger.info("Vector Store Service initialized")
+    
+    def _create_embeddings(self):
+        """Load the embedding model from EMBEDDING_BUNDLE_PATH offline, or resolve it through the hub cache"""
+        bundle_path = os.getenv('EMBEDDING_BUNDLE_PATH')
+        if bundle_path:
+            checksums = os.getenv('EMBEDDING_BUNDLE_VERIFY', 'false').lower() == 'true'
+            embeddings, self.embedding_bundle = load_bundle_embeddings(bundle_path, checksums=checksums)
+            return embeddings
+        return HuggingFaceEmbeddings(model_name=DEFAULT_EMBEDDING_MODEL)
+    
+    @property
+    def text_splitter(self):
+        """Chunking splitter, created on first ingestion"""
+        if self._text_splitter is None:
+            try:
+                from langchain_text_splitters import RecursiveCharacterTextSplitter
+            except ImportError:
+                from langchain.text_splitter import RecursiveCharacterTextSplitter
+            self._text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=int(os.getenv('CHUNK_SIZE', 800)),
+                chunk_overlap=int(os.getenv('CHUNK_OVERLAP', 200)),
+                separators=["\n\n", "\n", ". ", "!", "?", ",", " ", ""]
+            )
+        return self._text_splitter
+    
+    @property
+    def parent_splitter(self) -> ParentChildSplitter:
+        """Parent/child splitter measuring chunks in embedding model tokens, created on first ingestion"""
+        if self._parent_splitter is None:
+            self._parent_splitter = ParentChildSplitter(self._token_counter())
+        return self._parent_splitter
+    
+    def _token_counter(self):
+        """Token length function of the embedding model's tokenizer (character estimate without one)"""
+        model = getattr(self.embeddings, '_client', None) or getattr(self.embeddings, 'client', None)
+        tokenizer = getattr(model, 'tokenizer', None)
+        if tokenizer is None:
+            logger.warning("Embedding tokenizer not available; estimating chunk tokens from characters")
+            return lambda text: max(1, len(text) // 4)
+        return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+    
+    @property
+    def translation_service(self):
+        """Translator for web documents, created on first use"""
+        if self._translation_service is None:
+            from .translation_service import TranslationService
+            self._translation_service = TranslationService()
+        return self._translation_service
+    
+    def _web_sources(self) -> List[Dict[str, Any]]:
+        """LPDP web sources configuration for import"""
+        import bs4
+        return [
             {
                 "url": "https://lpdp.kemenkeu.go.id/en/tentang/selayang-pandang/",
                 "bs_kwargs": {"parse_only": bs4.SoupStrainer(class_="container")},
@@ -97,8 +166,6 @@ class VectorStoreService:
                 "metadata": {"source": "LPDP Kebijakan Umum", "type": "web"}
             },
         ]
-        
-        logger.info("Vector Store Service initialized")
     
     def add_documents_from_files(self, file_paths: List[str], translate_web_docs: bool = False) -> bool:
         """Add documents from files to the vector store 
@@ -126,11 +193,14 @@ class VectorStoreService:
                         translated_web_docs = self._translate_documents(web_documents)
                         all_documents = translated_web_docs + non_web_documents
                     
+                # Index document-level summaries before splitting
+                self.document_index.add_documents(all_documents)
+                
                 # Split documents into chunks
-                split_docs = self.text_splitter.split_documents(all_documents)
+                split_docs = self.split_and_deduplicate(all_documents)
                 
                 # Add to vector store
-                self.vectorstore.add_documents(split_docs)
+                self._add_chunks(split_docs)
                 
                 logger.info(f"Added {len(split_docs)} document chunks to vector store")
                 return True
@@ -141,6 +211,98 @@ class VectorStoreService:
             logger.error(f"Error adding documents: {str(e)}")
             return False
     
+    def split_and_deduplicate(self, documents: List[Document]) -> List[Document]:
+        """Split documents into chunks and collapse near-duplicate chunks"""
+        if self.parent_retrieval:
+            parents, split_docs = self.parent_splitter.split(documents)
+            get_parent_store().add_parents(parents)
+        else:
+            split_docs = self.text_splitter.split_documents(documents)
+        
+        # Every chunk carries a program so routed searches can filter on it
+        for doc in split_docs:
+            doc.metadata.setdefault('program', GENERAL_PROGRAM)
+        
+        if self.dedup_enabled:
+            split_docs = self.deduplicator.deduplicate(split_docs)
+        
+        return split_docs
+    
+    def _add_chunks(self, chunks: List[Document], embeddings: List[List[float]] = None):
+        """Add chunks under stable content-derived IDs so re-population upserts
+        
+        Precomputed embeddings (aligned with chunks) skip embedding inside the store.
+        """
+        unique_chunks = {}
+        parent_rows = []
+        for index, chunk in enumerate(chunks):
+            digest = hashlib.sha1()
+            digest.update(str(chunk.metadata.get('source', '')).encode('utf-8'))
+            digest.update(str(chunk.metadata.get('page', '')).encode('utf-8'))
+            digest.update(chunk.page_content.encode('utf-8'))
+            chunk.metadata['chunk_id'] = digest.hexdigest()
+            # The child -> parent map lives in the parent store, not in Chroma metadata
+            if 'parent_id' in chunk.metadata:
+                parent_rows.append((chunk.metadata['chunk_id'], chunk.metadata.pop('parent_id'),
+                                    chunk.metadata.pop('parent_start'), chunk.metadata.pop('parent_end')))
+            unique_chunks.setdefault(chunk.metadata['chunk_id'], (chunk, index))
+        if parent_rows:
+            get_parent_store().add_children(parent_rows)
+        
+        if embeddings is None:
+            self.vectorstore.add_documents([chunk for chunk, _ in unique_chunks.values()], ids=list(unique_chunks))
+        else:
+            items = list(unique_chunks.items())
+            for start in range(0, len(items), 1000):
+                batch = items[start:start + 1000]
+                self.vectorstore._collection.upsert(
+                    ids=[chunk_id for chunk_id, _ in batch],
+                    embeddings=[list(embeddings[index]) for _, (_, index) in batch],
+                    metadatas=[chunk.metadata for _, (chunk, _) in batch],
+                    documents=[chunk.page_content for _, (chunk, _) in batch]
+                )
+        self._index_version = (0.0, None)
+    
+    def get_index_version(self) -> str:
+        """Fingerprint of the collection contents, changes whenever chunks are added or removed"""
+        computed_at, version = self._index_version
+        if version is None or time.monotonic() - computed_at > self.index_version_ttl:
+            try:
+                ids = sorted(self.vectorstore._collection.get(include=[])['ids'])
+                digest = hashlib.sha1(self.collection_name.encode('utf-8'))
+                for chunk_id in ids:
+                    digest.update(chunk_id.encode('utf-8'))
+                version = f"{len(ids)}-{digest.hexdigest()[:12]}"
+                self._index_version = (time.monotonic(), version)
+            except Exception as e:
+                logger.error(f"Error computing index version: {str(e)}")
+                return version or "unknown"
+        return version
+    
+    def _open_store(self):
+        """Open the Chroma client, collection and document summary index"""
+        self.vectorstore = Chroma(
+            collection_name=self.collection_name,
+            embedding_function=self.embeddings,
+            persist_directory=self.db_path
+        )
+        self.document_index = DocumentIndex(
+            embeddings=self.embeddings,
+            client=self.vectorstore._client,
+            collection_name=self.collection_name
+        )
+    
+    def _reinit_after_fork(self):
+        """Re-open Chroma in a forked worker; the embedding model stays shared copy-on-write"""
+        try:
+            # Chroma caches one client system per path; the inherited one holds the parent's SQLite handles
+            from chromadb.api.client import SharedSystemClient
+            SharedSystemClient.clear_system_cache()
+        except Exception as e:
+            logger.warning(f"Could not clear Chroma client cache: {e}")
+        self._open_store()
+        self._index_version = (0.0, None)
+    
     def similarity_search(self, query: str, k: int = 5) -> List[Document]:
         """Perform similarity search"""
         try:
@@ -149,6 +311,87 @@ class VectorStoreService:
             logger.error(f"Error in similarity search: {str(e)}")
             return []
     
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query with the store's embedding model"""
+        return self.embeddings.embed_query(query)
+    
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed many queries in one batched forward pass"""
+        return self.embeddings.embed_documents(list(queries))
+    
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 5,
+                                    filter: Dict[str, Any] = None) -> List[Document]:
+        """Perform similarity search with a precomputed query embedding and optional metadata filter
+        
+        Each returned document carries its cosine similarity in metadata['relevance_score'].
+        """
+        documents = []
+        for doc, score in self.similarity_search_with_score_by_vector(embedding, k=k, filter=filter):
+            doc.metadata['relevance_score'] = score
+            documents.append(doc)
+        return documents
+    
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 5,
+                                               filter: Dict[str, Any] = None) -> List[Tuple[Document, float]]:
+        """Similarity search returning (document, cosine similarity) pairs, best first"""
+        try:
+            results = self.vectorstore._collection.query(
+                query_embeddings=[embedding],
+                n_results=k,
+                where=filter,
+                include=["documents", "metadatas", "embeddings"]
+            )
+            texts = (results.get("documents") or [[]])[0]
+            if not texts:
+                return []
+            
+            metadatas = (results.get("metadatas") or [[]])[0]
+            vectors = np.asarray(results["embeddings"][0], dtype=np.float32)
+            query = np.asarray(embedding, dtype=np.float32)
+            scores = (vectors @ query) / np.clip(
+                np.linalg.norm(vectors, axis=1) * np.linalg.norm(query), 1e-12, None
+            )
+            
+            return [
+                (Document(page_content=text, metadata=dict(metadata or {})), round(float(score), 4))
+                for text, metadata, score in zip(texts, metadatas, scores)
+            ]
+        except Exception as e:
+            logger.error(f"Error in similarity search with score: {str(e)}")
+            return []
+    
+    def hierarchical_search_by_vector(self, embedding: List[float], k: int = 5,
+                                      top_docs: int = None) -> List[Document]:
+        """Two-stage search: pick the top-M documents, then search chunks within them"""
+        sources = self.document_index.select_sources(embedding, top_m=top_docs or self.hierarchical_top_docs)
+        if not sources:
+            return self.similarity_search_by_vector(embedding, k=k)
+        
+        # Boilerplate merged by deduplication may come from a selected document even when its canonical
+        # source is another one; Chroma cannot match inside the joined 'sources' string, so merged chunks
+        # are over-fetched and post-filtered
+        where = {"$or": [{"source": {"$in": sources}}, {"duplicate_count": {"$gt": 1}}]}
+        selected = set(sources)
+        documents = [
+            doc for doc in self.similarity_search_by_vector(embedding, k=k * 2, filter=where)
+            if doc.metadata.get('source') in selected or selected.intersection(
+                s.strip() for s in str(doc.metadata.get('sources', '')).split(';')
+            )
+        ][:k]
+        return documents or self.similarity_search_by_vector(embedding, k=k)
+    
+    def search_by_vector(self, embedding: List[float], k: int = 5) -> List[Document]:
+        """Unfiltered search, hierarchical when enabled and the document index is populated"""
+        if self.hierarchical_enabled and self.document_index.is_populated():
+            return self.hierarchical_search_by_vector(embedding, k=k)
+        return self.similarity_search_by_vector(embedding, k=k)
+    
+    def get_embeddings_with_metadata(self) -> Tuple[List[List[float]], List[Dict[str, Any]]]:
+        """All stored chunk embeddings with their metadata (for centroid computation)"""
+        data = self.vectorstore._collection.get(include=["embeddings", "metadatas"])
+        embeddings = data.get("embeddings")
+        return (list(embeddings) if embeddings is not None else []), (data.get("metadatas") or [])
+    
     def get_retriever(self, k: int = 5):
         """Get retriever for the vector store"""
         return self.vectorstore.as_retriever(search_kwargs={"k": k})
@@ -166,18 +409,7 @@ class VectorStoreService:
             filename = os.path.basename(file_path)
             
             if file_path.endswith('.pdf'):
-                loader = PyPDFLoader(file_path)
-                documents = loader.load()
-                
-                # Add metadata
-                for doc in documents:
-                    doc.metadata.update({
-                        'source': filename,
-                        'title': filename,
-                        'file_type': 'pdf',
-                        'language': 'indonesian'
-                    })
-                return documents
+                return self._load_pdf(file_path)
                 
             elif file_path.endswith('.txt'):
                 # Check if it's a special JSON file
@@ -187,7 +419,7 @@ class VectorStoreService:
                     return self._parse_additional_info(file_path)
                 else:
                     # Regular text file
-                    loader = TextLoader(file_path, encoding='utf-8')
+                    loader = _document_loader('TextLoader')(file_path, encoding='utf-8')
                     documents = loader.load()
                     
                     # Add metadata
@@ -235,6 +467,35 @@ class VectorStoreService:
             logger.error(f"Error loading document {file_path}: {str(e)}")
             return []
     
+    def _load_pdf(self, file_path: str) -> List[Document]:
+        """Load PDF pages, reading from the extraction cache when the file is unchanged"""
+        filename = os.path.basename(file_path)
+        
+        cached_pages = self.extraction_cache.get(file_path)
+        if cached_pages is not None:
+            documents = [
+                Document(page_content=page['page_content'], metadata=page['metadata'])
+                for page in cached_pages
+            ]
+        else:
+            loader = _document_loader('PyPDFLoader')(file_path)
+            documents = loader.load()
+            self.extraction_cache.put(file_path, [
+                {'page_content': doc.page_content, 'metadata': dict(doc.metadata)}
+                for doc in documents
+            ])
+        
+        # Add metadata
+        for doc in documents:
+            doc.metadata.update({
+                'source': filename,
+                'title': filename,
+                'file_type': 'pdf',
+                'language': 'indonesian',
+                'program': program_from_filename(filename)
+            })
+        return documents
+    
     def load_web_sources(self) -> List[Document]:
         """Load documents from LPDP web sources"""
         documents = []
@@ -242,7 +503,8 @@ class VectorStoreService:
         # Set user agent from environment variable
         user_agent = os.getenv('USER_AGENT', 'LPDP-RAG-Bot/1.0')
         
-        for source_config in self.lpdp_web_sources:
+        WebBaseLoader = _document_loader('WebBaseLoader')
+        for source_config in self._web_sources():
             try:
                 logger.info(f"Loading web source: {source_config['url']}")
                 
@@ -300,11 +562,14 @@ class VectorStoreService:
                     all_documents.extend(file_docs)
             
             if all_documents:
+                # Index document-level summaries before splitting
+                self.document_index.add_documents(all_documents)
+                
                 # Split documents into chunks
-                split_docs = self.text_splitter.split_documents(all_documents)
+                split_docs = self.split_and_deduplicate(all_documents)
                 
                 # Add to vector store
-                self.vectorstore.add_documents(split_docs)
+                self._add_chunks(split_docs)
                 
                 logger.info(f"Successfully populated vector store with {len(split_docs)} chunks from {len(all_documents)} documents")
                 return True
@@ -216,12 +216,18 @@ function addMessage(content, type, sources = null, confidence = null, needsConti
                         <i class="fas fa-book mr-1"></i>Sumber informasi:
                     </p>
                     <div class="space-y-1">
-                        ${sources.map(source => `
+                        ${sources.map((source, index) => {
+                            const page = Number.isInteger(source.page) ? `, hlm. ${source.page + 1}` : '';
+                            const label = `[${index + 1}] ${escapeHtml(source.title || source.source)}${page}`;
+                            return `
                             <div class="text-xs text-gray-600 bg-gray-50 rounded p-1">
                                 <i class="fas fa-file-alt mr-1"></i>
-                                ${escapeHtml(source.title || source.source)}
+                                ${source.url
+                                    ? `<a href="${escapeHtml(source.url).replace(/"/g, '&quot;')}" target="_blank" rel="noopener noreferrer" class="text-blue-600 hover:underline">${label}</a>`
+                                    : label}
                             </div>
-                        `).join('')}
+                        `;
+                        }).join('')}
                     </div>
                 </div>
             `;